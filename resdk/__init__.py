@@ -1,3 +1,35 @@
 """Resolwe SDK for Python."""
+import importlib
+import sys
+
 from .resdk_logger import log_to_stdout, start_logging
-from .resolwe import Resolwe, ResolweQuery
+
+__all__ = ('Resolwe', 'ResolweQuery', 'log_to_stdout', 'start_logging')
+
+# Attributes that are imported on first access, so that ``import resdk``
+# does not import HTTP and timezone libraries.
+_LAZY_ATTRIBUTES = {
+    'Resolwe': '.resolwe',
+    'ResolweQuery': '.query',
+}
+
+
+def __getattr__(name):
+    """Import lazy attributes on first access."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List lazy attributes together with the imported ones."""
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+if sys.version_info < (3, 7):
+    # Module ``__getattr__`` is only supported since Python 3.7.
+    from .query import ResolweQuery  # noqa: E402 pylint: disable=wrong-import-position
+    from .resolwe import Resolwe  # noqa: E402 pylint: disable=wrong-import-position
@@ -0,0 +1,267 @@
+""".. Ignore pydocstyle D400.
+
+==============
+Authentication
+==============
+
+Authentication of requests with the session of the logged in user.
+
+The session is started on login (or before the first request of a lazy
+``Resolwe`` instance), reused from the session cache if the server still
+accepts it, and renewed when the server rejects it.
+
+.. autoclass:: resdk.auth.ResAuth
+
+"""
+import datetime
+import logging
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+# Needed because we mock requests in test_auth.py
+from requests.exceptions import ConnectionError  # pylint: disable=redefined-builtin
+
+from .constants import DEFAULT_URL
+
+# Parts of error details of responses to requests with rejected session
+# (other 401 and 403 responses are permission denials).
+SESSION_REJECTED_DETAILS = (
+    'Authentication credentials were not provided',
+    'Invalid session',
+    'CSRF Failed',
+)
+
+
+class ResAuth(requests.auth.AuthBase):
+    """HTTP Resolwe Authentication for Request object.
+
+    If credentials are given, expired sessions are renewed
+    automatically: requests rejected with status 401 or 403 are sent
+    again after a new login.
+
+    :param str username: user's username
+    :param str password: user's password
+    :param str url: Resolwe server address
+    :param instrumentation: request hooks and metrics
+    :type instrumentation: ~resdk.instrumentation.Instrumentation
+    :param bool lazy: log in before the first request instead of
+        immediately
+    :param session_cache: cache of session cookies used instead of a
+        new login
+    :type session_cache: ~resdk.session_cache.SessionCache
+
+    """
+
+    #: Session ID used in HTTP requests
+    sessionid = None
+    #: CSRF token used in HTTP requests
+    csrftoken = None
+    #: Request hooks and metrics
+    instrumentation = None
+    #: Cache of session cookies
+    session_cache = None
+    #: Password used to renew the session (not pickled)
+    _password = None
+    #: Login of a lazy instance is postponed until the first request
+    _login_pending = False
+
+    def __init__(self, username=None, password=None, url=DEFAULT_URL, instrumentation=None,
+                 lazy=False, session_cache=None):
+        """Authenticate user on Resolwe server."""
+        self.logger = logging.getLogger(__name__)
+
+        self.username = username
+        self.url = url
+        self.instrumentation = instrumentation
+        self.session_cache = session_cache
+        self._lock = threading.Lock()
+
+        if not username and not password:
+            return
+
+        self._password = password
+
+        if lazy:
+            self._login_pending = True
+            return
+
+        self._start_session()
+
+    def __getstate__(self):
+        """Return picklable state with session cookies, but without password.
+
+        Lazy instance logs in first, so that all unpickled copies share
+        the same session.
+        """
+        self._ensure_login()
+        state = self.__dict__.copy()
+        for name in ('logger', 'instrumentation', '_lock', '_password'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore state."""
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def _reset_lock(self):
+        """Replace lock that may be held by a thread of the parent process."""
+        self._lock = threading.Lock()
+
+    def _ensure_login(self):
+        """Log in if login of a lazy instance is pending."""
+        if not self._login_pending:
+            return
+
+        with self._lock:
+            if self._login_pending:
+                self._start_session()
+                self._login_pending = False
+
+    def _start_session(self):
+        """Reuse cached session if the server accepts it, log in otherwise."""
+        if self.session_cache is not None:
+            cached = self.session_cache.get(self.url, self.username)
+            if cached is not None:
+                self.sessionid, self.csrftoken = cached
+                if self._session_valid():
+                    self.logger.debug("Reusing cached session of %s on %s", self.username,
+                                      self.url)
+                    return
+
+                self.logger.debug("Cached session of %s on %s is not valid", self.username,
+                                  self.url)
+                self.sessionid, self.csrftoken = None, None
+
+        self._login(self.username, self._password)
+
+    def _session_valid(self):
+        """Return ``True`` if the server accepts the current session.
+
+        Resolwe treats requests with invalid session as requests of an
+        anonymous user, so the session is valid only if the server
+        returns the user.
+        """
+        try:
+            response = requests.get(
+                urljoin(self.url, '/api/user'), params={'current_only': 1},
+                cookies={'sessionid': self.sessionid, 'csrftoken': self.csrftoken},
+                auth=self._instrument)
+        except ConnectionError:
+            raise ValueError('Server not accessible on {}. Wrong url?'.format(self.url))
+
+        if response.status_code != 200:
+            return False
+
+        try:
+            users = response.json()
+        except ValueError:
+            return False
+        if isinstance(users, dict):
+            users = users.get('results', [])
+
+        return any(user.get('username', None) == self.username for user in users)
+
+    def _login(self, username, password):
+        """Log in and store session cookies."""
+        url = self.url
+        payload = {'username': username, 'password': password}
+
+        try:
+            response = requests.post(
+                urljoin(url, '/rest-auth/login/'), data=payload, auth=self._instrument)
+        except ConnectionError:
+            raise ValueError('Server not accessible on {}. Wrong url?'.format(url))
+
+        status_code = response.status_code
+        if status_code in [400, 403]:
+            msg = 'Response HTTP status code {}. Invalid credentials?'.format(status_code)
+            raise ValueError(msg)
+
+        if not ('sessionid' in response.cookies and 'csrftoken' in response.cookies):
+            raise Exception('Missing sessionid or csrftoken. Invalid credentials?')
+
+        self.sessionid = response.cookies['sessionid']
+        self.csrftoken = response.cookies['csrftoken']
+        # self.subscribe_id = str(uuid.uuid4())
+
+        if self.session_cache is not None:
+            self.session_cache.set(url, username, self.sessionid, self.csrftoken)
+
+    def __call__(self, request):
+        """Set request headers."""
+        self._ensure_login()
+
+        if self.sessionid and self.csrftoken:
+            request.headers['Cookie'] = 'csrftoken={}; sessionid={}'.format(
+                self.csrftoken, self.sessionid)
+            request.headers['X-CSRFToken'] = self.csrftoken
+
+        request.headers['referer'] = self.url
+
+        # Not needed until we support HTTP Push with the API
+        # if r.path_url != '/upload/':
+        #     r.headers['X-SubscribeID'] = self.subscribe_id
+        self._instrument(request)
+
+        if self._password is not None and not getattr(request, 'resdk_resent', False):
+            # Registered after instrumentation hooks, so that they
+            # record the rejected response.
+            request.resdk_sessionid = self.sessionid
+            request.register_hook('response', self._renew_session)
+
+        return request
+
+    @staticmethod
+    def _session_rejected(response):
+        """Return ``True`` if ``response`` rejects the session of the request."""
+        if response.status_code not in (401, 403):
+            return False
+
+        try:
+            detail = response.json().get('detail', '')
+        except (ValueError, AttributeError):
+            return False
+
+        return isinstance(detail, str) and any(
+            rejected in detail for rejected in SESSION_REJECTED_DETAILS)
+
+    def _renew_session(self, response, **kwargs):
+        """Log in again and resend the request if the session expired."""
+        if not self._session_rejected(response):
+            return response
+
+        with self._lock:
+            # Session may already be renewed by another thread.
+            if self.sessionid == response.request.resdk_sessionid:
+                self.logger.debug("Session of %s on %s expired, logging in", self.username,
+                                  self.url)
+                self._login(self.username, self._password)
+
+        # Release the connection, so that it can be reused.
+        response.content  # pylint: disable=pointless-statement
+        response.close()
+
+        request = response.request.copy()
+        request.hooks = requests.hooks.default_hooks()
+        request.resdk_resent = True
+        # Streamed bodies (e.g. upload chunks) are read from the start again.
+        if getattr(request, '_body_position', None) is not None:
+            requests.utils.rewind_body(request)
+        self(request)
+
+        started = time.monotonic()
+        new_response = response.connection.send(request, **kwargs)
+        new_response.elapsed = datetime.timedelta(seconds=time.monotonic() - started)
+        new_response.history.append(response)
+        new_response.request = request
+        return requests.hooks.dispatch_hook('response', request.hooks, new_response, **kwargs)
+
+    def _instrument(self, request):
+        """Pass request through instrumentation hooks if they are set."""
+        if self.instrumentation is not None:
+            self.instrumentation.instrument(request)
+        return request
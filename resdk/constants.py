@@ -8,9 +8,17 @@ ReSDK constants.
 
 """
 
+DEFAULT_URL = 'http://localhost:8000'
+
+URL_REGEX = r'^(https?|ftp)://[-A-Za-z0-9\+&@#/%?=~_|!:,.;]*[-A-Za-z0-9\+&@#/%=~_|]$'
+
 CHUNK_SIZE = 8000000  # 8MB
 
 RESOLWE_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
 
 # Permissions here should be ordered from most to least important
 ALL_PERMISSIONS = ['owner', 'share', 'edit', 'view']
+
+REMOTE_FILE_BLOCK_SIZE = 1000000  # 1MB
+REMOTE_FILE_CACHE_SIZE = 32  # number of cached blocks
+REMOTE_FILE_TIMEOUT = 60  # seconds
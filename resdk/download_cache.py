@@ -0,0 +1,242 @@
+""".. Ignore pydocstyle D400.
+
+==============
+Download cache
+==============
+
+Shared local cache of files downloaded from the Resolwe server.
+
+Cached files are keyed by the Data object id, path of the file and
+the version of the Data object (its ``checksum`` and ``modified``
+fields), so a changed Data object never serves stale content. The
+cache directory can be shared between projects and processes:
+
+.. code-block:: python
+
+    from resdk.download_cache import DownloadCache
+
+    cache = DownloadCache('/shared/resdk-cache', max_size=200 * 10**9)
+    res = resdk.Resolwe(url='https://app.genialis.com', download_cache=cache)
+
+.. autoclass:: resdk.download_cache.DownloadCache
+   :members:
+
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """Return SHA-256 hex digest of the file on ``path``."""
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class DownloadCache:
+    """Content cache for downloaded files with LRU eviction.
+
+    Each entry consists of the file content and a metadata file with
+    its size and SHA-256 checksum. Modification time of the metadata
+    file marks the last use of the entry and determines the order of
+    eviction once the total size exceeds ``max_size``.
+
+    :param str path: cache directory, created if it does not exist
+    :param int max_size: size budget of the cache in bytes, unlimited
+        if not given
+    :param bool link: hardlink cached files into the download
+        directory instead of copying them (falls back to copying if
+        linking is not possible). Linked files share content with the
+        cache, so editing them in place corrupts the cached copy used by
+        other projects. Use only if downloaded files are never modified.
+    :param bool verify: verify the checksum of cached files before
+        they are used, otherwise only their size is checked
+
+    """
+
+    def __init__(self, path, max_size=None, link=False, verify=False):
+        """Initialize attributes."""
+        self.logger = logging.getLogger(__name__)
+
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.link = link
+        self.verify = verify
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def __reduce__(self):
+        """Pickle settings only, logger cannot be pickled on Python 3.6."""
+        return self.__class__, (self.path, self.max_size, self.link, self.verify)
+
+    @staticmethod
+    def get_key(data_id, file_name, version):
+        """Return cache key of a file.
+
+        :param int data_id: id of the Data object
+        :param str file_name: path of the file relative to the Data
+            object's directory
+        :param str version: version of the Data object
+        """
+        source = json.dumps([str(data_id), file_name, version])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        """Return path of the entry content (metadata has ``.json`` suffix)."""
+        return os.path.join(self.path, key[:2], key)
+
+    def _read_metadata(self, key):
+        """Return entry metadata or ``None`` if entry does not exist."""
+        try:
+            with open(self._entry_path(key) + '.json') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def remove(self, key):
+        """Remove entry from the cache."""
+        for path in (self._entry_path(key) + '.json', self._entry_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        """Return path of the cached file or ``None`` on cache miss.
+
+        Entries that do not match the recorded size (or checksum if
+        ``verify`` is set) are removed and treated as a miss.
+        """
+        metadata = self._read_metadata(key)
+        if metadata is None:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            valid = os.path.getsize(path) == metadata['size']
+            if valid and self.verify:
+                valid = file_checksum(path) == metadata['sha256']
+        except OSError:
+            valid = False
+
+        if not valid:
+            self.logger.warning("Removing corrupted cache entry %s", path)
+            self.remove(key)
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(path + '.json')
+        return path
+
+    def _place(self, source, destination):
+        """Hardlink (or copy) ``source`` to ``destination`` atomically.
+
+        Temporary file is removed if the file cannot be placed.
+        """
+        temporary = '{}.{}.tmp'.format(destination, uuid.uuid4().hex)
+        try:
+            try:
+                if not self.link:
+                    raise OSError
+                os.link(source, temporary)
+            except OSError:
+                shutil.copyfile(source, temporary)
+            os.replace(temporary, destination)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def restore(self, key, destination):
+        """Put cached file to ``destination``.
+
+        Entry evicted by another process before it is placed is treated
+        as a miss.
+
+        :return: ``True`` if file was in the cache, ``False`` otherwise
+        :rtype: bool
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+
+        try:
+            self._place(path, destination)
+        except FileNotFoundError:
+            self.logger.debug("Cache entry %s was removed before it was used", path)
+            return False
+        return True
+
+    def add(self, key, source, sha256, evict=True, **metadata):
+        """Add file on ``source`` path to the cache.
+
+        :param str key: cache key as returned by :meth:`get_key`
+        :param str source: path of the downloaded file
+        :param str sha256: checksum of the downloaded file
+        :param bool evict: evict entries that do not fit ``max_size``,
+            set to ``False`` when adding many files and call
+            :meth:`evict` once afterwards
+        :param metadata: additional information stored with the entry
+        """
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._place(source, path)
+
+        metadata.update(size=os.path.getsize(path), sha256=sha256)
+        temporary = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        with open(temporary, 'w') as handle:
+            json.dump(metadata, handle)
+        os.replace(temporary, path + '.json')
+
+        if evict:
+            self.evict()
+
+    def entries(self):
+        """Return list of ``(last_used, size, key)`` tuples of all entries."""
+        entries = []
+        for directory in os.listdir(self.path):
+            directory = os.path.join(self.path, directory)
+            if not os.path.isdir(directory):
+                continue
+
+            for name in os.listdir(directory):
+                if not name.endswith('.json'):
+                    continue
+                key = name[:-len('.json')]
+                metadata = self._read_metadata(key)
+                try:
+                    last_used = os.path.getmtime(os.path.join(directory, name))
+                except OSError:
+                    # Entry was removed by a concurrent process.
+                    continue
+                size = metadata['size'] if metadata else 0
+                entries.append((last_used, size, key))
+
+        return entries
+
+    def size(self):
+        """Return total size of cached files in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until cache fits ``max_size``."""
+        if self.max_size is None:
+            return
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_size:
+                break
+            self.logger.debug("Evicting cache entry %s", key)
+            self.remove(key)
+            total -= size
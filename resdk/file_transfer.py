@@ -0,0 +1,356 @@
+""".. Ignore pydocstyle D400.
+
+=============
+File transfer
+=============
+
+Uploads and downloads of files of a ``Resolwe`` instance.
+
+Transfers are limited by the transfer scheduler of the instance and sent
+in chunks of its chunk size, see :mod:`resdk.transfer`.
+
+"""
+import hashlib
+import ntpath
+import os
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+try:
+    from contextvars import copy_context
+except ImportError:  # Python 3.6
+    copy_context = None  # pylint: disable=invalid-name
+
+import requests
+
+from .constants import URL_REGEX
+from .progress import get_tracker
+from .tracing import get_current_span, start_span
+from .transfer import MultipartChunk, compress_file, is_compressible, map_file
+
+
+def _submit(executor, function, *args, **kwargs):
+    """Submit ``function`` to ``executor`` in a copy of the current context.
+
+    Context is not copied on Python 3.6, which has no ``contextvars``.
+    """
+    if copy_context is None:
+        return executor.submit(function, *args, **kwargs)
+    return executor.submit(copy_context().run, function, *args, **kwargs)
+
+
+class FileTransferMixin:
+    """Mixin for uploading and downloading files in ``Resolwe`` class."""
+
+    def _upload_files(self, paths, progress=None, file_name_regexes=None):
+        """Upload local files concurrently.
+
+        All files are checked to exist before the first upload starts.
+        Files are identified by the digest of their content, so files
+        with the same content are uploaded only once and files found in
+        the upload cache are not uploaded at all. Number of concurrent
+        uploads and their total rate are limited by the transfer
+        scheduler. If ``compress_uploads`` is set, text files are
+        compressed, unless the name with ``.gz`` appended would not be
+        accepted by the input field. URLs and already uploaded files
+        are skipped.
+
+        :param list paths: values of file fields
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of uploads
+        :param dict file_name_regexes: compiled regular expressions
+            that names of files must match by their paths
+
+        :return: file field values of uploaded files by their paths
+        :rtype: dict
+
+        """
+        paths = list(dict.fromkeys(
+            path for path in paths if isinstance(path, str) and not re.match(URL_REGEX, path)))
+        if not paths:
+            return {}
+
+        for path in paths:
+            if not os.path.isfile(path):
+                raise ValueError("File {} not found.".format(path))
+
+        workers = min(len(paths), self.transfer_scheduler.connections)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(self.upload_cache.digest, paths))
+            regexes = file_name_regexes or {}
+            compress = [
+                self.compress_uploads and is_compressible(path) and all(
+                    regex.search('{}.gz'.format(ntpath.basename(path)))
+                    for regex in regexes.get(path, []))
+                for path in paths
+            ]
+            # Compressed and uncompressed uploads of the same file differ.
+            keys = ['{}.gz'.format(digest) if compressed else digest
+                    for digest, compressed in zip(digests, compress)]
+
+            file_temps = {}
+            pending = {}
+            for path, key, compressed in zip(paths, keys, compress):
+                file_temp = self.upload_cache.get(self.url, self.auth.username, key)
+                if file_temp:
+                    file_temps[key] = file_temp
+                else:
+                    pending.setdefault(key, (path, compressed))
+
+            tracker = get_tracker(
+                progress,
+                bytes_total=sum(os.path.getsize(path) for path, _ in pending.values()),
+                items_total=len(pending),
+            )
+            # Uploads are traced as children of the current span.
+            futures = {
+                key: _submit(executor, self._upload_file, path, compress=compressed,
+                             progress=tracker)
+                for key, (path, compressed) in pending.items()
+            }
+            for key, future in futures.items():
+                file_temp = future.result()
+                if not file_temp:
+                    raise Exception("Upload failed for {}.".format(pending[key][0]))
+
+                self.upload_cache.set(self.url, self.auth.username, key, file_temp)
+                file_temps[key] = file_temp
+
+        uploaded = {}
+        for path, key, compressed in zip(paths, keys, compress):
+            file_name = ntpath.basename(path)
+            uploaded[path] = {
+                'file': '{}.gz'.format(file_name) if compressed else file_name,
+                'file_temp': file_temps[key],
+            }
+        return uploaded
+
+    def _upload_file(self, file_path, compress=False, progress=None):
+        """Upload a single file on the platform.
+
+        File is uploaded in chunks of size given by ``chunk_size``, which
+        are streamed from the memory map of the file. The
+        size is chosen once per file, since the server assembles chunks
+        by their number, and transfers of chunks are recorded to adapt
+        the size of later files. Upload waits for a free connection of
+        the transfer scheduler (smaller files first) and chunks are
+        sent within its rate limit.
+
+        :param str file_path: File path
+        :param bool compress: compress file with gzip into a temporary
+            file before upload
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of the upload
+
+        """
+        file_size = os.path.getsize(file_path)
+        tracker = get_tracker(progress, bytes_total=file_size, items_total=1)
+
+        if compress:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                compressed_path = os.path.join(tmp_dir, '{}.gz'.format(ntpath.basename(file_path)))
+                compress_file(file_path, compressed_path)
+                # Compressed file is transferred instead of the original.
+                tracker.add_total(bytes_total=os.path.getsize(compressed_path) - file_size)
+                return self._upload_file(compressed_path, progress=tracker)
+
+        response = None
+        chunk_number = 0
+        session_id = str(uuid.uuid4())
+        file_uid = str(uuid.uuid4())
+        base_name = os.path.basename(file_path)
+        chunk_size = self.chunk_size.get()
+
+        with self.transfer_scheduler.slot(file_size), open(file_path, 'rb') as file_, \
+                map_file(file_) as mapped, \
+                start_span('resdk.upload', file=base_name, bytes=file_size):
+            for offset in range(0, file_size, chunk_size):
+                size = min(chunk_size, file_size - offset)
+
+                with start_span('resdk.upload.chunk', chunk_number=chunk_number,
+                                bytes=size) as span:
+                    for i in range(5):
+                        if i > 0 and response is not None:
+                            self.logger.warning(
+                                "Chunk upload failed (error %s): repeating for chunk number %s",
+                                response.status_code,
+                                chunk_number)
+
+                        # Multipart body is streamed from the memory map
+                        # of the file, so the chunk is not copied.
+                        body = MultipartChunk(mapped, offset, size, base_name, {
+                            '_chunkSize': chunk_size,
+                            '_totalSize': file_size,
+                            '_chunkNumber': chunk_number,
+                            '_currentChunkSize': size,
+                        })
+
+                        self.transfer_scheduler.throttle(size)
+                        started = time.monotonic()
+                        response = requests.post(
+                            urljoin(self.url, 'upload/'),
+                            auth=self.auth,
+                            data=body,
+                            headers={
+                                'Content-Type': body.content_type,
+                                'Session-Id': session_id,
+                                'X-File-Uid': file_uid}
+                        )
+
+                        span.set_attribute('retries', i)
+                        failed = response.status_code not in [200, 201]
+                        self.chunk_size.record(size, time.monotonic() - started, failed)
+                        if not failed:
+                            break
+                    else:
+                        # Upload of a chunk failed (5 retries)
+                        return None
+
+                percent = 100. * (offset + size) / file_size
+                message = "{:.0f} % Uploaded {}".format(percent, file_path)
+                self.logger.info(message)
+                tracker.update(bytes_done=size)
+                chunk_number += 1
+
+        tracker.update(items_done=1)
+        return response.json()['files'][0]['temp']
+
+    def _download_files(self, files, download_dir=None, data_versions=None, file_sizes=None,
+                        progress=None):
+        """Download files.
+
+        Download files from the Resolwe server to the download
+        directory (defaults to the current working directory). If
+        download cache is configured, files of Data objects with known
+        version are served from (and stored to) the cache, which is
+        trimmed to its size budget once all files are downloaded. Each
+        download waits for a free connection of the transfer scheduler.
+
+        :param files: files to download
+        :type files: list of file URI
+        :param download_dir: download directory
+        :type download_dir: string
+        :param data_versions: versions of Data objects used in cache
+            keys, mapping Data object id to its version
+        :type data_versions: dict
+        :param file_sizes: sizes of files used to give priority to
+            smaller files and to report progress, mapping file URI to
+            its size
+        :type file_sizes: dict
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of downloads
+        :rtype: None
+
+        """
+        if not download_dir:
+            download_dir = os.getcwd()
+
+        if not os.path.isdir(download_dir):
+            raise ValueError("Download directory does not exist: {}".format(download_dir))
+
+        data_versions = {str(key): value for key, value in (data_versions or {}).items()}
+        file_sizes = file_sizes or {}
+        # Total size is only known if sizes of all files are given.
+        sizes = [file_sizes.get(file_uri) for file_uri in files]
+        bytes_total = sum(sizes) if None not in sizes else None
+        tracker = get_tracker(progress, bytes_total=bytes_total, items_total=len(files))
+
+        if not files:
+            self.logger.info("No files to download.")
+
+        else:
+            self.logger.info("Downloading files to %s:", download_dir)
+
+            cached = False
+            for file_uri in files:
+                file_name = os.path.basename(file_uri)
+                file_path = os.path.dirname(file_uri)
+                file_url = urljoin(self.url, 'data/{}'.format(file_uri))
+
+                # Remove data id from path
+                data_id = file_uri.split('/', 1)[0]
+                file_path = file_path.split('/', 1)[1] if '/' in file_path else ''
+                full_path = os.path.join(download_dir, file_path)
+                if not os.path.isdir(full_path):
+                    os.makedirs(full_path)
+
+                self.logger.info("* %s", os.path.join(file_path, file_name))
+
+                destination = os.path.join(full_path, file_name)
+                with start_span('resdk.download.file', file=file_uri) as span:
+                    cache_key = None
+                    if self.download_cache and data_versions.get(data_id):
+                        cache_key = self.download_cache.get_key(
+                            data_id, os.path.join(file_path, file_name), data_versions[data_id])
+                        if self.download_cache.restore(cache_key, destination):
+                            self.logger.debug("Restored %s from download cache", file_uri)
+                            span.set_attribute('cached', True)
+                            tracker.update(bytes_done=file_sizes.get(file_uri) or 0,
+                                           items_done=1)
+                            continue
+
+                    with self.transfer_scheduler.slot(file_sizes.get(file_uri) or 0):
+                        checksum = self._download_file(
+                            file_url, destination, checksum=bool(cache_key), progress=tracker)
+                    tracker.update(items_done=1)
+
+                    if cache_key:
+                        self.download_cache.add(
+                            cache_key, destination, checksum, evict=False, file=file_uri)
+                        cached = True
+
+            # Entries are evicted once per batch instead of after every file.
+            if cached:
+                self.download_cache.evict()
+
+    def _download_file(self, file_url, destination, checksum=False, progress=None):
+        """Download a single file and verify its size.
+
+        File is first written to a temporary file next to the
+        ``destination`` and renamed once the transfer is verified.
+        Chunks are received within the rate limit of the transfer
+        scheduler.
+
+        :param str file_url: URL of the file
+        :param str destination: path of the downloaded file
+        :param bool checksum: compute checksum of the downloaded file
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of downloaded bytes
+        :return: SHA-256 hex digest if ``checksum`` is set
+        :rtype: str or None
+
+        """
+        response = requests.get(file_url, stream=True, auth=self.auth)
+        if not response.ok:
+            response.raise_for_status()
+
+        tracker = get_tracker(progress)
+        digest = hashlib.sha256() if checksum else None
+        size = 0
+        temporary = '{}.part'.format(destination)
+        with open(temporary, 'wb') as file_handle:
+            for chunk in response.iter_content(chunk_size=self.chunk_size.get()):
+                self.transfer_scheduler.throttle(len(chunk))
+                file_handle.write(chunk)
+                size += len(chunk)
+                tracker.update(bytes_done=len(chunk))
+                if digest:
+                    digest.update(chunk)
+
+        # Content-Length is the size of the encoded content, which is
+        # only comparable if response is not compressed in transfer.
+        expected_size = response.headers.get('Content-Length')
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        if expected_size is not None and encoding == 'identity' and int(expected_size) != size:
+            os.remove(temporary)
+            raise ValueError("Download of {} is incomplete: received {} of {} bytes.".format(
+                file_url, size, expected_size))
+
+        os.replace(temporary, destination)
+
+        get_current_span().set_attribute('bytes', size)
+        return digest.hexdigest() if digest else None
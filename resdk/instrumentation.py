@@ -0,0 +1,271 @@
+""".. Ignore pydocstyle D400.
+
+===============
+Instrumentation
+===============
+
+Visibility into HTTP requests made by ReSDK.
+
+Every ``Resolwe`` instance has an ``instrumentation`` attribute. It
+calls registered hooks before and after each request to the server and
+collects per-endpoint metrics:
+
+.. code-block:: python
+
+    res = resdk.Resolwe(url='https://app.genialis.com')
+
+    def log_slow(event):
+        if event['latency'] > 1:
+            print(event['method'], event['endpoint'], event['latency'])
+
+    res.instrumentation.add_post_request_hook(log_slow)
+    ...
+    print(res.instrumentation.metrics.to_prometheus())
+
+Hooks receive a dict with ``method``, ``url`` and ``endpoint`` (URL path
+with ids replaced by placeholders) and ``request_bytes`` keys. Post
+request hooks additionally get ``status``, ``response_bytes`` (``None``
+if the server did not report it) and ``latency`` (seconds until the
+response headers were received).
+
+Pickled instrumentation (e.g. of a ``Resolwe`` instance sent to a
+process pool worker) keeps hooks that can be pickled, such as module
+level functions. Other hooks (lambdas, local functions, ...) are
+dropped with a warning. Metrics are not copied, each copy collects its
+own.
+
+.. autoclass:: resdk.instrumentation.Instrumentation
+   :members:
+
+.. autoclass:: resdk.instrumentation.RequestMetrics
+   :members:
+
+"""
+import bisect
+import collections
+import logging
+import pickle
+import re
+import threading
+from urllib.parse import urlparse
+
+#: Upper bounds of latency histogram buckets (in seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def get_endpoint(url):
+    """Return URL path with object ids and file paths replaced by placeholders.
+
+    ``/api/data/42/parents`` becomes ``/api/data/{id}/parents`` and
+    ``/data/42/reads/file.fq`` becomes ``/data/{id}/{path}``, so that
+    requests to the same endpoint share metrics.
+    """
+    segments = [segment for segment in urlparse(url).path.split('/') if segment]
+
+    if segments and segments[0] == 'data' and len(segments) > 2:
+        # Files of Data objects.
+        segments = segments[:2] + ['{path}']
+
+    return '/' + '/'.join(
+        '{id}' if re.fullmatch(r'\d+', segment) else segment for segment in segments
+    )
+
+
+class RequestMetrics:
+    """Counters and latency histograms of HTTP requests per endpoint."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Initialize attributes."""
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all metrics."""
+        with self._lock:
+            self._endpoints = collections.defaultdict(self._new_endpoint)
+
+    def _new_endpoint(self):
+        """Return empty metrics of an endpoint."""
+        return {
+            'count': 0,
+            'statuses': collections.Counter(),
+            'request_bytes': 0,
+            'response_bytes': 0,
+            'latency_sum': 0.0,
+            'latency_buckets': [0] * (len(self.buckets) + 1),
+        }
+
+    def observe(self, event):
+        """Record a finished request described by ``event``."""
+        with self._lock:
+            metrics = self._endpoints[(event['method'], event['endpoint'])]
+            metrics['count'] += 1
+            metrics['statuses'][event['status']] += 1
+            metrics['request_bytes'] += event['request_bytes'] or 0
+            metrics['response_bytes'] += event['response_bytes'] or 0
+            metrics['latency_sum'] += event['latency']
+            metrics['latency_buckets'][bisect.bisect_left(self.buckets, event['latency'])] += 1
+
+    def as_dict(self):
+        """Return metrics as a dict.
+
+        Keys are ``(method, endpoint)`` tuples and values are dicts with
+        ``count``, ``statuses`` (count per status code),
+        ``request_bytes``, ``response_bytes``, ``latency_sum`` and
+        ``latency_buckets`` (cumulative count per bucket upper bound,
+        with ``'+Inf'`` as the last one) keys.
+        """
+        result = {}
+        with self._lock:
+            for key, metrics in self._endpoints.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets + ('+Inf',), metrics['latency_buckets']):
+                    cumulative += count
+                    buckets[bound] = cumulative
+
+                result[key] = dict(
+                    metrics,
+                    statuses=dict(metrics['statuses']),
+                    latency_buckets=buckets,
+                )
+
+        return result
+
+    def to_prometheus(self, prefix='resdk'):
+        """Return metrics in Prometheus text exposition format."""
+        def labels(method, endpoint, **extra):
+            """Format labels of a sample."""
+            pairs = [('method', method), ('endpoint', endpoint)] + sorted(extra.items())
+            return '{' + ','.join(
+                '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                for name, value in pairs
+            ) + '}'
+
+        metrics = sorted(self.as_dict().items())
+        lines = [
+            '# HELP {}_requests_total Number of HTTP requests.'.format(prefix),
+            '# TYPE {}_requests_total counter'.format(prefix),
+        ]
+        for (method, endpoint), values in metrics:
+            for status, count in sorted(values['statuses'].items(), key=str):
+                lines.append('{}_requests_total{} {}'.format(
+                    prefix, labels(method, endpoint, status=status), count))
+
+        for name, description in [('request_bytes', 'Bytes sent in request bodies.'),
+                                  ('response_bytes', 'Bytes received in response bodies.')]:
+            lines.append('# HELP {}_{}_total {}'.format(prefix, name, description))
+            lines.append('# TYPE {}_{}_total counter'.format(prefix, name))
+            for (method, endpoint), values in metrics:
+                lines.append('{}_{}_total{} {}'.format(
+                    prefix, name, labels(method, endpoint), values[name]))
+
+        lines.append('# HELP {}_request_duration_seconds Latency of HTTP requests.'.format(prefix))
+        lines.append('# TYPE {}_request_duration_seconds histogram'.format(prefix))
+        for (method, endpoint), values in metrics:
+            for bound, count in values['latency_buckets'].items():
+                lines.append('{}_request_duration_seconds_bucket{} {}'.format(
+                    prefix, labels(method, endpoint, le=bound), count))
+            lines.append('{}_request_duration_seconds_sum{} {}'.format(
+                prefix, labels(method, endpoint), values['latency_sum']))
+            lines.append('{}_request_duration_seconds_count{} {}'.format(
+                prefix, labels(method, endpoint), values['count']))
+
+        return '\n'.join(lines) + '\n'
+
+
+class Instrumentation:
+    """Pre and post request hooks and request metrics."""
+
+    def __init__(self):
+        """Initialize attributes."""
+        self.logger = logging.getLogger(__name__)
+
+        #: Metrics of all requests (instance of ``RequestMetrics``)
+        self.metrics = RequestMetrics()
+
+        self._pre_request_hooks = []
+        self._post_request_hooks = []
+
+    def __getstate__(self):
+        """Return hooks that can be pickled, metrics are not copied."""
+        return {
+            'pre_request_hooks': self._picklable_hooks(self._pre_request_hooks),
+            'post_request_hooks': self._picklable_hooks(self._post_request_hooks),
+        }
+
+    def __setstate__(self, state):
+        """Restore hooks with empty metrics."""
+        self.__init__()
+        self._pre_request_hooks = state['pre_request_hooks']
+        self._post_request_hooks = state['post_request_hooks']
+
+    def _picklable_hooks(self, hooks):
+        """Return ``hooks`` that can be pickled, log a warning for the others."""
+        picklable = []
+        for hook in hooks:
+            try:
+                pickle.dumps(hook)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                self.logger.warning("Request hook %s cannot be pickled and is dropped", hook)
+            else:
+                picklable.append(hook)
+        return picklable
+
+    def add_pre_request_hook(self, hook):
+        """Register ``hook`` called with request event before each request."""
+        self._pre_request_hooks.append(hook)
+
+    def add_post_request_hook(self, hook):
+        """Register ``hook`` called with request event after each response."""
+        self._post_request_hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Unregister pre or post request ``hook``."""
+        for hooks in (self._pre_request_hooks, self._post_request_hooks):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    def _call_hooks(self, hooks, event):
+        """Call hooks and log (but do not raise) their errors."""
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Request hook %s failed", hook)
+
+    @staticmethod
+    def _request_event(request):
+        """Return event describing prepared ``request``."""
+        length = request.headers.get('Content-Length', None)
+        return {
+            'method': request.method,
+            'url': request.url,
+            'endpoint': get_endpoint(request.url),
+            'request_bytes': int(length) if length is not None else 0,
+        }
+
+    def instrument(self, request):
+        """Call pre request hooks and register post request hooks on ``request``.
+
+        :param request: prepared request
+        :type request: requests.PreparedRequest
+
+        """
+        event = self._request_event(request)
+        self._call_hooks(self._pre_request_hooks, event)
+
+        def on_response(response, *args, **kwargs):
+            """Record response and call post request hooks."""
+            length = response.headers.get('Content-Length', None)
+            event.update(
+                status=response.status_code,
+                response_bytes=int(length) if length is not None else None,
+                latency=response.elapsed.total_seconds(),
+            )
+            self.metrics.observe(event)
+            self._call_hooks(self._post_request_hooks, event)
+            return response
+
+        request.register_hook('response', on_response)
+        return request
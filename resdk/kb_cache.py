@@ -0,0 +1,124 @@
+""".. Ignore pydocstyle D400.
+
+========
+KB cache
+========
+
+Persistent local cache of knowledge base lookups.
+
+Knowledge base changes rarely, so results of bulk feature lookups and
+mappings (see :class:`~resdk.query.FeatureQuery` and
+:class:`~resdk.query.MappingQuery`) can be kept on disk and reused by
+later lookups and other processes. Only ids that are not in the cache
+are requested from the server:
+
+.. code-block:: python
+
+    from resdk.kb_cache import KBCache
+
+    res = resdk.Resolwe(url='https://app.genialis.com', kb_cache=KBCache())
+    res.mapping.map(gene_ids, source_db='ENSEMBL', target_db='NCBI')
+
+.. autoclass:: resdk.kb_cache.KBCache
+   :members:
+
+"""
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+#: Default location of the KB cache
+DEFAULT_KB_CACHE_PATH = os.path.join('~', '.resdk', 'kb.sqlite3')
+
+# Maximal number of keys in one SQL statement (SQLite's default limit is 999)
+SQL_BATCH_SIZE = 500
+
+
+class KBCache:
+    """Lookup results stored in an SQLite database.
+
+    Entries are grouped in namespaces (server, endpoint and filters of
+    the lookup) and keyed by the looked up id. Each entry holds a list
+    of records returned by the server, an empty list means that
+    nothing was found.
+
+    :param str path: path of the database file, defaults to
+        ``~/.resdk/kb.sqlite3``
+    :param float max_age: maximal age of entries in seconds, entries
+        never expire if not given
+
+    """
+
+    def __init__(self, path=None, max_age=None):
+        """Initialize attributes and create the database."""
+        self.path = os.path.abspath(os.path.expanduser(path or DEFAULT_KB_CACHE_PATH))
+        self.max_age = max_age
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS lookup ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, records TEXT NOT NULL, '
+                'created REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Return connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_namespace(*parts):
+        """Return namespace of JSON serializable ``parts``."""
+        return json.dumps(parts, sort_keys=True)
+
+    def get(self, namespace, keys):
+        """Return cached records of ``keys`` in ``namespace``.
+
+        :return: dict mapping cached keys to lists of records, keys
+            that are not cached (or expired) are omitted
+        :rtype: dict
+
+        """
+        keys = list(keys)
+        min_created = 0 if self.max_age is None else time.time() - self.max_age
+
+        cached = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[start:start + SQL_BATCH_SIZE]
+                rows = connection.execute(
+                    'SELECT key, records FROM lookup WHERE namespace = ? AND created >= ? '
+                    'AND key IN ({})'.format(', '.join('?' * len(batch))),
+                    [namespace, min_created] + batch,
+                )
+                cached.update((key, json.loads(records)) for key, records in rows)
+
+        return cached
+
+    def set(self, namespace, records):
+        """Store records in ``namespace``.
+
+        :param str namespace: namespace of the entries
+        :param dict records: dict mapping keys to lists of records
+
+        """
+        created = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO lookup (namespace, key, records, created) '
+                'VALUES (?, ?, ?, ?)',
+                [(namespace, key, json.dumps(value), created) for key, value in records.items()],
+            )
+
+    def clear(self):
+        """Remove all entries."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM lookup')
@@ -0,0 +1,436 @@
+""".. Ignore pydocstyle D400.
+
+===========
+KB snapshot
+===========
+
+Local copy of a subset of the knowledge base for offline lookups.
+
+Features and mappings of selected species (and optionally source) are
+copied into an indexed SQLite database. Later syncs only transfer
+records that were added since the previous sync. Snapshot queries
+mirror ``ResolweQuery`` filtering, but never touch the server:
+
+.. code-block:: python
+
+    from resdk.kb_snapshot import KBSnapshot
+
+    snapshot = KBSnapshot(res, '/data/kb.sqlite3')
+    snapshot.sync(species='Homo sapiens', source='ENSEMBL')
+
+    snapshot.feature.get(name='TP53', species='Homo sapiens')
+    snapshot.feature.filter(aliases__in=['P53', 'LFS1']).values('feature_id', 'name')
+    snapshot.mapping.filter(source_id='ENSG00000141510', target_db='NCBI')
+
+.. autoclass:: resdk.kb_snapshot.KBSnapshot
+   :members:
+
+.. autoclass:: resdk.kb_snapshot.SnapshotQuery
+   :members:
+
+"""
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .resources.kb import Feature, Mapping
+
+# Tables of resources, their list fields (stored as JSON) and indexes
+TABLES = {
+    'feature': {
+        'resource': Feature,
+        'json_fields': ('aliases',),
+        'indexes': (('feature_id', 'source', 'species'), ('name', 'species')),
+    },
+    'mapping': {
+        'resource': Mapping,
+        'json_fields': (),
+        'indexes': (('source_id', 'source_db'), ('target_id', 'target_db')),
+    },
+}
+
+# SQL of supported filter lookups
+LOOKUPS = {
+    'exact': '{} = ?',
+    'iexact': '{} = ? COLLATE NOCASE',
+    'startswith': '{} GLOB ?',
+    'in': '{} IN (SELECT value FROM json_each(?))',
+    'gt': '{} > ?',
+    'gte': '{} >= ?',
+    'lt': '{} < ?',
+    'lte': '{} <= ?',
+}
+
+
+def _fields(table):
+    """Return fields of resources stored in ``table``."""
+    return sorted(TABLES[table]['resource'].READ_ONLY_FIELDS)
+
+
+class SnapshotQuery:
+    """Query of features or mappings stored in a snapshot.
+
+    Filters are given the same way as in ``ResolweQuery``, i.e. as
+    ``field`` or ``field__lookup`` keyword arguments, where lookup is
+    one of ``exact``, ``iexact``, ``startswith``, ``in``, ``gt``,
+    ``gte``, ``lt`` or ``lte``. Filter on ``aliases`` field matches
+    features with any alias equal to the given value(s). Queries are
+    lazy and results are cached, like in ``ResolweQuery``.
+
+    """
+
+    def __init__(self, snapshot, table):
+        """Initialize attributes."""
+        self.snapshot = snapshot
+        self.table = table
+        self.resource = TABLES[table]['resource']
+
+        self._conditions = []
+        self._parameters = []
+        self._cache = None
+
+    def _clone(self):
+        """Return copy of current object with empty cache."""
+        # pylint: disable=protected-access
+        new_query = self.__class__(self.snapshot, self.table)
+        new_query._conditions = list(self._conditions)
+        new_query._parameters = list(self._parameters)
+        return new_query
+
+    def _add_filter(self, filter_):
+        """Add filtering conditions."""
+        for key, value in filter_.items():
+            field, _, lookup = key.partition('__')
+            lookup = lookup or 'exact'
+
+            if field not in _fields(self.table):
+                raise ValueError("Unknown field '{}' of {}.".format(field, self.table))
+            if lookup not in LOOKUPS:
+                raise ValueError("Unsupported lookup '{}'.".format(lookup))
+
+            if lookup == 'in':
+                if isinstance(value, str):
+                    value = value.split(',')
+                value = json.dumps(list(value))
+            elif lookup == 'startswith':
+                value = ''.join('[{}]'.format(char) if char in '*?[' else char
+                                for char in value) + '*'
+
+            if field in TABLES[self.table]['json_fields']:
+                condition = 'id IN (SELECT {}_id FROM {}_{} WHERE {})'.format(
+                    self.table, self.table, field, LOOKUPS[lookup].format('value'))
+            else:
+                condition = LOOKUPS[lookup].format(field)
+
+            self._conditions.append(condition)
+            self._parameters.append(value)
+
+    def _select(self, columns, limit=None, offset=None):
+        """Return rows of ``columns`` that match the filters."""
+        sql = 'SELECT {} FROM {}'.format(', '.join(columns), self.table)
+        if self._conditions:
+            sql += ' WHERE ' + ' AND '.join(self._conditions)
+        sql += ' ORDER BY id LIMIT ? OFFSET ?'
+
+        parameters = self._parameters + [-1 if limit is None else limit, offset or 0]
+        return self.snapshot._connection().execute(  # pylint: disable=protected-access
+            sql, parameters).fetchall()
+
+    def _payloads(self, fields, limit=None, offset=None):
+        """Return payloads (dicts) with ``fields`` of matching records."""
+        json_fields = [field for field in fields if field in TABLES[self.table]['json_fields']]
+        payloads = []
+        for row in self._select(fields, limit, offset):
+            payload = dict(zip(fields, row))
+            for field in json_fields:
+                payload[field] = json.loads(payload[field])
+            payloads.append(payload)
+        return payloads
+
+    def _fetch(self):
+        """Load matching records and populate cache."""
+        if self._cache is not None:
+            return
+
+        resolwe = self.snapshot.resolwe
+        self._cache = [self.resource(resolwe, **payload)
+                       for payload in self._payloads(_fields(self.table))]
+
+    def __iter__(self):
+        """Return iterator over matching objects."""
+        self._fetch()
+        return iter(self._cache)
+
+    def __len__(self):
+        """Return number of matching objects."""
+        return self.count()
+
+    def __getitem__(self, index):
+        """Retrieve an item or slice from the set of results."""
+        self._fetch()
+        return self._cache[index]
+
+    def __repr__(self):
+        """Return string representation of the current object."""
+        self._fetch()
+        return '[{}]'.format(',\n '.join(str(obj) for obj in self._cache))
+
+    def all(self):
+        """Return copy of the current query."""
+        return self._clone()
+
+    def filter(self, **filters):
+        """Return clone of current query with added given filters."""
+        new_query = self._clone()
+        new_query._add_filter(filters)  # pylint: disable=protected-access
+        return new_query
+
+    def get(self, **filters):
+        """Get object that matches given filters.
+
+        :raises LookupError: if none or more than one objects are
+            matching
+
+        """
+        # Two objects are enough to know that object is not unique.
+        payloads = self.filter(**filters)._payloads(  # pylint: disable=protected-access
+            _fields(self.table), limit=2)
+
+        if not payloads:
+            raise LookupError('Matching object does not exist.')
+        if len(payloads) > 1:
+            raise LookupError('get() returned more than one object.')
+
+        return self.resource(self.snapshot.resolwe, **payloads[0])
+
+    def count(self):
+        """Return number of matching objects."""
+        if self._cache is not None:
+            return len(self._cache)
+
+        sql = 'SELECT COUNT(*) FROM {}'.format(self.table)
+        if self._conditions:
+            sql += ' WHERE ' + ' AND '.join(self._conditions)
+        connection = self.snapshot._connection()  # pylint: disable=protected-access
+        return connection.execute(sql, self._parameters).fetchone()[0]
+
+    def values(self, *fields):
+        """Return matching records as dicts, without creating objects.
+
+        This is the fastest way to look up many records.
+
+        :param fields: fields to include, all fields by default
+        :rtype: list of dicts
+
+        """
+        unknown = set(fields) - set(_fields(self.table))
+        if unknown:
+            raise ValueError("Unknown fields of {}: {}".format(
+                self.table, ', '.join(sorted(unknown))))
+
+        return self._payloads(list(fields) or _fields(self.table))
+
+
+class KBSnapshot:
+    """Knowledge base features and mappings in an SQLite database.
+
+    :param resolwe: Resolwe instance used to sync the snapshot and to
+        create resource objects (it can be a lazy instance when the
+        snapshot is only queried)
+    :type resolwe: Resolwe object
+    :param str path: path of the database file
+
+    """
+
+    def __init__(self, resolwe, path):
+        """Initialize attributes and create the database."""
+        self.logger = logging.getLogger(__name__)
+        self.resolwe = resolwe
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._transaction() as connection:
+            for table, options in TABLES.items():
+                columns = ', '.join(
+                    'id INTEGER PRIMARY KEY' if field == 'id' else field
+                    for field in _fields(table)
+                )
+                connection.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(table, columns))
+                for index in options['indexes']:
+                    connection.execute(
+                        'CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({columns})'.format(
+                            table=table, name='_'.join(index), columns=', '.join(index)))
+
+                for field in options['json_fields']:
+                    connection.execute(
+                        'CREATE TABLE IF NOT EXISTS {table}_{field} ('
+                        '{table}_id INTEGER NOT NULL, value TEXT NOT NULL)'.format(
+                            table=table, field=field))
+                    connection.execute(
+                        'CREATE INDEX IF NOT EXISTS {table}_{field}_value '
+                        'ON {table}_{field} (value)'.format(table=table, field=field))
+                    connection.execute(
+                        'CREATE INDEX IF NOT EXISTS {table}_{field}_{table}_id '
+                        'ON {table}_{field} ({table}_id)'.format(table=table, field=field))
+
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sync_state (name TEXT, filters TEXT, '
+                'last_id INTEGER, synced REAL, PRIMARY KEY (name, filters))'
+            )
+
+    @property
+    def feature(self):
+        """Query of features in the snapshot."""
+        return SnapshotQuery(self, 'feature')
+
+    @property
+    def mapping(self):
+        """Query of mappings in the snapshot."""
+        return SnapshotQuery(self, 'mapping')
+
+    def _connection(self):
+        """Return connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Return connection in a transaction that commits on success."""
+        connection = self._connection()
+        with connection:
+            yield connection
+
+    def _store(self, connection, table, payloads):
+        """Insert or replace ``payloads`` in ``table``."""
+        fields = _fields(table)
+        json_fields = TABLES[table]['json_fields']
+
+        rows = []
+        for payload in payloads:
+            rows.append([
+                json.dumps(payload.get(field, None) or [])
+                if field in json_fields else payload.get(field, None)
+                for field in fields
+            ])
+        connection.executemany(
+            'INSERT OR REPLACE INTO {} ({}) VALUES ({})'.format(
+                table, ', '.join(fields), ', '.join('?' * len(fields))),
+            rows,
+        )
+
+        for field in json_fields:
+            ids = [payload['id'] for payload in payloads]
+            connection.execute(
+                'DELETE FROM {table}_{field} WHERE {table}_id IN '
+                '(SELECT value FROM json_each(?))'.format(table=table, field=field),
+                [json.dumps(ids)],
+            )
+            connection.executemany(
+                'INSERT INTO {table}_{field} ({table}_id, value) VALUES (?, ?)'.format(
+                    table=table, field=field),
+                [(payload['id'], value)
+                 for payload in payloads for value in payload.get(field, None) or []],
+            )
+
+    def _delete_missing(self, connection, table, filters, ids):
+        """Delete records matching ``filters`` whose ids are not in ``ids``."""
+        query = SnapshotQuery(self, table).filter(**filters)
+        # pylint: disable=protected-access
+        condition = ' AND '.join(
+            query._conditions + ['id NOT IN (SELECT value FROM json_each(?))'])
+        parameters = query._parameters + [json.dumps(ids)]
+
+        for field in TABLES[table]['json_fields']:
+            connection.execute(
+                'DELETE FROM {table}_{field} WHERE {table}_id IN '
+                '(SELECT id FROM {table} WHERE {condition})'.format(
+                    table=table, field=field, condition=condition),
+                parameters,
+            )
+        return connection.execute(
+            'DELETE FROM {} WHERE {}'.format(table, condition), parameters).rowcount
+
+    def _sync_table(self, table, filters, full, chunk_size):
+        """Sync records of ``table`` matching ``filters`` from the server."""
+        key = json.dumps(filters, sort_keys=True)
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT last_id FROM sync_state WHERE name = ? AND filters = ?', [table, key],
+        ).fetchone()
+        last_id = 0 if full or row is None else row[0]
+
+        query = getattr(self.resolwe, table).filter(ordering='id', **filters)
+        if last_id:
+            query = query.filter(id__gt=last_id)
+
+        ids = []
+        with self._transaction() as connection:
+            page = []
+            for payload in query.iterate_payloads(chunk_size=chunk_size):
+                page.append(payload)
+                ids.append(payload['id'])
+                if len(page) >= chunk_size:
+                    self._store(connection, table, page)
+                    page = []
+            self._store(connection, table, page)
+
+            deleted = 0
+            if full:
+                deleted = self._delete_missing(connection, table, filters, ids)
+
+            connection.execute(
+                'INSERT OR REPLACE INTO sync_state (name, filters, last_id, synced) '
+                'VALUES (?, ?, ?, ?)',
+                [table, key, max(ids + [last_id]), time.time()],
+            )
+
+        self.logger.info("Synced %d %s records (%d deleted) matching %s",
+                         len(ids), table, deleted, key)
+        return len(ids)
+
+    def sync(self, species, source=None, full=False, chunk_size=1000):
+        """Copy features and mappings of ``species`` from the server.
+
+        Features of ``species`` (and ``source``, if given) and mappings
+        from features of ``species`` (and ``source``) are copied. By
+        default only records created since the previous sync of the
+        same subset are transferred. Full sync transfers all records of
+        the subset again, so that changed and deleted records are
+        updated too.
+
+        :param str species: species of features
+        :param str source: source of features, all sources if not given
+        :param bool full: transfer all records of the subset
+        :param int chunk_size: number of records fetched in one request
+        :return: number of transferred features and mappings
+        :rtype: dict
+
+        """
+        feature_filters = {'species': species}
+        mapping_filters = {'source_species': species}
+        if source is not None:
+            feature_filters['source'] = source
+            mapping_filters['source_db'] = source
+
+        return {
+            'feature': self._sync_table('feature', feature_filters, full, chunk_size),
+            'mapping': self._sync_table('mapping', mapping_filters, full, chunk_size),
+        }
+
+    def close(self):
+        """Close the database connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
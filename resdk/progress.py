@@ -0,0 +1,189 @@
+""".. Ignore pydocstyle D400.
+
+========
+Progress
+========
+
+Progress reporting of transfers and batch operations.
+
+Uploads, downloads and bulk queries accept a ``progress`` callback,
+which is called with a :class:`Progress` snapshot whenever some bytes or
+items are done:
+
+.. code-block:: python
+
+    def report(progress):
+        print('{:.0f} % done, {:.1f} MB/s, {:.0f} s left'.format(
+            100 * progress.fraction, progress.throughput / 1e6, progress.eta or 0))
+
+    collection.download(progress=report)
+
+Progress bar can be shown with ``tqdm`` (installed separately):
+
+.. code-block:: python
+
+    from resdk.progress import TqdmProgress
+
+    collection.download(progress=TqdmProgress(desc='Downloading'))
+
+.. autoclass:: resdk.progress.Progress
+   :members:
+
+.. autoclass:: resdk.progress.TqdmProgress
+   :members:
+
+"""
+import threading
+import time
+
+
+class Progress:
+    """Snapshot of the progress of an operation.
+
+    Totals are ``None`` if they are not known.
+    """
+
+    def __init__(self, bytes_done=0, bytes_total=None, items_done=0, items_total=None,
+                 elapsed=0.0):
+        """Initialize attributes."""
+        #: Number of transferred bytes
+        self.bytes_done = bytes_done
+        #: Number of all bytes
+        self.bytes_total = bytes_total
+        #: Number of done items (files, objects, ...)
+        self.items_done = items_done
+        #: Number of all items
+        self.items_total = items_total
+        #: Seconds since the start of the operation
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        """Return string representation of the current object."""
+        return 'Progress <bytes: {}/{}, items: {}/{}>'.format(
+            self.bytes_done, self.bytes_total, self.items_done, self.items_total)
+
+    @property
+    def throughput(self):
+        """Average transfer rate in bytes per second."""
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        """Done fraction of the operation, by bytes if total is known, else by items."""
+        if self.bytes_total:
+            return min(1.0, self.bytes_done / self.bytes_total)
+        if self.items_total:
+            return min(1.0, self.items_done / self.items_total)
+        return None
+
+    @property
+    def eta(self):
+        """Estimated number of seconds until the operation is done."""
+        fraction = self.fraction
+        if fraction is None or fraction == 0:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+
+class ProgressTracker:
+    """Thread-safe counter of progress that reports it to a callback.
+
+    :param callback: function called with :class:`Progress` on every
+        update, nothing is reported if not given
+    :param int bytes_total: number of all bytes
+    :param int items_total: number of all items
+
+    """
+
+    def __init__(self, callback=None, bytes_total=None, items_total=None):
+        """Initialize attributes."""
+        self.callback = callback
+        self.bytes_total = bytes_total
+        self.items_total = items_total
+        self.bytes_done = 0
+        self.items_done = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_total(self, bytes_total=0, items_total=0):
+        """Increase totals, e.g. when more work is discovered."""
+        with self._lock:
+            if bytes_total:
+                self.bytes_total = (self.bytes_total or 0) + bytes_total
+            if items_total:
+                self.items_total = (self.items_total or 0) + items_total
+            progress = self._snapshot()
+        self._report(progress)
+
+    def update(self, bytes_done=0, items_done=0):
+        """Add done bytes and items and report progress."""
+        with self._lock:
+            self.bytes_done += bytes_done
+            self.items_done += items_done
+            progress = self._snapshot()
+        self._report(progress)
+
+    def _snapshot(self):
+        """Return current progress."""
+        return Progress(self.bytes_done, self.bytes_total, self.items_done, self.items_total,
+                        time.monotonic() - self._started)
+
+    def _report(self, progress):
+        """Call the callback outside of the lock."""
+        if self.callback is not None:
+            self.callback(progress)
+
+
+def get_tracker(progress, bytes_total=None, items_total=None):
+    """Return tracker for ``progress`` argument of transfers and batch operations.
+
+    Trackers are passed on to nested operations, so they report to
+    the same counter. New tracker is created for callbacks and
+    ``None``, totals are only set on new trackers.
+    """
+    if isinstance(progress, ProgressTracker):
+        return progress
+    return ProgressTracker(progress, bytes_total=bytes_total, items_total=items_total)
+
+
+class TqdmProgress:
+    """Progress callback that shows a ``tqdm`` progress bar.
+
+    Bar shows transferred bytes if their total is known, otherwise
+    number of done items. Keyword arguments are passed to ``tqdm``.
+    """
+
+    def __init__(self, **kwargs):
+        """Initialize attributes."""
+        try:
+            import tqdm  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise ImportError("Progress bar requires tqdm, install it with 'pip install tqdm'.")
+
+        self._tqdm = tqdm.tqdm
+        self._kwargs = kwargs
+        self._bar = None
+        self._lock = threading.Lock()
+
+    def __call__(self, progress):
+        """Update the progress bar."""
+        with self._lock:
+            by_bytes = progress.bytes_total is not None
+            if self._bar is None:
+                kwargs = {'unit': 'B', 'unit_scale': True, 'unit_divisor': 1024} if by_bytes \
+                    else {'unit': 'it'}
+                kwargs.update(self._kwargs)
+                self._bar = self._tqdm(**kwargs)
+
+            self._bar.total = progress.bytes_total if by_bytes else progress.items_total
+            self._bar.n = progress.bytes_done if by_bytes else progress.items_done
+            self._bar.refresh()
+
+            if self._bar.total is not None and self._bar.n >= self._bar.total:
+                self.close()
+
+    def close(self):
+        """Close the progress bar."""
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
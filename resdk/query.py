@@ -7,13 +7,23 @@ Resolwe Query
 .. autoclass:: resdk.ResolweQuery
    :members:
 
+.. autoclass:: resdk.query.FeatureQuery
+   :members:
+
+.. autoclass:: resdk.query.MappingQuery
+   :members:
+
 """
 import collections
 import copy
 import logging
 import operator
+from concurrent.futures import ThreadPoolExecutor
 
+from resdk.progress import get_tracker
 from resdk.resources import DescriptorSchema, Process
+from resdk.resources.relation import share_sample_cache
+from resdk.tracing import start_span
 
 
 class ResolweQuery:
@@ -176,7 +186,7 @@ class ResolweQuery:
     def _clone(self):
         """Return copy of current object with empty cache."""
         # pylint: disable=protected-access
-        new_obj = ResolweQuery(self.resolwe, self.resource)
+        new_obj = self.__class__(self.resolwe, self.resource, slug_field=self.slug_field)
         new_obj._filters = copy.deepcopy(self._filters)
         new_obj._limit = self._limit
         new_obj._offset = self._offset
@@ -220,21 +230,29 @@ class ResolweQuery:
             # Already fetched.
             return
 
+        self._cache = [self._populate_resource(data) for data in self._fetch_payloads()]
+
+    def _fetch_payloads(self):
+        """Make request to the server and return payloads of objects."""
         filters = self._compose_filters()
-        if self.resource.query_method == 'GET':
-            items = self.api.get(**filters)
-        elif self.resource.query_method == 'POST':
-            items = self.api.post(filters)
-        else:
-            raise NotImplementedError(
-                'Unsupported query_method: {}'.format(self.resource.query_method))
+        with start_span('resdk.query.fetch', endpoint=self.endpoint,
+                        filter_keys=sorted(filters), page_size=self._limit,
+                        offset=self._offset) as span:
+            if self.resource.query_method == 'GET':
+                items = self.api.get(**filters)
+            elif self.resource.query_method == 'POST':
+                items = self.api.post(filters)
+            else:
+                raise NotImplementedError(
+                    'Unsupported query_method: {}'.format(self.resource.query_method))
 
-        # Extract data from paginated response
-        if isinstance(items, dict) and 'results' in items:
-            self._count = items['count']
-            items = items['results']
+            # Extract data from paginated response
+            if isinstance(items, dict) and 'results' in items:
+                self._count = items['count']
+                items = items['results']
 
-        self._cache = [self._populate_resource(data) for data in items]
+            span.set_attribute('results', len(items))
+            return items
 
     def clear_cache(self):
         """Clear cache."""
@@ -334,6 +352,40 @@ class ResolweQuery:
 
         self.clear_cache()
 
+    def iterate(self, chunk_size=100, progress=None):
+        """Iterate through query results in batches of ``chunk_size``.
+
+        Objects are fetched from the server one page at a time, which
+        keeps memory usage and response times low for large queries.
+        Results are not cached on the current query.
+
+        :param int chunk_size: number of objects fetched in one request
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of fetched objects
+
+        """
+        # pylint: disable=protected-access
+        if self._limit is not None or self._offset is not None:
+            raise ValueError("Iterating over sliced query is not supported.")
+
+        tracker = get_tracker(progress)
+        offset = 0
+        while True:
+            page = self._clone()
+            page._limit = chunk_size
+            page._offset = offset
+            page._fetch()
+            if offset == 0 and page._count is not None:
+                tracker.add_total(items_total=page._count)
+            tracker.update(items_done=len(page._cache))
+
+            yield from page._cache
+
+            offset += len(page._cache)
+            # Results that are not paginated are all returned at once.
+            if page._count is None or len(page._cache) < chunk_size or offset >= page._count:
+                break
+
     def all(self):
         """Return copy of the current queryset.
 
@@ -352,3 +404,244 @@ class ResolweQuery:
         new_query._add_filter({self.resource.full_search_paramater: text})
         # pylint: enable=protected-access
         return new_query
+
+
+class RelationQuery(ResolweQuery):
+    """Query of relations that resolves their samples together.
+
+    Relations fetched in the same request share a sample cache per
+    collection, so samples of all of them are fetched in batched
+    queries when samples of the first one are needed.
+    """
+
+    def _fetch(self):
+        """Make request to the server and populate cache."""
+        if self._cache is not None:
+            return
+
+        super()._fetch()
+        share_sample_cache(self._cache)
+
+
+def _to_dataframe(records, columns):
+    """Return pandas DataFrame of ``records`` (dicts) with ``columns``."""
+    try:
+        import pandas  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise ImportError("DataFrame output requires pandas, install it with "
+                          "'pip install pandas'.")
+
+    return pandas.DataFrame.from_records(
+        [{column: record.get(column, None) for column in columns} for record in records],
+        columns=columns,
+    )
+
+
+class KBQuery(ResolweQuery):
+    """Query of knowledge base endpoints with bulk lookups.
+
+    Lookups deduplicate the given ids, split them into batches limited
+    by ``batch_size`` ids and ``batch_bytes`` bytes of joined ids and
+    request the batches concurrently. If ``Resolwe`` has a KB cache,
+    only ids that are not cached are requested.
+
+    """
+
+    #: Maximal number of ids in one request
+    batch_size = 1000
+    #: Maximal length of joined ids in one request
+    batch_bytes = 32 * 1024
+
+    def _batches(self, ids):
+        """Split ``ids`` into batches."""
+        batch, size = [], 0
+        for id_ in ids:
+            if batch and (len(batch) >= self.batch_size
+                          or size + len(id_) + 1 > self.batch_bytes):
+                yield batch
+                batch, size = [], 0
+            batch.append(id_)
+            size += len(id_) + 1
+
+        if batch:
+            yield batch
+
+    def iterate_payloads(self, chunk_size=1000, progress=None):
+        """Iterate through payloads (dicts) of query results.
+
+        Payloads are fetched page by page like in :meth:`iterate`, but
+        no resource objects are created, which is considerably faster
+        for large number of results.
+
+        :param int chunk_size: number of objects fetched in one request
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of fetched objects
+
+        """
+        # pylint: disable=protected-access
+        if self._limit is not None or self._offset is not None:
+            raise ValueError("Iterating over sliced query is not supported.")
+
+        tracker = get_tracker(progress)
+        offset = 0
+        while True:
+            page = self._clone()
+            page._limit = chunk_size
+            page._offset = offset
+            items = page._fetch_payloads()
+            if offset == 0 and page._count is not None:
+                tracker.add_total(items_total=page._count)
+            tracker.update(items_done=len(items))
+
+            yield from items
+
+            offset += len(items)
+            if page._count is None or len(items) < chunk_size or offset >= page._count:
+                break
+
+    def _fetch_batch(self, field, batch, filters):
+        """Return payloads of objects with ``field`` in ``batch``.
+
+        Payloads are used directly, since creating resource objects
+        takes longer than the transfer in large lookups.
+        """
+        query = self.filter(**filters, **{'{}__in'.format(field): batch})
+        return list(query.iterate_payloads(chunk_size=self.batch_size))
+
+    def _bulk_lookup(self, field, ids, filters, workers, progress=None):
+        """Return payloads of objects with ``field`` in ``ids``.
+
+        Progress is reported in looked up ids.
+
+        :return: dict mapping each (deduplicated) id to list of
+            payloads of matching objects
+        :rtype: dict
+
+        """
+        ids = list(dict.fromkeys(str(id_) for id_ in ids))
+        tracker = get_tracker(progress)
+        tracker.add_total(items_total=len(ids))
+        cache = self.resolwe.kb_cache
+        namespace = None
+        found = {}
+
+        if cache is not None:
+            namespace = cache.get_namespace(
+                self.resolwe.url, self.endpoint, field, filters, dict(self._filters))
+            found = cache.get(namespace, ids)
+            tracker.update(items_done=len(found))
+
+        missing = [id_ for id_ in ids if id_ not in found]
+        fetched = {id_: [] for id_ in missing}
+        if missing:
+            batches = list(self._batches(missing))
+            self.logger.debug("Looking up %d ids on %s in %d batches",
+                              len(missing), self.endpoint, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch, payloads in zip(batches, executor.map(
+                        lambda batch: self._fetch_batch(field, batch, filters), batches)):
+                    for payload in payloads:
+                        fetched.setdefault(str(payload[field]), []).append(payload)
+                    tracker.update(items_done=len(batch))
+
+            if cache is not None:
+                cache.set(namespace, fetched)
+            found.update(fetched)
+
+        return {id_: found[id_] for id_ in ids}
+
+    @staticmethod
+    def _check_output(output):
+        """Raise an error if ``output`` format is not supported."""
+        if output not in ('dict', 'dataframe'):
+            raise ValueError("Output must be 'dict' or 'dataframe', not '{}'.".format(output))
+
+
+class FeatureQuery(KBQuery):
+    """Query of KB features with bulk lookup by feature id.
+
+    .. code-block:: python
+
+        features = res.feature.lookup(gene_ids, source='ENSEMBL', species='Homo sapiens')
+
+    """
+
+    def lookup(self, feature_ids, source, species, output='dict', workers=4, progress=None):
+        """Return features with given ids.
+
+        :param list feature_ids: feature ids (duplicates are ignored)
+        :param str source: feature source
+        :param str species: feature species
+        :param str output: ``'dict'`` for dict mapping feature ids to
+            ``Feature`` objects or ``'dataframe'`` for pandas DataFrame
+            with a row per feature
+        :param int workers: number of concurrent requests
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of looked up ids
+        :return: features, ids that were not found are omitted
+
+        """
+        self._check_output(output)
+        found = self._bulk_lookup(
+            'feature_id', feature_ids, {'source': source, 'species': species}, workers, progress)
+
+        if output == 'dataframe':
+            records = [payloads[0] for payloads in found.values() if payloads]
+            return _to_dataframe(records, sorted(self.resource.READ_ONLY_FIELDS))
+
+        return {
+            feature_id: self._populate_resource(payloads[0])
+            for feature_id, payloads in found.items() if payloads
+        }
+
+
+class MappingQuery(KBQuery):
+    """Query of KB mappings with bulk mapping of feature ids.
+
+    .. code-block:: python
+
+        mapping = res.mapping.map(gene_ids, source_db='ENSEMBL', target_db='NCBI')
+
+    """
+
+    def map(self, source_ids, source_db, target_db, source_species=None,
+            target_species=None, relation_type=None, output='dict', workers=4, progress=None):
+        """Map feature ids from ``source_db`` to ``target_db``.
+
+        :param list source_ids: feature ids in the source database
+            (duplicates are ignored)
+        :param str source_db: source database
+        :param str target_db: target database
+        :param str source_species: source species
+        :param str target_species: target species
+        :param str relation_type: relation type (crossdb, ortholog,
+            transcript, ...)
+        :param str output: ``'dict'`` for dict mapping source ids to
+            lists of target ids or ``'dataframe'`` for pandas DataFrame
+            with a row per mapping
+        :param int workers: number of concurrent requests
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of mapped ids
+        :return: mappings, ids that are not mapped are mapped to empty
+            lists in dict output
+
+        """
+        self._check_output(output)
+        filters = {
+            'source_db': source_db,
+            'target_db': target_db,
+            'source_species': source_species,
+            'target_species': target_species,
+            'relation_type': relation_type,
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        found = self._bulk_lookup('source_id', source_ids, filters, workers, progress)
+
+        if output == 'dataframe':
+            records = [payload for payloads in found.values() for payload in payloads]
+            return _to_dataframe(records, sorted(self.resource.READ_ONLY_FIELDS))
+
+        return {
+            source_id: [payload['target_id'] for payload in payloads]
+            for source_id, payloads in found.items()
+        }
@@ -0,0 +1,208 @@
+""".. Ignore pydocstyle D400.
+
+===========
+Remote file
+===========
+
+Read-only access to files on the Resolwe server without downloading them.
+
+.. autoclass:: resdk.remote_file.RemoteFile
+   :members:
+
+"""
+import collections
+import io
+import logging
+import re
+
+import requests
+
+from resdk.constants import REMOTE_FILE_BLOCK_SIZE, REMOTE_FILE_CACHE_SIZE, REMOTE_FILE_TIMEOUT
+
+
+class RemoteFile(io.RawIOBase):
+    """Seekable, read-only raw file object backed by HTTP range requests.
+
+    File content is fetched in blocks of ``block_size`` bytes. The most
+    recently used ``cache_size`` blocks are kept in memory, so repeated
+    reads of the same region (e.g. a file header) do not hit the
+    server again. Consecutive missing blocks are fetched in a single
+    request. If the server does not support range requests, the whole
+    file is fetched once and kept in memory.
+
+    :param str url: URL of the file
+    :param auth: authentication used in HTTP requests
+    :param int block_size: size of a single block in bytes
+    :param int cache_size: maximal number of cached blocks
+    :param str name: name of the file, defaults to ``url``
+    :param float timeout: timeout of HTTP requests in seconds
+
+    """
+
+    def __init__(self, url, auth=None, block_size=REMOTE_FILE_BLOCK_SIZE,
+                 cache_size=REMOTE_FILE_CACHE_SIZE, name=None, timeout=REMOTE_FILE_TIMEOUT):
+        """Initialize attributes."""
+        if block_size < 1:
+            raise ValueError("Block size must be a positive integer.")
+        if cache_size < 1:
+            raise ValueError("Cache size must be a positive integer.")
+
+        super().__init__()
+        self.logger = logging.getLogger(__name__)
+
+        self.url = url
+        self.auth = auth
+        self.name = name or url
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.timeout = timeout
+
+        self._size = None
+        self._position = 0
+        self._blocks = collections.OrderedDict()
+        # Whole content if the server does not support range requests
+        self._content = None
+
+    @property
+    def size(self):
+        """Return the size of the file in bytes."""
+        if self._size is None:
+            response = requests.head(
+                self.url, auth=self.auth, allow_redirects=True, timeout=self.timeout)
+            if not response.ok:
+                response.raise_for_status()
+
+            if 'Content-Length' in response.headers:
+                self._size = int(response.headers['Content-Length'])
+            else:
+                # Server did not report the size: ask for the first
+                # byte and read the total size from Content-Range.
+                self._size = self._parse_total_size(self._request_range(0, 0))
+
+        return self._size
+
+    def readable(self):
+        """Return ``True``: remote file can always be read."""
+        return True
+
+    def seekable(self):
+        """Return ``True``: remote file supports random access."""
+        return True
+
+    def tell(self):
+        """Return current stream position."""
+        self._checkClosed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Change stream position and return the new absolute position."""
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("Invalid whence ({}, should be 0, 1 or 2).".format(whence))
+
+        if position < 0:
+            raise ValueError("Negative seek position {}.".format(position))
+
+        self._position = position
+        return self._position
+
+    def readinto(self, buffer):
+        """Read bytes into a pre-allocated writable ``buffer``."""
+        self._checkClosed()
+        view = memoryview(buffer).cast('B')
+
+        end = min(self._position + len(view), self.size)
+        if self._position >= end:
+            return 0
+
+        first = self._position // self.block_size
+        last = (end - 1) // self.block_size
+
+        written = 0
+        for index, block in zip(range(first, last + 1), self._get_blocks(first, last)):
+            block_start = index * self.block_size
+            low = max(self._position, block_start) - block_start
+            high = min(end, block_start + len(block)) - block_start
+            view[written:written + high - low] = block[low:high]
+            written += high - low
+
+        self._position += written
+        return written
+
+    def close(self):
+        """Close the file and drop cached blocks."""
+        self._blocks.clear()
+        self._content = None
+        super().close()
+
+    def _get_blocks(self, first, last):
+        """Return blocks with indices from ``first`` to ``last`` (inclusive)."""
+        missing = [index for index in range(first, last + 1) if index not in self._blocks]
+
+        fetched = {}
+        if missing:
+            start = missing[0] * self.block_size
+            end = min((missing[-1] + 1) * self.block_size, self.size) - 1
+            content = self._get_range(start, end)
+            for index in range(missing[0], missing[-1] + 1):
+                offset = index * self.block_size - start
+                fetched[index] = content[offset:offset + self.block_size]
+
+        blocks = []
+        for index in range(first, last + 1):
+            block = fetched[index] if index in fetched else self._blocks[index]
+            self._blocks[index] = block
+            self._blocks.move_to_end(index)
+            blocks.append(block)
+
+        while len(self._blocks) > self.cache_size:
+            self._blocks.popitem(last=False)
+
+        return blocks
+
+    def _request_range(self, start, end):
+        """Request bytes from ``start`` to ``end`` (inclusive).
+
+        If the server ignores the Range header and returns the whole
+        file, the content is kept, so that it is not downloaded again.
+        """
+        response = requests.get(
+            self.url,
+            auth=self.auth,
+            headers={'Range': 'bytes={}-{}'.format(start, end)},
+            timeout=self.timeout,
+        )
+        if not response.ok:
+            response.raise_for_status()
+
+        if response.status_code != 206:
+            self.logger.warning("Server does not support range requests for %s", self.name)
+            self._content = response.content
+            self._size = len(self._content)
+
+        return response
+
+    def _get_range(self, start, end):
+        """Return content of the file from ``start`` to ``end`` (inclusive)."""
+        if self._content is None:
+            response = self._request_range(start, end)
+            if response.status_code == 206:
+                return response.content
+
+        return self._content[start:end + 1]
+
+    def _parse_total_size(self, response):
+        """Parse total file size from the response to a range request."""
+        if response.status_code != 206:
+            return len(response.content)
+
+        match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+        if not match:
+            raise ValueError("Unable to determine size of {}.".format(self.name))
+        return int(match.group(1))
@@ -11,7 +11,8 @@ Module contents:
 #. Parent logger for all modules in resdk library
 #. Handler STDOUT_HANDLER is "turned off" by default
 #. Handler configuration functions
-#. Override sys.excepthook to log all uncaught exceptions
+#. Override sys.excepthook to log all uncaught exceptions (when logging
+   is started)
 
 
 Parent logger
@@ -50,7 +51,9 @@ Log uncaught exceptions
 
 All python exceptions are handled by function, stored in
 ``sys.excepthook.`` By rewriting the default implementation, we can
-modify it for our puruses - to log all uncaught exceptions.
+modify it for our puruses - to log all uncaught exceptions. The default
+implementation is only replaced when ``start_logging()`` is called, so
+importing resdk does not change the behaviour of the application.
 
 Note#1: Modified behaviour (logging of all uncaught exceptions) applies
 only when runing in non-interactive mode.
@@ -160,6 +163,10 @@ def start_logging(logging_level=logging.INFO):
     """
     log_to_stdout(is_on=STDOUT_LOG_ON, level=logging_level or STDOUT_LOG_LEVEL)
 
+    # Rewrite the default implementation os sys.excepthook to log all
+    # uncaught exceptions:
+    sys.excepthook = _log_all_uncaught_exceptions
+
 
 def _log_all_uncaught_exceptions(exc_type, exc_value, exc_traceback):
     """Log all uncaught exceptions in non-interactive mode.
@@ -178,8 +185,3 @@ def _log_all_uncaught_exceptions(exc_type, exc_value, exc_traceback):
 
     sys.__excepthook__(exc_type, exc_value, exc_traceback)
     return
-
-
-# Rewrite the default implementation os sys.excepthook to log all
-# uncaught exceptions:
-sys.excepthook = _log_all_uncaught_exceptions
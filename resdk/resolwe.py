@@ -13,23 +13,39 @@ import logging
 import ntpath
 import os
 import re
-import uuid
+import weakref
 from urllib.parse import urljoin
 
 import requests
 import slumber
-# Needed because we mock requests in test_resolwe.py
-from requests.exceptions import ConnectionError  # pylint: disable=redefined-builtin
 
-from .constants import CHUNK_SIZE
+from .auth import ResAuth
+from .constants import CHUNK_SIZE, DEFAULT_URL, URL_REGEX
 from .exceptions import ValidationError, handle_http_exception
-from .query import ResolweQuery
+from .file_transfer import FileTransferMixin
+from .instrumentation import Instrumentation
+from .query import FeatureQuery, MappingQuery, RelationQuery, ResolweQuery
 from .resources import Collection, Data, DescriptorSchema, Group, Process, Relation, Sample, User
 from .resources.base import BaseResource
+from .resources.input_schema import get_input_schema
 from .resources.kb import Feature, Mapping
-from .resources.utils import get_collection_id, get_data_id, is_data, iterate_fields
+from .resources.utils import get_collection_id
+from .tracing import start_span
+from .transfer import ChunkSize, TransferScheduler
+from .upload_cache import UploadCache
 
-DEFAULT_URL = 'http://localhost:8000'
+# Instances whose connections are reset in forked child processes.
+_INSTANCES = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    """Drop connections and locks inherited from the parent process."""
+    for resolwe in list(_INSTANCES):
+        resolwe._reset_connections()  # pylint: disable=protected-access
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 class ResolweResource(slumber.Resource):
@@ -49,7 +65,7 @@ class ResolweAPI(slumber.API):
     resource_class = ResolweResource
 
 
-class Resolwe:
+class Resolwe(FileTransferMixin):
     """Connect to a Resolwe server.
 
     :param username: user's username
@@ -58,6 +74,50 @@ class Resolwe:
     :type password: str
     :param url: Resolwe server instance
     :type url: str
+    :param download_cache: cache of downloaded files shared between
+        projects and processes
+    :type download_cache: ~resdk.download_cache.DownloadCache
+    :param instrumentation: request hooks and metrics, new instance is
+        created if not given
+    :type instrumentation: ~resdk.instrumentation.Instrumentation
+    :param lazy: do not connect to the server until the first request,
+        i.e. skip the check that the server is reachable and postpone
+        login
+    :type lazy: bool
+    :param session_cache: on-disk cache of sessions, used to skip the
+        login if a session of the same user on the same server exists
+    :type session_cache: ~resdk.session_cache.SessionCache
+    :param kb_cache: persistent cache of knowledge base lookups
+    :type kb_cache: ~resdk.kb_cache.KBCache
+    :param transfer_scheduler: limits of concurrent uploads and
+        downloads and their total rate, new instance with default
+        limits is created if not given
+    :type transfer_scheduler: ~resdk.transfer.TransferScheduler
+    :param upload_cache: cache of uploaded files keyed by their
+        content, new in-memory cache is created if not given
+    :type upload_cache: ~resdk.upload_cache.UploadCache
+    :param compress_uploads: compress text files (FASTQ, GTF, CSV, ...)
+        with gzip before upload, ``.gz`` is appended to their names
+    :type compress_uploads: bool
+    :param chunk_size: size of transferred chunks in bytes or instance
+        of ``AdaptiveChunkSize`` that adapts it to measured transfers,
+        defaults to 8 MB
+    :type chunk_size: int or ~resdk.transfer.ChunkSize
+
+    Resolwe instances can be pickled, e.g. to be sent to workers of a
+    process pool. Pickled instance contains the session of the logged
+    in user, but not the password, so all copies share one session:
+
+    .. code-block:: python
+
+        res = resdk.Resolwe('user', 'password', url, lazy=True)
+        with ProcessPoolExecutor() as executor:
+            executor.map(partial(process_sample, res), sample_ids)
+
+    Copies keep the request hooks of ``instrumentation`` that can be
+    pickled (e.g. module level functions), other hooks are dropped with
+    a warning. Metrics are not copied, each copy collects its own.
+    Caches are pickled by their settings only.
 
     """
 
@@ -79,6 +139,12 @@ class Resolwe:
         'user': 'username',
         'group': 'name',
     }
+    # Map ResolweQuery name to it's class, if it is not ResolweQuery
+    query_class_mapping = {
+        'feature': FeatureQuery,
+        'mapping': MappingQuery,
+        'relation': RelationQuery,
+    }
 
     data = None
     collection = None
@@ -91,13 +157,37 @@ class Resolwe:
     feature = None
     mapping = None
 
-    def __init__(self, username=None, password=None, url=None):
+    #: Cache of downloaded files (instance of ``DownloadCache``)
+    download_cache = None
+    #: Request hooks and metrics (instance of ``Instrumentation``)
+    instrumentation = None
+    #: Cache of login sessions (instance of ``SessionCache``)
+    session_cache = None
+    #: Cache of knowledge base lookups (instance of ``KBCache``)
+    kb_cache = None
+    #: Limits of concurrent transfers (instance of ``TransferScheduler``)
+    transfer_scheduler = None
+    #: Cache of uploaded files (instance of ``UploadCache``)
+    upload_cache = None
+    #: Compress text files with gzip before upload
+    compress_uploads = False
+    #: Size of transferred chunks (instance of ``ChunkSize``)
+    chunk_size = None
+    #: HTTP session with connection pool used by the API
+    session = None
+
+    def __init__(self, username=None, password=None, url=None, download_cache=None,
+                 instrumentation=None, lazy=False, session_cache=None, kb_cache=None,
+                 transfer_scheduler=None, upload_cache=None, compress_uploads=False,
+                 chunk_size=None):
         """Initialize attributes."""
         if url is None:
             # Try to get URL from environmental variable, otherwise fallback to default.
             url = os.environ.get('RESOLWE_HOST_URL', DEFAULT_URL)
 
-        self._validate_url(url)
+        self.instrumentation = instrumentation or Instrumentation()
+
+        self._validate_url(url, connect=not lazy)
 
         if username is None:
             username = os.environ.get('RESOLWE_API_USERNAME', None)
@@ -106,16 +196,78 @@ class Resolwe:
             password = os.environ.get('RESOLWE_API_PASSWORD', None)
 
         self.url = url
-        self._login(username=username, password=password)
+        self.download_cache = download_cache
+        self.session_cache = session_cache
+        self.kb_cache = kb_cache
+        self.transfer_scheduler = transfer_scheduler or TransferScheduler()
+        self.upload_cache = upload_cache or UploadCache()
+        self.compress_uploads = compress_uploads
+        if not isinstance(chunk_size, ChunkSize):
+            chunk_size = ChunkSize(chunk_size or CHUNK_SIZE)
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        self._login(username=username, password=password, lazy=lazy)
 
         self.logger = logging.getLogger(__name__)
+        _INSTANCES.add(self)
 
-    def _validate_url(self, url):
+    def __getstate__(self):
+        """Return compact picklable state."""
+        return {
+            'url': self.url,
+            'auth': self.auth,
+            'instrumentation': self.instrumentation,
+            'download_cache': self.download_cache,
+            'session_cache': self.session_cache,
+            'kb_cache': self.kb_cache,
+            'transfer_scheduler': self.transfer_scheduler,
+            'upload_cache': self.upload_cache,
+            'compress_uploads': self.compress_uploads,
+            'chunk_size': self.chunk_size,
+        }
+
+    def __setstate__(self, state):
+        """Restore instance without connecting to the server."""
+        self.url = state['url']
+        self.download_cache = state['download_cache']
+        self.session_cache = state['session_cache']
+        self.kb_cache = state['kb_cache']
+        self.transfer_scheduler = state['transfer_scheduler']
+        self.upload_cache = state['upload_cache']
+        self.compress_uploads = state['compress_uploads']
+        self.chunk_size = state['chunk_size']
+        self.instrumentation = state['instrumentation']
+        self.auth = state['auth']
+        self.auth.instrumentation = self.instrumentation
+        self.session = requests.Session()
+        self.api = ResolweAPI(urljoin(self.url, '/api/'), self.auth, append_slash=False,
+                              session=self.session)
+        self._initialize_queries()
+        self.logger = logging.getLogger(__name__)
+        _INSTANCES.add(self)
+
+    def _reset_connections(self):
+        """Replace connection pool and locks inherited from the parent process.
+
+        Sockets of the pool are shared with the parent process after
+        fork, so they must not be used in the child.
+        """
+        if self.session is not None:
+            for prefix in ('https://', 'http://'):
+                self.session.mount(prefix, requests.adapters.HTTPAdapter())
+        self.auth._reset_lock()  # pylint: disable=protected-access
+        self.transfer_scheduler._reset()  # pylint: disable=protected-access
+
+    def _validate_url(self, url, connect=True):
         if not re.match(r'https?://', url):
             raise ValueError("Server url must start with http(s)://")
 
+        if not connect:
+            return
+
         try:
-            requests.get(urljoin(url, '/api/'))
+            requests.get(
+                urljoin(url, '/api/'), auth=ResAuth(url=url, instrumentation=self.instrumentation))
         except requests.exceptions.ConnectionError:
             raise ValueError("The site can't be reached: {}".format(url))
 
@@ -123,11 +275,14 @@ class Resolwe:
         """Initialize ResolweQuery's."""
         for resource, query_name in self.resource_query_mapping.items():
             slug_field = self.slug_field_mapping.get(query_name, 'slug')
-            setattr(self, query_name, ResolweQuery(self, resource, slug_field=slug_field))
-
-    def _login(self, username=None, password=None):
-        self.auth = ResAuth(username, password, self.url)
-        self.api = ResolweAPI(urljoin(self.url, '/api/'), self.auth, append_slash=False)
+            query_class = self.query_class_mapping.get(query_name, ResolweQuery)
+            setattr(self, query_name, query_class(self, resource, slug_field=slug_field))
+
+    def _login(self, username=None, password=None, lazy=False):
+        self.auth = ResAuth(username, password, self.url, instrumentation=self.instrumentation,
+                            lazy=lazy, session_cache=self.session_cache)
+        self.api = ResolweAPI(urljoin(self.url, '/api/'), self.auth, append_slash=False,
+                              session=self.session)
         self._initialize_queries()
 
     def login(self, username=None, password=None):
@@ -171,8 +326,7 @@ class Resolwe:
         if isinstance(path, dict) and 'file' in path and 'file_temp' in path:
             return path
 
-        url_regex = r'^(https?|ftp)://[-A-Za-z0-9\+&@#/%?=~_|!:,.;]*[-A-Za-z0-9\+&@#/%=~_|]$'
-        if re.match(url_regex, path):
+        if re.match(URL_REGEX, path):
             file_name = path.split('/')[-1].split('#')[0].split('?')[0]
             return {
                 'file': file_name,
@@ -202,67 +356,38 @@ class Resolwe:
         return self.process.get(slug=slug)
         # pylint: enable=no-member
 
-    def _process_inputs(self, inputs, process):
+    def _process_inputs(self, inputs, process, progress=None):
         """Process input fields.
 
-        Processing includes:
+        Inputs are validated with the compiled input schema of the
+        process before any file is uploaded. Processing includes:
         * wrapping ``list:*`` to the list if they are not already
         * dehydrating values of ``data:*`` and ``list:data:*`` fields
         * uploading files in ``basic:file:`` and ``list:basic:file:``
-          fields
+          fields, all local files are uploaded concurrently before
+          the payload is built, ``progress`` callback is called with
+          their progress
         """
-        def deep_copy(current):
-            """Copy inputs."""
-            if isinstance(current, dict):
-                return {key: deep_copy(val) for key, val in current.items()}
-            elif isinstance(current, list):
-                return [deep_copy(val) for val in current]
-            elif is_data(current):
-                return current.id
-            else:
-                return current
-
-        # leave original intact
-        inputs = deep_copy(inputs)
-
-        try:
-            for schema, fields in iterate_fields(inputs, process.input_schema):
-                field_name = schema['name']
-                field_type = schema['type']
-                field_value = fields[field_name]
+        schema = get_input_schema(process)
 
-                # XXX: Remove this when supported on server.
-                # Wrap `list:` fields into list if they are not already
-                if field_type.startswith('list:') and not isinstance(field_value, list):
-                    fields[field_name] = [field_value]
-                    field_value = fields[field_name]  # update value for the rest of the loop
+        errors = schema.validate(inputs)
+        if errors:
+            raise ValidationError('\n'.join(errors))
 
-                # Dehydrate `data:*` fields
-                if field_type.startswith('data:'):
-                    fields[field_name] = get_data_id(field_value)
+        uploaded = self._upload_files(schema.files(inputs), progress=progress,
+                                      file_name_regexes=schema.file_name_regexes(inputs))
 
-                # Dehydrate `list:data:*` fields
-                elif field_type.startswith('list:data:'):
-                    fields[field_name] = [get_data_id(data) for data in field_value]
+        def process_file(value):
+            """Return uploaded file or process the file field."""
+            if isinstance(value, str) and value in uploaded:
+                return uploaded[value]
+            return self._process_file_field(value)
 
-                # Upload files in `basic:file:` fields
-                elif field_type == 'basic:file:':
-                    fields[field_name] = self._process_file_field(field_value)
-
-                # Upload files in list:basic:file:` fields
-                elif field_type == 'list:basic:file:':
-                    fields[field_name] = [self._process_file_field(obj) for obj in field_value]
-
-        except KeyError as key_error:
-            field_name = key_error.args[0]
-            slug = process.slug
-            raise ValidationError(
-                "Field '{}' not in process '{}' input schema.".format(field_name, slug))
-
-        return inputs
+        # Original inputs are left intact.
+        return schema.dehydrate(inputs, process_file)
 
     def run(self, slug=None, input={}, descriptor=None,  # pylint: disable=redefined-builtin
-            descriptor_schema=None, collection=None, data_name=''):
+            descriptor_schema=None, collection=None, data_name='', progress=None):
         """Run process and return the corresponding Data object.
 
         1. Upload files referenced in inputs
@@ -281,6 +406,8 @@ class Resolwe:
         :param int/resource collection: Collection resource or it's id
             into which data object should be included
         :param str data_name: Default name of data object
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of uploaded files
 
         :return: data object that was just created
         :rtype: Data object
@@ -288,33 +415,37 @@ class Resolwe:
         if ((descriptor and not descriptor_schema) or (not descriptor and descriptor_schema)):
             raise ValueError("Set both or neither descriptor and descriptor_schema.")
 
-        process = self._get_process(slug)
-        data = {
-            'process': {'slug': process.slug},
-            'input': self._process_inputs(input, process),
-        }
+        with start_span('resdk.run', process=slug) as span:
+            process = self._get_process(slug)
+            data = {
+                'process': {'slug': process.slug},
+                'input': self._process_inputs(input, process, progress=progress),
+            }
 
-        if descriptor and descriptor_schema:
-            data['descriptor'] = descriptor
-            data['descriptor_schema'] = {'slug': descriptor_schema}
+            if descriptor and descriptor_schema:
+                data['descriptor'] = descriptor
+                data['descriptor_schema'] = {'slug': descriptor_schema}
 
-        if collection:
-            data['collection'] = {'id': get_collection_id(collection)}
+            if collection:
+                data['collection'] = {'id': get_collection_id(collection)}
 
-        if data_name:
-            data['name'] = data_name
+            if data_name:
+                data['name'] = data_name
 
-        model_data = self.api.data.post(data)
-        return Data(resolwe=self, **model_data)
+            model_data = self.api.data.post(data)
+            span.set_attribute('data_id', model_data.get('id'))
+            return Data(resolwe=self, **model_data)
 
-    def get_or_run(self, slug=None, input={}):  # pylint: disable=redefined-builtin
+    def get_or_run(self, slug=None, input={}, progress=None):  # pylint: disable=redefined-builtin
         """Return existing object if found, otherwise create new one.
 
         :param str slug: Process slug (human readable unique identifier)
         :param dict input: Input values
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of uploaded files
         """
         process = self._get_process(slug)
-        inputs = self._process_inputs(input, process)
+        inputs = self._process_inputs(input, process, progress=progress)
 
         data = {
             'process': process.slug,
@@ -324,113 +455,6 @@ class Resolwe:
         model_data = self.api.data.get_or_create.post(data)
         return Data(resolwe=self, **model_data)
 
-    def _upload_file(self, file_path):
-        """Upload a single file on the platform.
-
-        File is uploaded in chunks of size CHUNK_SIZE bytes.
-
-        :param str file_path: File path
-
-        """
-        response = None
-        chunk_number = 0
-        session_id = str(uuid.uuid4())
-        file_uid = str(uuid.uuid4())
-        file_size = os.path.getsize(file_path)
-        base_name = os.path.basename(file_path)
-
-        with open(file_path, 'rb') as file_:
-            while True:
-                chunk = file_.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-
-                for i in range(5):
-                    if i > 0 and response is not None:
-                        self.logger.warning(
-                            "Chunk upload failed (error %s): repeating for chunk number %s",
-                            response.status_code,
-                            chunk_number)
-
-                    response = requests.post(
-                        urljoin(self.url, 'upload/'),
-                        auth=self.auth,
-
-                        # request are smart and make
-                        # 'CONTENT_TYPE': 'multipart/form-data;''
-                        files={'file': (base_name, chunk)},
-
-                        # stuff in data will be in response.POST on server
-                        data={
-                            '_chunkSize': CHUNK_SIZE,
-                            '_totalSize': file_size,
-                            '_chunkNumber': chunk_number,
-                            '_currentChunkSize': len(chunk)},
-                        headers={
-                            'Session-Id': session_id,
-                            'X-File-Uid': file_uid}
-                    )
-
-                    if response.status_code in [200, 201]:
-                        break
-                else:
-                    # Upload of a chunk failed (5 retries)
-                    return None
-
-                progress = 100. * (chunk_number * CHUNK_SIZE + len(chunk)) / file_size
-                message = "{:.0f} % Uploaded {}".format(progress, file_path)
-                self.logger.info(message)
-                chunk_number += 1
-
-        return response.json()['files'][0]['temp']
-
-    def _download_files(self, files, download_dir=None):  # pylint: disable=redefined-builtin
-        """Download files.
-
-        Download files from the Resolwe server to the download
-        directory (defaults to the current working directory).
-
-        :param files: files to download
-        :type files: list of file URI
-        :param download_dir: download directory
-        :type download_dir: string
-        :rtype: None
-
-        """
-        if not download_dir:
-            download_dir = os.getcwd()
-
-        if not os.path.isdir(download_dir):
-            raise ValueError("Download directory does not exist: {}".format(download_dir))
-
-        if not files:
-            self.logger.info("No files to download.")
-
-        else:
-            self.logger.info("Downloading files to %s:", download_dir)
-
-            for file_uri in files:
-                file_name = os.path.basename(file_uri)
-                file_path = os.path.dirname(file_uri)
-                file_url = urljoin(self.url, 'data/{}'.format(file_uri))
-
-                # Remove data id from path
-                file_path = file_path.split('/', 1)[1] if '/' in file_path else ''
-                full_path = os.path.join(download_dir, file_path)
-                if not os.path.isdir(full_path):
-                    os.makedirs(full_path)
-
-                self.logger.info("* %s", os.path.join(file_path, file_name))
-
-                with open(os.path.join(download_dir, file_path, file_name), 'wb') as file_handle:
-                    response = requests.get(file_url, stream=True, auth=self.auth)
-
-                    if not response.ok:
-                        response.raise_for_status()
-                    else:
-                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                            file_handle.write(chunk)
-
     def data_usage(self, **query_params):
         """Get per-user data usage information.
 
@@ -439,62 +463,3 @@ class Resolwe:
         data for **all** users.
         """
         return self.api.base.data_usage.get(**query_params)
-
-
-class ResAuth(requests.auth.AuthBase):
-    """HTTP Resolwe Authentication for Request object.
-
-    :param str username: user's username
-    :param str password: user's password
-    :param str url: Resolwe server address
-
-    """
-
-    #: Session ID used in HTTP requests
-    sessionid = None
-    #: CSRF token used in HTTP requests
-    csrftoken = None
-
-    def __init__(self, username=None, password=None, url=DEFAULT_URL):
-        """Authenticate user on Resolwe server."""
-        self.logger = logging.getLogger(__name__)
-
-        self.username = username
-        self.url = url
-
-        if not username and not password:
-            return
-
-        payload = {'username': username, 'password': password}
-
-        try:
-            response = requests.post(urljoin(url, '/rest-auth/login/'), data=payload)
-        except ConnectionError:
-            raise ValueError('Server not accessible on {}. Wrong url?'.format(url))
-
-        status_code = response.status_code
-        if status_code in [400, 403]:
-            msg = 'Response HTTP status code {}. Invalid credentials?'.format(status_code)
-            raise ValueError(msg)
-
-        if not ('sessionid' in response.cookies and 'csrftoken' in response.cookies):
-            raise Exception('Missing sessionid or csrftoken. Invalid credentials?')
-
-        self.sessionid = response.cookies['sessionid']
-        self.csrftoken = response.cookies['csrftoken']
-        self.url = url
-        # self.subscribe_id = str(uuid.uuid4())
-
-    def __call__(self, request):
-        """Set request headers."""
-        if self.sessionid and self.csrftoken:
-            request.headers['Cookie'] = 'csrftoken={}; sessionid={}'.format(
-                self.csrftoken, self.sessionid)
-            request.headers['X-CSRFToken'] = self.csrftoken
-
-        request.headers['referer'] = self.url
-
-        # Not needed until we support HTTP Push with the API
-        # if r.path_url != '/upload/':
-        #     r.headers['X-SubscribeID'] = self.subscribe_id
-        return request
@@ -4,6 +4,7 @@ import logging
 import operator
 
 from ..constants import ALL_PERMISSIONS
+from ..tracing import start_span
 from ..utils.decorators import assert_object_exists
 from .permissions import PermissionsManager
 from .utils import parse_resolwe_datetime
@@ -75,7 +76,8 @@ class BaseResource:
 
     def update(self):
         """Update resource fields from the server."""
-        response = self.api(self.id).get()
+        with start_span('resdk.resource.update', endpoint=self.endpoint, id=self.id):
+            response = self.api(self.id).get()
         self._update_fields(response)
 
     def _dehydrate_resources(self, obj):
@@ -129,7 +131,9 @@ class BaseResource:
                     payload[field_name] = self._dehydrate_resources(getattr(self, field_name))
 
             if payload:
-                response = self.api(self.id).patch(payload)
+                with start_span('resdk.resource.save', endpoint=self.endpoint, id=self.id,
+                                fields=sorted(payload)):
+                    response = self.api(self.id).patch(payload)
                 self._update_fields(response)
 
         else:  # create resource
@@ -139,7 +143,8 @@ class BaseResource:
             payload = {field_name: self._dehydrate_resources(getattr(self, field_name))
                        for field_name in field_names if getattr(self, field_name) is not None}
 
-            response = self.api.post(payload)
+            with start_span('resdk.resource.save', endpoint=self.endpoint, fields=sorted(payload)):
+                response = self.api.post(payload)
             self._update_fields(response)
 
     def delete(self, force=False):
@@ -156,7 +161,8 @@ class BaseResource:
             if user_input.strip().lower() != 'y':
                 return
 
-        self.api(self.id).delete()
+        with start_span('resdk.resource.delete', endpoint=self.endpoint, id=self.id):
+            self.api(self.id).delete()
 
     def __setattr__(self, name, value):
         """Detect changes of read only fields.
@@ -173,6 +179,25 @@ class BaseResource:
 
         super().__setattr__(name, value)
 
+    def __getstate__(self):
+        """Return compact picklable state.
+
+        Only ``Resolwe`` instance, payload received from the server and
+        locally changed (not yet saved) values of plain fields are
+        pickled. Cached related objects are fetched again when needed.
+        """
+        changes = {
+            name: value for name, value in self.__dict__.items()
+            if name in self.fields() and value != self._original_values.get(name, None)
+        }
+        return {'resolwe': self.resolwe, 'payload': self._original_values, 'changes': changes}
+
+    def __setstate__(self, state):
+        """Restore resource from server payload and local changes."""
+        self.__init__(state['resolwe'], **state['payload'])
+        for name, value in state['changes'].items():
+            setattr(self, name, value)
+
     def __eq__(self, obj):
         """Evaluate if objects are the same."""
         if (self.__class__ == obj.__class__ and self.resolwe.url == obj.resolwe.url
@@ -219,6 +244,8 @@ class BaseResolweResource(BaseResource):
         self.slug = None
         #: resource version
         self.version = None
+        # Parsed datetime fields with their original values
+        self._datetimes = {}
 
         BaseResource.__init__(self, resolwe, **model_data)
 
@@ -259,17 +286,30 @@ class BaseResolweResource(BaseResource):
 
         return self._contributor
 
+    def _get_datetime(self, field):
+        """Return parsed value of datetime ``field``.
+
+        Values are parsed once and parsed again only if the original
+        value changes (e.g. on update).
+        """
+        value = self._original_values[field]
+        cached = self._datetimes.get(field, None)
+        if cached is None or cached[0] != value:
+            cached = (value, parse_resolwe_datetime(value))
+            self._datetimes[field] = cached
+        return cached[1]
+
     @property
     @assert_object_exists
     def created(self):
         """Creation time."""
-        return parse_resolwe_datetime(self._original_values['created'])
+        return self._get_datetime('created')
 
     @property
     @assert_object_exists
     def modified(self):
         """Modification time."""
-        return parse_resolwe_datetime(self._original_values['modified'])
+        return self._get_datetime('modified')
 
     def update(self):
         """Clear permissions cache and update the object."""
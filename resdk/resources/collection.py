@@ -1,11 +1,13 @@
 """Collection resources."""
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from resdk.shortcuts.collection import CollectionRelationsMixin
 
 from ..utils.decorators import assert_object_exists
 from .base import BaseResolweResource
 from .descriptor import DescriptorSchema
+from .utils import get_field_value, get_process_file_fields, get_sample_id, match_pattern
 
 
 class BaseCollection(BaseResolweResource):
@@ -30,6 +32,8 @@ class BaseCollection(BaseResolweResource):
     WRITABLE_FIELDS = BaseResolweResource.WRITABLE_FIELDS + (
         'description', 'descriptor', 'descriptor_schema', 'settings', 'tags',
     )
+    #: Fields of Data objects needed to build the file manifest
+    MANIFEST_DATA_FIELDS = ('id', 'checksum', 'modified', 'output', 'process')
 
     def __init__(self, resolwe, **model_data):
         """Initialize attributes."""
@@ -85,16 +89,149 @@ class BaseCollection(BaseResolweResource):
         """
         return sorted({datum.process.type for datum in self.data})
 
-    def files(self, file_name=None, field_name=None):
-        """Return list of files in resource."""
-        file_list = []
-        for data in self.data:
-            file_list.extend(fname for fname in data.files(file_name=file_name,
-                                                           field_name=field_name))
+    def file_manifest(self, file_name=None, field_name=None, pattern=None, process_type=None,
+                      chunk_size=100, workers=8):
+        """Return manifest of files of all associated Data objects.
 
-        return file_list
+        Data objects are fetched in pages of ``chunk_size`` objects with
+        only the fields needed to locate their files. Output schemas
+        are processed once per process and directories are listed
+        concurrently in ``workers`` threads.
 
-    def download(self, file_name=None, field_name=None, download_dir=None):
+        Files are listed in the order of Data objects. Files of each
+        Data object are listed in the order of its output fields,
+        followed by the contents of its directories.
+
+        :param file_name: name of file or directory
+        :type file_name: string
+        :param field_name: output field name
+        :type field_name: string
+        :param pattern: glob pattern (or a list of them) or compiled
+            regular expression that file paths must match
+        :type pattern: string, list or compiled regular expression
+        :param process_type: include only Data objects with process
+            type starting with ``process_type`` (filtered on the server)
+        :type process_type: string
+        :param chunk_size: number of Data objects fetched in one request
+        :type chunk_size: int
+        :param workers: number of concurrent directory listings
+        :type workers: int
+        :return: dicts with ``data_id``, ``file_name`` (path relative
+            to Data object's directory), ``field_name``,
+            ``process_type`` and ``size`` keys
+        :rtype: list
+
+        """
+        return self._file_manifest(
+            file_name, field_name, pattern, process_type, chunk_size, workers)[0]
+
+    def _file_manifest(self, file_name=None, field_name=None, pattern=None, process_type=None,
+                       chunk_size=100, workers=8):
+        """Return file manifest and versions of associated Data objects."""
+        if field_name and not isinstance(field_name, str):
+            raise ValueError("Invalid argument value `field_name`.")
+        if field_name and not field_name.startswith('output.'):
+            field_name = 'output.{}'.format(field_name)
+
+        filters = {'fields': ','.join(self.MANIFEST_DATA_FIELDS)}
+        if process_type:
+            filters['type'] = process_type
+
+        # Entries are paired with sort keys, so that the manifest lists
+        # files of each Data object (in order) before its directories.
+        manifest = []
+        directories = []
+        data_versions = {}
+
+        for data_index, data in enumerate(self.data.filter(**filters).iterate(
+                chunk_size=chunk_size)):
+            data_versions[data.id] = data._download_version()  # pylint: disable=protected-access
+
+            for path, field_type in get_process_file_fields(data.process):
+                value = get_field_value(data.output, path)
+                if value is None or (field_name is not None and field_name != path):
+                    continue
+
+                key = 'dir' if field_type.endswith(':dir:') else 'file'
+                for element in (value if field_type.startswith('list:') else [value]):
+                    if key not in element:
+                        raise KeyError("Item {} does not contain '{}' key.".format(path, key))
+                    if file_name is not None and file_name != element[key]:
+                        continue
+
+                    entry = {
+                        'data_id': data.id,
+                        'file_name': element[key],
+                        'field_name': path,
+                        'process_type': data.process.type,
+                        'size': element.get('size', None),
+                    }
+                    if key == 'dir':
+                        directories.append(
+                            ((data_index, 1, len(directories)), data, entry))
+                    elif match_pattern(entry['file_name'], pattern):
+                        manifest.append(((data_index, 0, len(manifest)), entry))
+
+        manifest.extend(
+            (order, entry) for order, entry in self._list_directories(directories, workers)
+            if match_pattern(entry['file_name'], pattern)
+        )
+        manifest.sort(key=lambda item: item[0])
+
+        return [entry for _, entry in manifest], data_versions
+
+    @staticmethod
+    def _list_directories(directories, workers):
+        """Recursively list files in ``directories`` concurrently.
+
+        :param directories: tuples of sort key, Data object and
+            manifest entry of its directory
+        :param int workers: number of concurrent requests
+        :return: tuples of sort key and manifest entry of all files in
+            directories; sorting by key lists files of a directory (in
+            listing order) before the files of its subdirectories
+        :rtype: list
+
+        """
+        files = []
+        if not directories:
+            return files
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # pylint: disable=protected-access
+            pending = {
+                executor.submit(data._list_dir, entry['file_name']): (order, data, entry)
+                for order, data, entry in directories
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    order, data, entry = pending.pop(future)
+                    for index, obj in enumerate(future.result()):
+                        child = dict(
+                            entry,
+                            file_name='{}/{}'.format(entry['file_name'], obj['name']),
+                            size=obj.get('size', None),
+                        )
+                        if obj['type'] == 'directory':
+                            child_future = executor.submit(data._list_dir, child['file_name'])
+                            pending[child_future] = (order + (1, index), data, child)
+                        else:
+                            files.append((order + (0, index), child))
+            # pylint: enable=protected-access
+
+        return files
+
+    def files(self, file_name=None, field_name=None, pattern=None, process_type=None):
+        """Return list of files in resource.
+
+        See :meth:`file_manifest` for description of the arguments.
+        """
+        manifest = self.file_manifest(file_name, field_name, pattern, process_type)
+        return [entry['file_name'] for entry in manifest]
+
+    def download(self, file_name=None, field_name=None, download_dir=None, pattern=None,
+                 process_type=None, progress=None):
         """Download output files of associated Data objects.
 
         Download files from the Resolwe server to the download
@@ -106,26 +243,37 @@ class BaseCollection(BaseResolweResource):
         :type field_name: string
         :param download_dir: download path
         :type download_dir: string
+        :param pattern: glob pattern (or a list of them) or compiled
+            regular expression that file paths must match
+        :type pattern: string, list or compiled regular expression
+        :param process_type: download only files of Data objects with
+            process type starting with ``process_type``
+        :type process_type: string
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of downloads
         :rtype: None
 
         Collections can contain multiple Data objects and Data objects
         can contain multiple files. All files are downloaded by default,
-        but may be filtered by file name or Data object type:
+        but may be filtered by file name, output field, file path
+        pattern or Data object type. Files are filtered before any
+        transfer starts:
 
         * re.collection.get(42).download(file_name='alignment7.bam')
-        * re.collection.get(42).download(data_type='bam')
+        * re.collection.get(42).download(field_name='bam')
+        * re.collection.get(42).download(pattern=['*.bam', '*.bai'],
+          process_type='data:alignment:bam:')
 
         """
-        files = []
+        manifest, data_versions = self._file_manifest(file_name, field_name, pattern, process_type)
+        files = ['{}/{}'.format(entry['data_id'], entry['file_name']) for entry in manifest]
+        file_sizes = {file_uri: entry['size'] for file_uri, entry in zip(files, manifest)}
 
-        if field_name and not isinstance(field_name, str):
-            raise ValueError("Invalid argument value `field_name`.")
-
-        for data in self.data:
-            data_files = data.files(file_name, field_name)
-            files.extend('{}/{}'.format(data.id, file_name) for file_name in data_files)
-
-        self.resolwe._download_files(files, download_dir)  # pylint: disable=protected-access
+        # pylint: disable=protected-access
+        self.resolwe._download_files(
+            files, download_dir, data_versions=data_versions, file_sizes=file_sizes,
+            progress=progress)
+        # pylint: enable=protected-access
 
 
 class Collection(CollectionRelationsMixin, BaseCollection):
@@ -184,6 +332,184 @@ class Collection(CollectionRelationsMixin, BaseCollection):
 
         return self._relations
 
+    def _background_relations(self, chunk_size=100):
+        """Return list of all background relations in the collection."""
+        return list(self.resolwe.relation.filter(
+            collection=self.id, type='background').iterate(chunk_size=chunk_size))
+
+    @staticmethod
+    def _partition_ids(relation, label):
+        """Return ids of samples with ``label`` in ``relation``."""
+        return [partition['entity'] for partition in relation.partitions or []
+                if partition.get('label', None) == label]
+
+    @assert_object_exists
+    def background_map(self, chunk_size=100):
+        """Return background samples of all case samples in the collection.
+
+        Background relations are fetched in one paged query and their
+        samples are resolved in batches, instead of querying relations
+        of each sample separately as ``Sample.background`` does.
+
+        :param int chunk_size: number of relations fetched in one request
+        :return: dict mapping ids of case samples to their background
+            ``Sample`` objects
+        :raises LookupError: if multiple backgrounds are defined for a
+            sample
+
+        """
+        # Prevent circular imports:
+        from .relation import share_sample_cache
+
+        relations = self._background_relations(chunk_size)
+        share_sample_cache(relations)
+
+        backgrounds = {}
+        for relation in relations:
+            background_ids = self._partition_ids(relation, 'background')
+            if not background_ids:
+                continue
+
+            samples = {sample.id: sample for sample in relation.samples}
+            background = samples.get(background_ids[0], None)
+            if background is None:
+                continue
+
+            for case_id in self._partition_ids(relation, 'case'):
+                if case_id in backgrounds:
+                    raise LookupError(
+                        "Multiple backgrounds defined for sample with id {}.".format(case_id))
+                backgrounds[case_id] = background
+
+                # Remember background of the resolved case sample.
+                case = samples.get(case_id, None)
+                if case is not None:
+                    case._background = background  # pylint: disable=protected-access
+            background._is_background = True  # pylint: disable=protected-access
+
+        return backgrounds
+
+    @assert_object_exists
+    def assign_backgrounds(self, backgrounds, category='Background', workers=4):
+        """Assign background samples to case samples in the collection.
+
+        Changes of existing background relations are computed for all
+        cases together: cases are removed from their current relations
+        and added to the existing relation of their new background,
+        relations left without cases are reused for new backgrounds or
+        deleted and only the remaining relations are created. Changes
+        are applied concurrently, but cases are removed from their
+        current relations (and relations deleted) before they are added
+        to the new ones, so a case is never in two background relations.
+
+        :param dict backgrounds: background ``Sample`` objects or their
+            ids by ids of case samples
+        :param str category: category of created relations
+        :param int workers: number of concurrent requests
+
+        """
+        backgrounds = {get_sample_id(case): get_sample_id(background)
+                       for case, background in backgrounds.items()}
+        for case, background in backgrounds.items():
+            if case == background:
+                raise ValueError("Sample with id {} cannot be its own background.".format(case))
+
+        relations = self._background_relations()
+        partitions = {relation.id: list(relation.partitions or []) for relation in relations}
+        case_relations = {}
+        background_relations = {}
+        for relation in relations:
+            for case in self._partition_ids(relation, 'case'):
+                if case in case_relations:
+                    raise ValueError(
+                        "Multiple backgrounds defined for sample with id {}.".format(case))
+                case_relations[case] = relation
+            for background in self._partition_ids(relation, 'background'):
+                background_relations.setdefault(background, relation)
+
+        changed = set()
+        new_cases = {}
+        for case, background in backgrounds.items():
+            relation = case_relations.get(case, None)
+            if relation is not None:
+                if background in self._partition_ids(relation, 'background'):
+                    continue
+                partitions[relation.id] = [
+                    partition for partition in partitions[relation.id]
+                    if partition['entity'] != case or partition.get('label', None) != 'case'
+                ]
+                changed.add(relation.id)
+            new_cases.setdefault(background, []).append(case)
+
+        # Partitions of relations with removed cases, before cases are added.
+        removed = {relation_id: list(partitions[relation_id]) for relation_id in changed}
+        added = set()
+
+        def add_cases(relation, cases):
+            """Add ``cases`` to partitions of ``relation``."""
+            partitions[relation.id].extend(
+                {'entity': case, 'position': None, 'label': 'case'} for case in cases)
+            changed.add(relation.id)
+            added.add(relation.id)
+
+        def has_cases(relation):
+            """Return ``True`` if there are cases in new partitions of ``relation``."""
+            return any(partition.get('label', None) == 'case'
+                       for partition in partitions[relation.id])
+
+        # Add cases to existing relations of their backgrounds.
+        for background, cases in list(new_cases.items()):
+            if background in background_relations:
+                add_cases(background_relations[background], cases)
+                del new_cases[background]
+
+        # Reuse relations left without cases for the other backgrounds.
+        empty = [relation for relation in relations
+                 if relation.id in changed and not has_cases(relation)]
+        creates = []
+        for background, cases in new_cases.items():
+            if empty:
+                relation = empty.pop(0)
+                partitions[relation.id] = [
+                    {'entity': background, 'position': None, 'label': 'background'}]
+                add_cases(relation, cases)
+            else:
+                creates.append((background, cases))
+
+        deleted = {relation.id for relation in empty}
+        updates = [relation for relation in relations
+                   if relation.id in changed and relation.id not in deleted]
+
+        def update(relation, new_partitions):
+            """Save ``new_partitions`` of ``relation``."""
+            relation.partitions = new_partitions
+            relation.save()
+            relation._samples = None  # pylint: disable=protected-access
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Remove cases from their current relations first, so that
+            # cases are not in multiple relations.
+            futures = [executor.submit(relation.delete, force=True) for relation in empty]
+            futures.extend(
+                executor.submit(update, relation, removed[relation.id])
+                for relation in updates if relation.id in removed
+            )
+            for future in futures:
+                future.result()
+
+            futures = [
+                executor.submit(update, relation, partitions[relation.id])
+                for relation in updates if relation.id in added
+            ]
+            futures.extend(
+                executor.submit(self.create_background_relation, category, background, cases)
+                for background, cases in creates
+            )
+            for future in futures:
+                future.result()
+
+        self._relations = None
+
     @assert_object_exists
     def duplicate(self):
         """Duplicate (make copy of) ``collection`` object.
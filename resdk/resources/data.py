@@ -1,11 +1,13 @@
 """Data resource."""
+import io
 import json
 import logging
 from urllib.parse import urljoin
 
 import requests
 
-from resdk.constants import CHUNK_SIZE
+from resdk.constants import REMOTE_FILE_BLOCK_SIZE, REMOTE_FILE_CACHE_SIZE, REMOTE_FILE_TIMEOUT
+from resdk.remote_file import RemoteFile
 
 from ..utils.decorators import assert_object_exists
 from .base import BaseResolweResource
@@ -13,7 +15,7 @@ from .collection import Collection
 from .descriptor import DescriptorSchema
 from .process import Process
 from .sample import Sample
-from .utils import flatten_field, parse_resolwe_datetime
+from .utils import get_field_value, get_process_file_fields
 
 
 class Data(BaseResolweResource):
@@ -154,13 +156,13 @@ class Data(BaseResolweResource):
     @assert_object_exists
     def started(self):
         """Get start time."""
-        return parse_resolwe_datetime(self._original_values['started'])
+        return self._get_datetime('started')
 
     @property
     @assert_object_exists
     def finished(self):
         """Get finish time."""
-        return parse_resolwe_datetime(self._original_values['finished'])
+        return self._get_datetime('finished')
 
     @property
     @assert_object_exists
@@ -192,40 +194,44 @@ class Data(BaseResolweResource):
         """Get list of downloadable fields."""
         download_list = []
 
-        def put_in_download_list(elm, fname):
-            """Append only files od dirs with equal name."""
-            if field_type in elm:
-                if file_name is None or file_name == elm[field_type]:
-                    download_list.append(elm[field_type])
-            else:
-                raise KeyError("Item {} does not contain '{}' key.".format(fname, field_type))
-
         if field_name and not field_name.startswith('output.'):
             field_name = 'output.{}'.format(field_name)
 
-        flattened = flatten_field(self.output, self.process.output_schema, 'output')
-        for ann_field_name, ann in flattened.items():
-            if (ann_field_name.startswith('output')
-                    and (field_name is None or field_name == ann_field_name)
-                    and ann['value'] is not None):
-                if ann['type'].startswith('basic:{}:'.format(field_type)):
-                    put_in_download_list(ann['value'], ann_field_name)
-                elif ann['type'].startswith('list:basic:{}:'.format(field_type)):
-                    for element in ann['value']:
-                        put_in_download_list(element, ann_field_name)
+        prefix = 'basic:{}:'.format(field_type)
+        for path, typ in get_process_file_fields(self.process):
+            if field_name is not None and field_name != path:
+                continue
+            if not typ.startswith((prefix, 'list:' + prefix)):
+                continue
+
+            value = get_field_value(self.output, path)
+            if value is None:
+                continue
+
+            for element in (value if typ.startswith('list:') else [value]):
+                if field_type not in element:
+                    raise KeyError("Item {} does not contain '{}' key.".format(path, field_type))
+                if file_name is None or file_name == element[field_type]:
+                    download_list.append(element[field_type])
 
         return download_list
 
-    def _get_dir_files(self, dir_name):
-        files_list, dir_list = [], []
+    def _list_dir(self, dir_name):
+        """Return list of objects in directory (not recursive).
 
+        Each object is a dict with ``name``, ``type`` (``'file'`` or
+        ``'directory'``) and, for files, ``size`` keys.
+        """
         dir_url = urljoin(self.resolwe.url, 'data/{}/{}'.format(self.id, dir_name))
         if not dir_url.endswith('/'):
             dir_url += '/'
         response = requests.get(dir_url, auth=self.resolwe.auth)
-        response = json.loads(response.content.decode('utf-8'))
+        return json.loads(response.content.decode('utf-8'))
 
-        for obj in response:
+    def _get_dir_files(self, dir_name):
+        files_list, dir_list = [], []
+
+        for obj in self._list_dir(dir_name):
             obj_path = '{}/{}'.format(dir_name, obj['name'])
             if obj['type'] == 'directory':
                 dir_list.append(obj_path)
@@ -258,7 +264,7 @@ class Data(BaseResolweResource):
 
         return file_list
 
-    def download(self, file_name=None, field_name=None, download_dir=None):
+    def download(self, file_name=None, field_name=None, download_dir=None, progress=None):
         """Download Data object's files and directories.
 
         Download files and directoriesfrom the Resolwe server to the
@@ -270,6 +276,8 @@ class Data(BaseResolweResource):
         :type field_name: string
         :param download_dir: download path
         :type download_dir: string
+        :param progress: callback called with
+            :class:`~resdk.progress.Progress` of downloads
         :rtype: None
 
         Data objects can contain multiple files and directories. All are
@@ -284,7 +292,72 @@ class Data(BaseResolweResource):
             raise ValueError("Only one of file_name or field_name may be given.")
 
         files = ['{}/{}'.format(self.id, fname) for fname in self.files(file_name, field_name)]
-        self.resolwe._download_files(files, download_dir)  # pylint: disable=protected-access
+        # pylint: disable=protected-access
+        self.resolwe._download_files(
+            files, download_dir, data_versions={self.id: self._download_version()},
+            progress=progress)
+        # pylint: enable=protected-access
+
+    def _download_version(self):
+        """Return version of Data object's files used in download cache keys.
+
+        Files of Data object can only change if its inputs (and thus
+        ``checksum``) change or if it is modified (e.g. re-run).
+        """
+        modified = self._original_values.get('modified', None)
+        if self.checksum is None or modified is None:
+            return None
+
+        return '{}:{}'.format(self.checksum, modified)
+
+    @assert_object_exists
+    def open(self, file_name, mode='rb', block_size=REMOTE_FILE_BLOCK_SIZE,
+             cache_size=REMOTE_FILE_CACHE_SIZE, encoding='utf-8', timeout=REMOTE_FILE_TIMEOUT):
+        """Open Data object's file for reading without downloading it.
+
+        Only the parts of the file that are actually read are
+        transferred from the server (with HTTP range requests). The
+        returned object is buffered, seekable and can be passed to
+        tools that accept file objects, e.g. ``pandas.read_csv``.
+
+        :param file_name: path of the file relative to the Data object's
+            directory, as returned by :meth:`files`
+        :type file_name: string
+        :param mode: ``'rb'`` for binary or ``'r'`` for text mode
+        :type mode: string
+        :param block_size: number of bytes fetched in a single request
+        :type block_size: int
+        :param cache_size: number of blocks kept in memory
+        :type cache_size: int
+        :param encoding: encoding used in text mode
+        :type encoding: string
+        :param timeout: timeout of HTTP requests in seconds
+        :type timeout: float
+        :rtype: file object
+
+        Read the first line of an expression table::
+
+            with re.data.get(42).open('expression.tab', mode='r') as handle:
+                header = handle.readline()
+
+        """
+        if mode not in ('r', 'rb', 'rt'):
+            raise ValueError("Invalid mode '{}', only 'r', 'rt' and 'rb' are supported.".format(
+                mode))
+
+        raw = RemoteFile(
+            urljoin(self.resolwe.url, 'data/{}/{}'.format(self.id, file_name)),
+            auth=self.resolwe.auth,
+            block_size=block_size,
+            cache_size=cache_size,
+            name=file_name,
+            timeout=timeout,
+        )
+        handle = io.BufferedReader(raw, buffer_size=block_size)
+
+        if mode == 'rb':
+            return handle
+        return io.TextIOWrapper(handle, encoding=encoding)
 
     def stdout(self):
         """Return process standard output (stdout.txt file content).
@@ -301,7 +374,7 @@ class Data(BaseResolweResource):
         if not response.ok:
             response.raise_for_status()
         else:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            for chunk in response.iter_content(chunk_size=self.resolwe.chunk_size.get()):
                 output += chunk
 
         return output.decode("utf-8")
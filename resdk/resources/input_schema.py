@@ -0,0 +1,257 @@
+"""Compiled process input schema."""
+import collections
+import numbers
+import os
+import re
+import threading
+
+from .utils import get_data_id, is_data
+
+# Python types of values of basic fields (checked for non-list fields
+# and elements of list fields)
+BASIC_TYPES = {
+    'basic:boolean:': (bool,),
+    'basic:integer:': (numbers.Integral,),
+    'basic:decimal:': (numbers.Real,),
+    'basic:string:': (str,),
+    'basic:text:': (str,),
+    'basic:date:': (str,),
+    'basic:datetime:': (str,),
+    'basic:url:': (str, dict),
+    'basic:file:': (str, os.PathLike, dict),
+}
+
+# Number of compiled schemas kept in cache
+CACHE_SIZE = 128
+
+_cache = collections.OrderedDict()  # pylint: disable=invalid-name
+_cache_lock = threading.Lock()  # pylint: disable=invalid-name
+
+
+def file_path(value):
+    """Return path-like file field ``value`` as string, other values intact."""
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    return value
+
+
+def dehydrate(value):
+    """Return copy of ``value`` with Data objects replaced by their ids."""
+    if isinstance(value, dict):
+        return {key: dehydrate(element) for key, element in value.items()}
+    if isinstance(value, list):
+        return [dehydrate(element) for element in value]
+    if is_data(value):
+        return value.id
+    return value
+
+
+class InputField:
+    """Compiled field of the input schema."""
+
+    def __init__(self, schema, slug=None):
+        """Compile field ``schema``."""
+        self.name = schema['name']
+        self.type = schema.get('type', '')
+        self.is_list = self.type.startswith('list:')
+        base_type = self.type[len('list:'):] if self.is_list else self.type
+
+        #: Compiled schema of the group field
+        self.group = InputSchema(schema['group'], slug) if 'group' in schema else None
+        self.is_data = base_type.startswith('data:')
+        self.is_file = base_type == 'basic:file:'
+        #: Compiled ``validate_regex`` that names of files must match
+        self.file_name_regex = None
+        if self.is_file and schema.get('validate_regex'):
+            self.file_name_regex = re.compile(schema['validate_regex'])
+
+        self.python_types = None
+        for prefix, python_types in BASIC_TYPES.items():
+            if base_type.startswith(prefix):
+                self.python_types = python_types
+
+        self.choices = None
+        if schema.get('choices') and not schema.get('allow_custom_choice', False):
+            self.choices = {choice['value'] for choice in schema['choices']}
+
+        required = schema.get('required', True)
+        if isinstance(required, str):
+            required = required.lower() == 'true'
+        # Hidden fields and fields with default values can be omitted.
+        self.required = (required and 'default' not in schema and 'hidden' not in schema
+                         and self.group is None)
+
+    def _check_value(self, value, path, errors):
+        """Check type and choices of a single value."""
+        if self.is_data:
+            if not is_data(value) and (not isinstance(value, numbers.Integral)
+                                       or isinstance(value, bool)):
+                errors.append("Field '{}' must be a Data object or its id, not {!r}.".format(
+                    path, value))
+            return
+
+        if self.python_types is not None and (
+                not isinstance(value, self.python_types)
+                or (isinstance(value, bool) and bool not in self.python_types)):
+            errors.append("Field '{}' of type '{}' has invalid value {!r}.".format(
+                path, self.type, value))
+            return
+
+        if self.choices is not None and value not in self.choices:
+            errors.append("Field '{}' has invalid choice {!r}, choices are: {}.".format(
+                path, value, ', '.join(sorted(map(str, self.choices)))))
+
+    def validate(self, value, path, errors):
+        """Append errors of ``value`` to ``errors``."""
+        if value is None:
+            return
+
+        if self.group is not None:
+            if not isinstance(value, dict):
+                errors.append("Group '{}' must be a dict, not {!r}.".format(path, value))
+            else:
+                self.group.validate(value, path, errors)
+            return
+
+        values = value if self.is_list and isinstance(value, list) else [value]
+        for element in values:
+            self._check_value(element, path, errors)
+
+    def dehydrate(self, value, process_file):
+        """Return value in format expected by the server."""
+        if value is None:
+            return None
+
+        if self.group is not None and isinstance(value, dict):
+            return self.group.dehydrate(value, process_file)
+
+        # XXX: Remove this when supported on server.
+        # Wrap `list:` fields into list if they are not already
+        if self.is_list and not isinstance(value, list):
+            value = [value]
+
+        if self.is_data:
+            if self.is_list:
+                return [get_data_id(element) for element in value]
+            return get_data_id(value)
+
+        if self.is_file:
+            if self.is_list:
+                return [process_file(file_path(element)) for element in value]
+            return process_file(file_path(value))
+
+        return dehydrate(value)
+
+    def file_fields(self, value):
+        """Return list of ``(value, field)`` tuples of file fields in ``value``."""
+        if value is None:
+            return []
+
+        if self.group is not None:
+            return self.group.file_fields(value) if isinstance(value, dict) else []
+
+        if self.is_file:
+            values = value if self.is_list and isinstance(value, list) else [value]
+            return [(file_path(element), self) for element in values]
+
+        return []
+
+
+class InputSchema:
+    """Process input schema compiled for validation and dehydration of inputs.
+
+    :param list schema: input schema of the process
+    :param str slug: slug of the process, used in error messages
+
+    """
+
+    def __init__(self, schema, slug=None):
+        """Compile ``schema``."""
+        self.slug = slug
+        self.fields = collections.OrderedDict(
+            (field_schema['name'], InputField(field_schema, slug)) for field_schema in schema)
+
+    def validate(self, inputs, path=None, errors=None):
+        """Return list of errors in ``inputs``.
+
+        Unknown fields, missing required fields, types of basic and
+        ``data:`` fields and choices are checked.
+        """
+        errors = [] if errors is None else errors
+
+        for name, value in inputs.items():
+            field_path = name if path is None else '{}.{}'.format(path, name)
+            field = self.fields.get(name, None)
+            if field is None:
+                errors.append("Field '{}' not in process '{}' input schema.".format(
+                    field_path, self.slug))
+            else:
+                field.validate(value, field_path, errors)
+
+        for name, field in self.fields.items():
+            if field.required and inputs.get(name, None) is None:
+                field_path = name if path is None else '{}.{}'.format(path, name)
+                errors.append("Required field '{}' is not given.".format(field_path))
+
+        return errors
+
+    def dehydrate(self, inputs, process_file):
+        """Return copy of ``inputs`` in format expected by the server.
+
+        ``list:`` fields are wrapped into lists, Data objects are
+        replaced with their ids and values of file fields are
+        processed with ``process_file`` function. Inputs must be
+        validated first.
+        """
+        return {name: self.fields[name].dehydrate(value, process_file)
+                for name, value in inputs.items()}
+
+    def files(self, inputs):
+        """Return list of values of all file fields in ``inputs``.
+
+        Files in nested groups are included, so that all files can be
+        uploaded before ``inputs`` are dehydrated.
+        """
+        return [path for path, _ in self.file_fields(inputs)]
+
+    def file_fields(self, inputs):
+        """Return list of ``(value, field)`` tuples of all file fields in ``inputs``."""
+        return [file_field for name, value in inputs.items() if name in self.fields
+                for file_field in self.fields[name].file_fields(value)]
+
+    def file_name_regexes(self, inputs):
+        """Return ``validate_regex`` of file fields by values in ``inputs``.
+
+        Values of file fields are mapped to lists of compiled regular
+        expressions that names of their files must match (a value can
+        be given in multiple fields). Fields without ``validate_regex``
+        are omitted.
+        """
+        regexes = {}
+        for path, field in self.file_fields(inputs):
+            if field.file_name_regex is not None and isinstance(path, str):
+                regexes.setdefault(path, []).append(field.file_name_regex)
+        return regexes
+
+
+def get_input_schema(process):
+    """Return compiled input schema of ``process``.
+
+    Schemas of saved processes are compiled once and cached by process
+    id, slug and version.
+    """
+    if process.id is None:
+        return InputSchema(process.input_schema, process.slug)
+
+    key = (process.id, process.slug, process.version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    schema = InputSchema(process.input_schema, process.slug)
+    with _cache_lock:
+        _cache[key] = schema
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return schema
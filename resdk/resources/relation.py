@@ -1,11 +1,75 @@
 """Relation resource."""
 import logging
+import threading
 
 from resdk.exceptions import ValidationError
 
 from .base import BaseResolweResource
 from .collection import Collection
-from .utils import get_sample_id
+from .utils import get_collection_id, get_sample_id
+
+# Number of sample ids requested in one query
+SAMPLE_BATCH_SIZE = 500
+
+
+class SampleCache:
+    """Sample objects of relations in the same collection.
+
+    Samples of all relations that share the cache are resolved together
+    in batched queries the first time samples of any of them are needed,
+    and the same ``Sample`` objects are used in all relations.
+
+    :param resolwe: Resolwe instance
+    :type resolwe: Resolwe object
+
+    """
+
+    def __init__(self, resolwe):
+        """Initialize attributes."""
+        self.resolwe = resolwe
+        #: relations that share the cache
+        self.relations = []
+        #: resolved ``Sample`` objects by id
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def get(self, sample_ids):
+        """Return samples with ``sample_ids`` in the same order."""
+        with self._lock:
+            missing = [sample_id for sample_id in sample_ids if sample_id not in self.samples]
+            if missing:
+                # Resolve samples of other relations at the same time.
+                for relation in self.relations:
+                    missing.extend(sample_id for sample_id in relation.sample_ids
+                                   if sample_id not in self.samples)
+                self._fetch(list(dict.fromkeys(missing)))
+
+            return [self.samples[sample_id] for sample_id in dict.fromkeys(sample_ids)
+                    if sample_id in self.samples]
+
+    def _fetch(self, sample_ids):
+        """Fetch samples with ``sample_ids`` in batches."""
+        for start in range(0, len(sample_ids), SAMPLE_BATCH_SIZE):
+            batch = sample_ids[start:start + SAMPLE_BATCH_SIZE]
+            for sample in self.resolwe.sample.filter(id__in=batch):
+                self.samples[sample.id] = sample
+
+
+def share_sample_cache(relations):
+    """Share a :class:`SampleCache` among ``relations`` in the same collection."""
+    # pylint: disable=protected-access
+    caches = {}
+    for relation in relations:
+        collection = relation._original_values.get('collection', None)
+        if isinstance(collection, dict):
+            collection = collection.get('id', None)
+        else:
+            collection = get_collection_id(collection)
+
+        if collection not in caches:
+            caches[collection] = SampleCache(relation.resolwe)
+        caches[collection].relations.append(relation)
+        relation._sample_cache = caches[collection]
 
 
 class Relation(BaseResolweResource):
@@ -34,6 +98,8 @@ class Relation(BaseResolweResource):
         self._collection = None
         #: List of samples in the relation
         self._samples = None
+        #: ``SampleCache`` shared with other relations in the collection
+        self._sample_cache = None
 
         #: list of ``RelationPartition`` objects in the ``Relation``
         self.partitions = None
@@ -46,19 +112,28 @@ class Relation(BaseResolweResource):
 
         super().__init__(resolwe, **model_data)
 
+    @property
+    def sample_ids(self):
+        """Return list of ids of samples in the relation."""
+        return [partition['entity'] for partition in self.partitions or []]
+
     @property
     def samples(self):
         """Return list of sample objects in the relation."""
         if not self._samples:
-            if not self.partitions:
+            sample_ids = self.sample_ids
+            if not sample_ids:
                 self._samples = []
+            elif self._sample_cache is not None:
+                self._samples = self._sample_cache.get(sample_ids)
             else:
-                sample_ids = [partition['entity'] for partition in self.partitions]
-                self._samples = self.resolwe.sample.filter(id__in=sample_ids)
                 # Samples should be sorted, so they have same order as positions
-                # XXX: This may be slow for many samples in single collection
+                positions = {}
+                for position, sample_id in enumerate(sample_ids):
+                    positions.setdefault(sample_id, position)
                 self._samples = sorted(
-                    self._samples, key=lambda sample: sample_ids.index(sample.id)
+                    self.resolwe.sample.filter(id__in=sample_ids),
+                    key=lambda sample: positions[sample.id],
                 )
         return self._samples
 
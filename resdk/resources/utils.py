@@ -1,11 +1,21 @@
 """Resource utility functions."""
+import collections
+import fnmatch
+import functools
+import threading
 from datetime import datetime
 
-import pytz
-import tzlocal
-
 from resdk.constants import RESOLWE_DATETIME_FORMAT
 
+#: Types of fields that reference files and directories
+FILE_FIELD_TYPES = ('basic:file:', 'list:basic:file:', 'basic:dir:', 'list:basic:dir:')
+
+# Number of processes with file fields kept in cache
+FILE_FIELDS_CACHE_SIZE = 128
+
+_file_fields_cache = collections.OrderedDict()  # pylint: disable=invalid-name
+_file_fields_cache_lock = threading.Lock()  # pylint: disable=invalid-name
+
 
 def iterate_fields(fields, schema):
     """Recursively iterate over all DictField sub-fields.
@@ -74,6 +84,91 @@ def flatten_field(field, schema, path):
     return flat
 
 
+def get_file_fields(schema, path='output'):
+    """Return paths and types of all file and directory fields in schema.
+
+    :param schema: Schema instance (e.g. output_schema)
+    :type schema: list
+    :param path: Path of the schema root
+    :type path: string
+    :return: ``(field_path, field_type)`` tuples
+    :rtype: list
+
+    """
+    return [
+        (field_path, field_schema['type'])
+        for field_schema, _, field_path in iterate_schema({}, schema, path)
+        if field_schema['type'].startswith(FILE_FIELD_TYPES)
+    ]
+
+
+def get_process_file_fields(process):
+    """Return paths and types of file and directory output fields of process.
+
+    Fields are computed with :func:`get_file_fields` once per saved
+    process and cached by process id, slug and version.
+
+    :param process: Process object
+    :type process: Process
+    :return: ``(field_path, field_type)`` tuples
+    :rtype: tuple
+
+    """
+    if process.id is None:
+        return tuple(get_file_fields(process.output_schema))
+
+    key = (process.id, process.slug, process.version)
+    with _file_fields_cache_lock:
+        if key in _file_fields_cache:
+            _file_fields_cache.move_to_end(key)
+            return _file_fields_cache[key]
+
+    file_fields = tuple(get_file_fields(process.output_schema))
+    with _file_fields_cache_lock:
+        _file_fields_cache[key] = file_fields
+        while len(_file_fields_cache) > FILE_FIELDS_CACHE_SIZE:
+            _file_fields_cache.popitem(last=False)
+    return file_fields
+
+
+def get_field_value(fields, path):
+    """Return value of a field on dot-separated path.
+
+    The first element of the path is the name of ``fields`` (e.g.
+    ``output.options.bam`` for ``fields=output``). Return ``None`` if
+    field is not set.
+
+    """
+    value = fields
+    for name in path.split('.')[1:]:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name, None)
+
+    return value
+
+
+def match_pattern(path, pattern):
+    """Return ``True`` if ``path`` matches ``pattern``.
+
+    :param path: File path
+    :type path: string
+    :param pattern: Glob pattern, list of glob patterns (path must
+        match any of them) or compiled regular expression (path must
+        contain a match). ``None`` matches every path.
+    :type pattern: string, list or compiled regular expression
+
+    """
+    if pattern is None:
+        return True
+    if hasattr(pattern, 'search'):
+        return pattern.search(path) is not None
+    if isinstance(pattern, str):
+        pattern = [pattern]
+
+    return any(fnmatch.fnmatchcase(path, glob) for glob in pattern)
+
+
 def fill_spaces(word, desired_length):
     """Fill spaces at the end until word reaches desired length."""
     return str(word) + ' ' * (desired_length - len(word))
@@ -178,16 +273,29 @@ def is_group(group):
     return type(group).__name__ == 'Group'
 
 
+@functools.lru_cache(maxsize=None)
+def _get_local_timezone():
+    """Return local timezone, it is looked up only once."""
+    import tzlocal  # pylint: disable=import-outside-toplevel
+
+    return tzlocal.get_localzone()
+
+
 def parse_resolwe_datetime(dtime):
     """Convert string representation of time to local datetime.datetime object."""
+    # Timezone modules are slow to import and are imported on first use.
+    import pytz  # pylint: disable=import-outside-toplevel
+
     if dtime:
-        # Get naive (=time-zone unaware) version of UTC time:
-        utc_naive = datetime.strptime(dtime[:-6], RESOLWE_DATETIME_FORMAT)
+        # Get naive (=time-zone unaware) version of UTC time, ``fromisoformat``
+        # is much faster than ``strptime``, but not available on Python 3.6:
+        try:
+            utc_naive = datetime.fromisoformat(dtime[:-6])
+        except (AttributeError, ValueError):
+            utc_naive = datetime.strptime(dtime[:-6], RESOLWE_DATETIME_FORMAT)
         # Localize the time so it includes UTC timezone info:
         utc_aware = pytz.utc.localize(utc_naive)
-        # Get name local time zone:
-        local_tz = tzlocal.get_localzone()
         # Present time in the local time zone
-        local_time = utc_aware.astimezone(local_tz)
+        local_time = utc_aware.astimezone(_get_local_timezone())
 
         return local_time
@@ -0,0 +1,100 @@
+""".. Ignore pydocstyle D400.
+
+=============
+Session cache
+=============
+
+On-disk cache of login sessions.
+
+Logging in on every ``Resolwe(...)`` is expensive for the server, since
+it has to verify the password. With the session cache, session cookies
+are stored on disk (readable only by the owner) and reused by later
+instances with the same server URL and username. Expired sessions are
+renewed automatically:
+
+.. code-block:: python
+
+    from resdk.session_cache import SessionCache
+
+    res = resdk.Resolwe('user', 'password', url, session_cache=SessionCache())
+
+.. autoclass:: resdk.session_cache.SessionCache
+   :members:
+
+"""
+import json
+import logging
+import os
+import stat
+import uuid
+
+#: Default location of the session cache
+DEFAULT_SESSION_CACHE_PATH = os.path.join('~', '.resdk', 'sessions.json')
+
+
+class SessionCache:
+    """Session cookies stored in a JSON file, keyed by URL and username.
+
+    The file is only readable and writable by its owner. Files with
+    more permissive mode are ignored.
+
+    :param str path: path of the cache file, defaults to
+        ``~/.resdk/sessions.json``
+
+    """
+
+    def __init__(self, path=None):
+        """Initialize attributes."""
+        self.logger = logging.getLogger(__name__)
+        self.path = os.path.abspath(os.path.expanduser(path or DEFAULT_SESSION_CACHE_PATH))
+
+    def __reduce__(self):
+        """Pickle settings only, logger cannot be pickled on Python 3.6."""
+        return self.__class__, (self.path,)
+
+    @staticmethod
+    def _key(url, username):
+        """Return key of the session."""
+        return '{} {}'.format(url.rstrip('/'), username)
+
+    def _read(self):
+        """Return all cached sessions."""
+        try:
+            mode = os.stat(self.path).st_mode
+            if mode & (stat.S_IRWXG | stat.S_IRWXO):
+                self.logger.warning(
+                    "Ignoring session cache %s accessible by other users", self.path)
+                return {}
+
+            with open(self.path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, sessions):
+        """Atomically replace cached sessions."""
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        temporary = '{}.{}.tmp'.format(self.path, uuid.uuid4().hex)
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'w') as handle:
+            json.dump(sessions, handle)
+        os.replace(temporary, self.path)
+
+    def get(self, url, username):
+        """Return ``(sessionid, csrftoken)`` tuple or ``None`` if not cached."""
+        session = self._read().get(self._key(url, username), None)
+        if session is None:
+            return None
+        return session['sessionid'], session['csrftoken']
+
+    def set(self, url, username, sessionid, csrftoken):
+        """Store session cookies."""
+        sessions = self._read()
+        sessions[self._key(url, username)] = {'sessionid': sessionid, 'csrftoken': csrftoken}
+        self._write(sessions)
+
+    def remove(self, url, username):
+        """Remove session from the cache."""
+        sessions = self._read()
+        if sessions.pop(self._key(url, username), None) is not None:
+            self._write(sessions)
@@ -0,0 +1,8 @@
+"""Benchmarks for ReSDK.
+
+Benchmarks run against a local fake Resolwe server with synthetic
+objects, so they do not need a real server. Run them with::
+
+    python -m resdk.tests.benchmarks --output results.json
+
+"""
@@ -0,0 +1,61 @@
+"""Run ReSDK benchmarks and report results as JSON."""
+import argparse
+import json
+import sys
+
+from .suite import BENCHMARKS, run_benchmarks
+
+
+def main(argv=None):
+    """Parse arguments and run benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmarks', nargs='*',
+                        help="benchmarks to run (all by default): {}".format(
+                            ', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--output', help="write JSON results to file instead of stdout")
+    parser.add_argument('--repeat', type=int, default=5, help="repetitions of each benchmark")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="latency of the fake server in seconds")
+    parser.add_argument('--upload-size', type=int, default=16 * 1024 ** 2,
+                        help="size of the uploaded file in bytes")
+    parser.add_argument('--collections', type=int, default=2, help="number of collections")
+    parser.add_argument('--samples', type=int, default=10, help="samples per collection")
+    parser.add_argument('--data', type=int, default=2, help="data objects per sample")
+    parser.add_argument('--relations', type=int, default=2, help="relations per collection")
+    parser.add_argument('--file-size', type=int, default=1024, help="size of data files in bytes")
+    parser.add_argument('--dir-depth', type=int, default=2, help="depth of data directories")
+    parser.add_argument('--dir-width', type=int, default=2, help="subdirectories per directory")
+    parser.add_argument('--files-per-dir', type=int, default=2, help="files per directory")
+    parser.add_argument('--features', type=int, default=1000, help="number of KB genes")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(', '.join(unknown)))
+
+    results = run_benchmarks(
+        names=args.benchmarks,
+        repeat=args.repeat,
+        latency=args.latency,
+        upload_size=args.upload_size,
+        collections=args.collections,
+        samples=args.samples,
+        data=args.data,
+        relations=args.relations,
+        file_size=args.file_size,
+        dir_depth=args.dir_depth,
+        dir_width=args.dir_width,
+        files_per_dir=args.files_per_dir,
+        features=args.features,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
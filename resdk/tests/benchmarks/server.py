@@ -0,0 +1,422 @@
+"""Local fake Resolwe server used in benchmarks.
+
+The server implements just enough of the Resolwe API for ReSDK: login, current user,
+session validation, paginated and filtered queries of collections, samples, data, relations,
+processes and knowledge base features and mappings, directory listings
+and (range) downloads of data files and chunked uploads. All objects are synthetic and generated by
+:class:`SyntheticDataset`.
+
+"""
+import functools
+import json
+import re
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+CREATED = '2020-01-01T12:00:00.000000+00:00'
+CONTRIBUTOR = {'id': 1, 'username': 'benchmark', 'first_name': 'Bench', 'last_name': 'Mark'}
+
+# Query parameters that do not filter objects.
+RESERVED_PARAMETERS = ('limit', 'offset', 'ordering', 'fields', 'text')
+
+PROCESS = {
+    'id': 1,
+    'slug': 'benchmark-process',
+    'name': 'Benchmark process',
+    'version': '1.0.0',
+    'type': 'data:benchmark:',
+    'category': 'Benchmark',
+    'input_schema': [],
+    'output_schema': [
+        {'name': 'reads', 'label': 'Reads', 'type': 'basic:file:'},
+        {'name': 'report', 'label': 'Report', 'type': 'basic:dir:'},
+    ],
+}
+
+
+@functools.lru_cache(maxsize=16)
+def _split(values):
+    """Return set of comma separated values."""
+    return frozenset(values.split(','))
+
+
+class SyntheticDataset:
+    """Synthetic collections, samples, data, relations and files.
+
+    Every Data object has a ``reads`` file and a ``report`` directory
+    with ``dir_depth`` levels of ``dir_width`` subdirectories, each with
+    ``files_per_dir`` files. All files are ``file_size`` bytes long.
+
+    """
+
+    def __init__(self, collections=2, samples=10, data=2, relations=2, file_size=1024,
+                 dir_depth=2, dir_width=2, files_per_dir=2, features=1000):
+        """Generate objects."""
+        self.file_size = file_size
+        self.dir_depth = dir_depth
+        self.dir_width = dir_width
+        self.files_per_dir = files_per_dir
+
+        self.objects = {
+            'collection': [],
+            'sample': [],
+            'data': [],
+            'relation': [],
+            'process': [dict(PROCESS, created=CREATED, modified=CREATED,
+                             contributor=CONTRIBUTOR)],
+            'kb/feature': [],
+            'kb/mapping': [],
+        }
+
+        # Every ENSEMBL gene is mapped to one NCBI gene.
+        for index in range(features):
+            for source, feature_id in (('ENSEMBL', 'ENSG{:011d}'.format(index)),
+                                       ('NCBI', str(index + 1))):
+                self.objects['kb/feature'].append({
+                    'id': len(self.objects['kb/feature']) + 1,
+                    'source': source,
+                    'feature_id': feature_id,
+                    'species': 'Homo sapiens',
+                    'type': 'gene',
+                    'sub_type': 'protein-coding',
+                    'name': 'GENE{}'.format(index),
+                    'full_name': 'Gene {}'.format(index),
+                    'description': '',
+                    'aliases': [],
+                })
+            self.objects['kb/mapping'].append({
+                'id': index + 1,
+                'relation_type': 'crossdb',
+                'source_db': 'ENSEMBL',
+                'source_id': 'ENSG{:011d}'.format(index),
+                'source_species': 'Homo sapiens',
+                'target_db': 'NCBI',
+                'target_id': str(index + 1),
+                'target_species': 'Homo sapiens',
+            })
+
+        for collection_index in range(collections):
+            collection = self._add('collection', 'Collection {}'.format(collection_index))
+            collection_ref = {'id': collection['id'], 'name': collection['name']}
+
+            sample_ids = []
+            for sample_index in range(samples):
+                sample = self._add('sample', 'Sample {}-{}'.format(collection_index, sample_index),
+                                   collection=collection_ref)
+                sample_ids.append(sample['id'])
+
+                for data_index in range(data):
+                    self._add(
+                        'data',
+                        'Data {}-{}-{}'.format(collection_index, sample_index, data_index),
+                        collection=collection_ref,
+                        entity={'id': sample['id'], 'name': sample['name']},
+                        process=PROCESS,
+                        status='OK',
+                        checksum=uuid.uuid4().hex,
+                        output={
+                            'reads': {'file': 'reads.fastq.gz', 'size': file_size},
+                            'report': {'dir': 'report', 'size': 0},
+                        },
+                    )
+
+            for relation_index in range(relations):
+                self._add(
+                    'relation',
+                    'Relation {}-{}'.format(collection_index, relation_index),
+                    collection=collection_ref,
+                    type='series',
+                    category='Replicate {}'.format(relation_index),
+                    unit=None,
+                    partitions=[
+                        {'id': position, 'entity': sample_id, 'position': position, 'label': None}
+                        for position, sample_id in enumerate(reversed(sample_ids))
+                    ],
+                )
+
+    def _add(self, endpoint, name, **fields):
+        """Add object to ``endpoint`` and return it."""
+        objects = self.objects[endpoint]
+        obj = {
+            'id': len(objects) + 1,
+            'slug': '{}-{}'.format(endpoint, len(objects) + 1),
+            'name': name,
+            'contributor': CONTRIBUTOR,
+            'created': CREATED,
+            'modified': CREATED,
+            'current_user_permissions': [
+                {'type': 'user', 'id': 1, 'name': 'benchmark', 'permissions': ['view']},
+            ],
+            'version': '0.0.1',
+            'descriptor': {},
+            'tags': [],
+        }
+        obj.update(fields)
+        objects.append(obj)
+        return obj
+
+    @staticmethod
+    def _matches(obj, key, values):
+        """Return ``True`` if object matches filter ``key``."""
+        if key == 'type' and 'process' in obj:
+            return all(obj['process']['type'].startswith(value) for value in values)
+
+        key, _, lookup = key.partition('__')
+
+        value = obj.get(key, None)
+        if isinstance(value, dict):
+            value = value.get('id', None)
+
+        for expected in values:
+            if lookup == 'in':
+                if str(value) not in _split(expected):
+                    return False
+            elif lookup == 'gt':
+                if value is None or value <= int(expected):
+                    return False
+            elif str(value) != expected:
+                return False
+        return True
+
+    def query(self, endpoint, parameters):
+        """Return objects on ``endpoint`` that match query ``parameters``."""
+        objects = [
+            obj for obj in self.objects[endpoint]
+            if all(self._matches(obj, key, values) for key, values in parameters.items()
+                   if key not in RESERVED_PARAMETERS)
+        ]
+
+        if 'limit' not in parameters:
+            return objects
+
+        offset = int(parameters.get('offset', ['0'])[0])
+        limit = int(parameters['limit'][0])
+        return {'count': len(objects), 'results': objects[offset:offset + limit]}
+
+    def get(self, endpoint, object_id):
+        """Return object with ``object_id`` or ``None``."""
+        index = object_id - 1
+        if 0 <= index < len(self.objects[endpoint]):
+            return self.objects[endpoint][index]
+        return None
+
+    def list_dir(self, path):
+        """Return listing of directory on ``path`` in Data object's directory."""
+        parts = path.strip('/').split('/')
+        if parts[0] != 'report' or len(parts) > self.dir_depth + 1:
+            return None
+
+        listing = [
+            {'type': 'file', 'name': 'file{}.txt'.format(index), 'size': self.file_size}
+            for index in range(self.files_per_dir)
+        ]
+        if len(parts) <= self.dir_depth:
+            listing.extend(
+                {'type': 'directory', 'name': 'sub{}'.format(index)}
+                for index in range(self.dir_width)
+            )
+        return listing
+
+    def file_content(self, path):
+        """Return content of the file on ``path``."""
+        pattern = path.encode('utf-8') + b'\n'
+        repeats = self.file_size // len(pattern) + 1
+        return (pattern * repeats)[:self.file_size]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handle requests to the fake Resolwe server."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Do not log requests."""
+
+    def _respond(self, status, body=b'', headers=None, send_body=True):
+        """Send response."""
+        self.send_response(status)
+        for name, value in headers or []:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _respond_json(self, obj, status=200):
+        """Send JSON response."""
+        self._respond(status, json.dumps(obj).encode('utf-8'),
+                      headers=[('Content-Type', 'application/json')])
+
+    def _read_body(self):
+        """Read request body."""
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _handle(self, method):
+        """Route request."""
+        time.sleep(self.server.latency)
+        dataset = self.server.dataset
+        url = urlparse(self.path)
+        path = unquote(url.path)
+
+        body = self._read_body() if method == 'POST' else b''
+
+        if method == 'POST' and path == '/rest-auth/login/':
+            sessionid = uuid.uuid4().hex
+            username = parse_qs(body.decode('utf-8')).get('username', [''])[0]
+            self.server.sessions[sessionid] = username
+            self._respond(200, body=b'{}', headers=[
+                ('Content-Type', 'application/json'),
+                ('Set-Cookie', 'sessionid={}; Path=/'.format(sessionid)),
+                ('Set-Cookie', 'csrftoken=benchmark; Path=/'),
+            ])
+            return
+
+        match = re.search(r'sessionid=(\w+)', self.headers.get('Cookie', ''))
+        if method == 'GET' and path.rstrip('/') == '/api/user':
+            # Like on Resolwe, invalid session is treated as anonymous user.
+            username = self.server.sessions.get(match.group(1), None) if match else None
+            users = [dict(CONTRIBUTOR, username=username)] if username else []
+            self._respond_json(users)
+            return
+
+        if match and match.group(1) not in self.server.sessions:
+            self._respond_json(
+                {'detail': 'Authentication credentials were not provided.'}, status=403)
+            return
+
+        if method == 'POST':
+            match = re.fullmatch(r'/api/kb/(feature|mapping)/search/?', path)
+            if path == '/upload/':
+                self._respond_json({'files': [{'temp': uuid.uuid4().hex}]})
+            elif match:
+                self.server.searches.append(path)
+                parameters = {key: [str(value)] for key, value in json.loads(body).items()}
+                self._respond_json(dataset.query('kb/' + match.group(1), parameters))
+            else:
+                self._respond_json({'detail': 'Not found.'}, status=404)
+            return
+
+        if path in ('/api', '/api/'):
+            self._respond_json({})
+            return
+
+        match = re.fullmatch(r'/api/(\w+)/?', path)
+        if match and match.group(1) in dataset.objects:
+            self._respond_json(dataset.query(match.group(1), parse_qs(url.query)))
+            return
+
+        match = re.fullmatch(r'/api/(\w+)/(\d+)/?', path)
+        if match and match.group(1) in dataset.objects:
+            obj = dataset.get(match.group(1), int(match.group(2)))
+            if obj is None:
+                self._respond_json({'detail': 'Not found.'}, status=404)
+            else:
+                self._respond_json(obj)
+            return
+
+        match = re.fullmatch(r'/data/(\d+)/(.+)', path)
+        if match and dataset.get('data', int(match.group(1))) is not None:
+            file_path = match.group(2)
+            if file_path.endswith('/'):
+                listing = dataset.list_dir(file_path)
+                if listing is not None:
+                    self._respond_json(listing)
+                    return
+            else:
+                self._send_file(dataset.file_content(file_path), send_body=method == 'GET')
+                return
+
+        self._respond_json({'detail': 'Not found.'}, status=404)
+
+    def _send_file(self, content, send_body=True):
+        """Send file content, respecting the Range header."""
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if not match:
+            self._respond(200, content, send_body=send_body)
+            return
+
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(content) - 1), len(content) - 1)
+        self._respond(206, content[start:end + 1], send_body=send_body, headers=[
+            ('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(content))),
+        ])
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle GET request."""
+        self._handle('GET')
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Handle HEAD request."""
+        self._handle('HEAD')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle POST request."""
+        self._handle('POST')
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server that handles each request in a new thread."""
+
+    daemon_threads = True
+
+    def __init__(self, address, dataset, latency):
+        """Initialize attributes."""
+        super().__init__(address, RequestHandler)
+        self.dataset = dataset
+        self.latency = latency
+        # Usernames of logged in users by session ids
+        self.sessions = {}
+        # Paths of KB search requests
+        self.searches = []
+
+
+class FakeResolweServer:
+    """Fake Resolwe server running in a background thread.
+
+    :param dataset: objects served by the server
+    :type dataset: SyntheticDataset
+    :param float latency: delay (in seconds) added to each response
+
+    """
+
+    def __init__(self, dataset, latency=0.0):
+        """Initialize attributes."""
+        self.dataset = dataset
+        self.latency = latency
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Return URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        """Start the server on a free port."""
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self.dataset, self.latency)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.start()
+
+    def expire_sessions(self):
+        """Invalidate sessions of all logged in users."""
+        self._server.sessions.clear()
+
+    def stop(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
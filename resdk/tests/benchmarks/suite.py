@@ -0,0 +1,195 @@
+"""Benchmarks of ReSDK hot paths against the fake Resolwe server."""
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from resdk import Resolwe
+
+from .server import FakeResolweServer, SyntheticDataset
+
+BENCHMARKS = {}
+
+
+def benchmark(function):
+    """Register benchmark ``function``.
+
+    Benchmark is called with a ``Context`` and must return the value
+    that is checked to be the same in all repetitions (e.g. number of
+    returned objects).
+    """
+    BENCHMARKS[function.__name__[len('bench_'):]] = function
+    return function
+
+
+class Context:
+    """Objects available to benchmarks."""
+
+    def __init__(self, res, dataset, work_dir, upload_size):
+        """Initialize attributes."""
+        self.res = res
+        self.dataset = dataset
+        self.work_dir = work_dir
+        self.upload_size = upload_size
+
+    def make_file(self, name, size):
+        """Create file of ``size`` bytes in the working directory."""
+        path = os.path.join(self.work_dir, name)
+        if not os.path.isfile(path) or os.path.getsize(path) != size:
+            with open(path, 'wb') as handle:
+                handle.write(os.urandom(size))
+        return path
+
+    def empty_dir(self, name):
+        """Return path of an empty directory in the working directory."""
+        path = os.path.join(self.work_dir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+
+def _run_python(code):
+    """Run ``code`` in a new interpreter and return its exit code."""
+    return subprocess.run([sys.executable, '-c', code], check=True).returncode
+
+
+@benchmark
+def bench_import(context):  # pylint: disable=unused-argument
+    """Start interpreter and import resdk."""
+    return _run_python('import resdk')
+
+
+@benchmark
+def bench_import_resolwe(context):  # pylint: disable=unused-argument
+    """Start interpreter and import Resolwe class."""
+    return _run_python('from resdk import Resolwe')
+
+
+@benchmark
+def bench_query_list(context):
+    """List all Data objects in a single request."""
+    return len(context.res.data.filter(collection=1))
+
+
+@benchmark
+def bench_query_iterate(context):
+    """Iterate over all Data objects page by page."""
+    return sum(1 for _ in context.res.data.filter(collection=1).iterate(chunk_size=20))
+
+
+@benchmark
+def bench_count(context):
+    """Count Data objects in a collection."""
+    return context.res.data.filter(collection=1).count()
+
+
+@benchmark
+def bench_get(context):
+    """Get 20 Data objects one by one."""
+    total = len(context.dataset.objects['data'])
+    return [context.res.data.get(1 + index % total).id for index in range(20)]
+
+
+@benchmark
+def bench_data_files(context):
+    """List files of a Data object with a deep directory."""
+    return len(context.res.data.get(1).files())
+
+
+@benchmark
+def bench_collection_files(context):
+    """List files of all Data objects in a collection."""
+    return len(context.res.collection.get(1).files())
+
+
+@benchmark
+def bench_relation_samples(context):
+    """Resolve samples of all relations in a collection."""
+    return [len(relation.samples) for relation in context.res.relation.filter(collection=1)]
+
+
+@benchmark
+def bench_kb_map(context):
+    """Map all KB genes from ENSEMBL to NCBI ids."""
+    gene_ids = [feature['feature_id'] for feature in context.dataset.objects['kb/feature']
+                if feature['source'] == 'ENSEMBL']
+    mapping = context.res.mapping.map(gene_ids, source_db='ENSEMBL', target_db='NCBI')
+    return sum(len(target_ids) for target_ids in mapping.values())
+
+
+@benchmark
+def bench_upload(context):
+    """Upload a file in chunks."""
+    path = context.make_file('upload.bin', context.upload_size)
+    return bool(context.res._upload_file(path))  # pylint: disable=protected-access
+
+
+@benchmark
+def bench_download(context):
+    """Download all files of a sample."""
+    download_dir = context.empty_dir('download')
+    context.res.sample.get(1).download(download_dir=download_dir)
+    return sum(len(files) for _, _, files in os.walk(download_dir))
+
+
+def run_benchmarks(names=None, repeat=5, latency=0.0, upload_size=16 * 1024 ** 2,
+                   **dataset_options):
+    """Run benchmarks and return results as a JSON serializable dict.
+
+    :param list names: names of benchmarks to run, all by default
+    :param int repeat: number of repetitions of each benchmark
+    :param float latency: latency of the fake server in seconds
+    :param int upload_size: size of the uploaded file in bytes
+    :param dataset_options: arguments of :class:`SyntheticDataset`
+
+    """
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError("Unknown benchmarks: {}".format(', '.join(sorted(unknown))))
+
+    dataset = SyntheticDataset(**dataset_options)
+    results = {}
+    with FakeResolweServer(dataset, latency=latency) as server, \
+            tempfile.TemporaryDirectory() as work_dir:
+        res = Resolwe('benchmark', 'benchmark', server.url)
+        context = Context(res, dataset, work_dir, upload_size)
+
+        for name in names:
+            function = BENCHMARKS[name]
+            # Warm up, e.g. create files used in the benchmark.
+            expected = function(context)
+
+            timings, requests = [], []
+            for _ in range(repeat):
+                res.instrumentation.metrics.reset()
+                start = time.perf_counter()
+                result = function(context)
+                timings.append(time.perf_counter() - start)
+                requests.append(sum(
+                    metrics['count'] for metrics in res.instrumentation.metrics.as_dict().values()
+                ))
+
+                if result != expected:
+                    raise AssertionError("Benchmark {} returned {!r} instead of {!r}.".format(
+                        name, result, expected))
+
+            results[name] = {
+                'description': function.__doc__,
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.mean(timings),
+                'max': max(timings),
+                'requests': max(requests),
+            }
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': dict(dataset_options, repeat=repeat, latency=latency, upload_size=upload_size),
+        'results': results,
+    }
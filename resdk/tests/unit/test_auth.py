@@ -0,0 +1,105 @@
+"""
+Unit tests for resdk/auth.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+
+import unittest
+from functools import partial
+
+import requests
+from mock import MagicMock, patch
+
+from resdk.auth import ResAuth
+
+
+class TestResAuth(unittest.TestCase):
+
+    @patch('resdk.auth.ResAuth', spec=True)
+    def setUp(self, auth_mock):  # pylint: disable=arguments-differ
+        auth_mock.configure_mock(sessionid=None, csrftoken=None)
+        auth_mock._login.side_effect = partial(ResAuth._login, auth_mock)
+        auth_mock._start_session.side_effect = partial(ResAuth._start_session, auth_mock)
+        self.auth_mock = auth_mock
+
+    @patch('resdk.auth.requests')
+    def test_bad_url(self, requests_mock):
+        requests_mock.post = MagicMock(side_effect=[requests.exceptions.ConnectionError()])
+
+        with self.assertRaisesRegex(ValueError,
+                                    'Server not accessible on www.abc.com. Wrong url?'):
+            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
+
+    @patch('resdk.auth.requests')
+    def test_bad_credentials(self, requests_mock):
+        requests_mock.post = MagicMock(return_value=MagicMock(status_code=400))
+
+        message = r'Response HTTP status code .* Invalid credentials?'
+        with self.assertRaisesRegex(ValueError, message):
+            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
+
+    @patch('resdk.auth.requests')
+    def test_no_csrf_token(self, requests_mock):
+        post_mock = MagicMock(status_code=200, cookies={'sessionid': 42})
+        requests_mock.post = MagicMock(return_value=post_mock)
+
+        message = 'Missing sessionid or csrftoken. Invalid credentials?'
+        with self.assertRaisesRegex(Exception, message):
+            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
+
+    @patch('resdk.auth.requests')
+    def test_all_ok(self, requests_mock):
+        post_mock = MagicMock(status_code=200, cookies={'sessionid': 42, 'csrftoken': 43})
+        requests_mock.post = MagicMock(return_value=post_mock)
+
+        ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
+        self.assertEqual(self.auth_mock.sessionid, 42)
+        self.assertEqual(self.auth_mock.csrftoken, 43)
+
+    @patch('resdk.auth.requests')
+    def test_public_user(self, requests_mock):
+        post_mock = MagicMock(status_code=200)
+        requests_mock.post = MagicMock(return_value=post_mock)
+
+        ResAuth.__init__(self.auth_mock, url='www.abc.com')
+        self.assertEqual(self.auth_mock.sessionid, None)
+        self.assertEqual(self.auth_mock.csrftoken, None)
+
+    def test_call(self):
+        res_auth = MagicMock(spec=ResAuth, sessionid=None, csrftoken=None, url="www.abc.com")
+        resp = ResAuth.__call__(res_auth, MagicMock(headers={}))
+        self.assertDictEqual(resp.headers, {'referer': 'www.abc.com'})
+
+        res_auth = MagicMock(spec=ResAuth, sessionid='my-id', csrftoken='my-token', url="abc.com")
+        resp = ResAuth.__call__(res_auth, MagicMock(headers={}))
+        self.assertDictEqual(resp.headers, {
+            'X-CSRFToken': 'my-token',
+            'referer': 'abc.com',
+            'Cookie': 'csrftoken=my-token; sessionid=my-id'
+        })
+
+    def test_session_rejected(self):
+        def response(status_code, detail):
+            return MagicMock(status_code=status_code, **{'json.return_value': {'detail': detail}})
+
+        self.assertTrue(ResAuth._session_rejected(
+            response(403, 'Authentication credentials were not provided.')))
+        self.assertTrue(ResAuth._session_rejected(
+            response(403, 'CSRF Failed: CSRF token missing or incorrect.')))
+        self.assertFalse(ResAuth._session_rejected(response(200, '')))
+        self.assertFalse(ResAuth._session_rejected(
+            response(403, 'You do not have permission to perform this action.')))
+        self.assertFalse(ResAuth._session_rejected(
+            MagicMock(status_code=401, **{'json.side_effect': ValueError})))
+
+    def test_permission_denied(self):
+        res_auth = MagicMock(spec=ResAuth)
+        res_auth._session_rejected.return_value = False
+        response = MagicMock(status_code=403)
+
+        # Session is not renewed if the request is denied for other reasons.
+        self.assertIs(ResAuth._renew_session(res_auth, response), response)
+        self.assertEqual(res_auth._login.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,13 @@ Unit tests for resdk/resolwe.py file.
 """
 # pylint: disable=missing-docstring, protected-access
 
+import pickle
 import unittest
 
 import slumber
 from mock import MagicMock, call, patch
 
+from resdk.resolwe import Resolwe
 from resdk.resources import (
     Collection, Data, DescriptorSchema, Group, Process, Relation, Sample, User,
 )
@@ -89,6 +91,20 @@ class TestBaseResolweResource(unittest.TestCase):
         self.assertEqual(obj_1 == obj_3, False)
         self.assertEqual(obj_1 == obj_4, False)
 
+    @patch('resdk.resources.base.parse_resolwe_datetime')
+    def test_datetime_cached(self, parse_mock):
+        parse_mock.side_effect = lambda value: 'parsed ' + value
+        base_resource = BaseResolweResource(resolwe=self.resolwe_mock, id=1, created='first')
+
+        self.assertEqual(base_resource.created, 'parsed first')
+        self.assertEqual(base_resource.created, 'parsed first')
+        self.assertEqual(parse_mock.call_count, 1)
+
+        # Parse again when the value is updated.
+        base_resource._update_fields({'id': 1, 'created': 'second'})
+        self.assertEqual(base_resource.created, 'parsed second')
+        self.assertEqual(parse_mock.call_count, 2)
+
 
 class TestBaseMethods(unittest.TestCase):
 
@@ -210,6 +226,36 @@ class TestBaseMethods(unittest.TestCase):
         self.assertEqual(out, 'BaseResolweResource <id: 1, slug: \'a\', name: \'b\'>')
 
 
+class TestPickle(unittest.TestCase):
+
+    def test_pickle(self):
+        res = Resolwe(url='http://some/url', lazy=True)
+        data = Data(res, id=42, name='Data', slug='data', process={'id': 1, 'slug': 'process'},
+                    collection={'id': 2, 'name': 'Collection'}, output={'reads': {'file': 'a'}})
+        data.name = 'New name'
+
+        copy = pickle.loads(pickle.dumps(data))
+        self.assertIsInstance(copy, Data)
+        self.assertEqual(copy.resolwe.url, 'http://some/url')
+        self.assertEqual(copy.id, 42)
+        self.assertEqual(copy.slug, 'data')
+        self.assertEqual(copy.output, {'reads': {'file': 'a'}})
+        self.assertEqual(copy.process.slug, 'process')
+        self.assertEqual(copy.collection.id, 2)
+        self.assertEqual(copy._original_values, data._original_values)
+        # Unsaved changes are kept.
+        self.assertEqual(copy.name, 'New name')
+        self.assertEqual(copy.api._store['base_url'], 'http://some/api/data')
+
+    def test_pickle_shares_resolwe(self):
+        res = Resolwe(url='http://some/url', lazy=True)
+        samples = [Sample(res, id=1), Sample(res, id=2)]
+
+        copies = pickle.loads(pickle.dumps(samples))
+        self.assertEqual([sample.id for sample in copies], [1, 2])
+        self.assertIs(copies[0].resolwe, copies[1].resolwe)
+
+
 class TestAttributesDefined(unittest.TestCase):
 
     def test_attributes_are_defined(self):
@@ -0,0 +1,46 @@
+"""
+Smoke tests for resdk/tests/benchmarks package.
+"""
+# pylint: disable=missing-docstring
+import json
+import unittest
+
+from mock import patch
+
+from resdk.tests.benchmarks import __main__ as benchmarks_main
+from resdk.tests.benchmarks.suite import BENCHMARKS, run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(repeat=1, upload_size=1000, collections=1, samples=3, data=1,
+                                 relations=1, dir_depth=1)
+
+        self.assertEqual(set(results['results']), set(BENCHMARKS))
+        self.assertEqual(results['results']['count']['requests'], 1)
+        self.assertEqual(results['config']['samples'], 3)
+        json.dumps(results)
+
+        with self.assertRaisesRegex(ValueError, 'Unknown benchmarks: foo'):
+            run_benchmarks(names=['foo'])
+
+    @patch('resdk.tests.benchmarks.__main__.sys')
+    @patch('resdk.tests.benchmarks.__main__.run_benchmarks', return_value={})
+    def test_main(self, run_mock, sys_mock):
+        benchmarks_main.main([])
+        self.assertEqual(run_mock.call_args[1]['names'], [])
+
+        benchmarks_main.main(['count', 'upload'])
+        self.assertEqual(run_mock.call_args[1]['names'], ['count', 'upload'])
+
+        run_mock.reset_mock()
+        with patch('argparse.ArgumentParser.error', side_effect=SystemExit) as error_mock:
+            with self.assertRaises(SystemExit):
+                benchmarks_main.main(['count', 'foo'])
+        error_mock.assert_called_once_with("unknown benchmarks: foo")
+        run_mock.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
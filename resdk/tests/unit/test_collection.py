@@ -3,23 +3,57 @@ Unit tests for resdk/resources/collection.py file.
 """
 # pylint: disable=missing-docstring, protected-access
 
+import collections
+import re
+import threading
 import unittest
+from functools import partial
 
 from mock import MagicMock, patch
 
-from resdk.resources.collection import BaseCollection, Collection
+from resdk.resources.collection import Collection
 from resdk.resources.data import Data
 from resdk.resources.descriptor import DescriptorSchema
 from resdk.resources.process import Process
+from resdk.resources.relation import Relation
+from resdk.resources.sample import Sample
+
+OUTPUT_SCHEMA = [
+    {'name': 'reads', 'label': 'Reads', 'type': 'list:basic:file:'},
+    {'name': 'exp', 'label': 'Expression', 'type': 'basic:file:'},
+    {'name': 'index', 'label': 'Index', 'type': 'basic:dir:'},
+    {'name': 'stats', 'label': 'Stats', 'group': [
+        {'name': 'report', 'label': 'Report', 'type': 'basic:file:html:'},
+    ]},
+]
+
+
+def make_data(data_id, output, process_id=1, process_type='data:test:'):
+    return Data(
+        resolwe=MagicMock(),
+        id=data_id,
+        checksum='checksum{}'.format(data_id),
+        modified='2020-01-0{}T00:00:00.000000+00:00'.format(data_id),
+        output=output,
+        process={'id': process_id, 'type': process_type, 'output_schema': OUTPUT_SCHEMA},
+    )
 
-DATA0 = MagicMock(**{'files.return_value': [], 'id': 0})
 
-DATA1 = MagicMock(**{'files.return_value': ['reads.fq', 'arch.gz'], 'id': 1})
-
-DATA2 = MagicMock(**{'files.return_value': ['outfile.exp'], 'id': 2})
+class TestBaseCollection(unittest.TestCase):
 
+    def setUp(self):
+        self.data = [
+            make_data(0, {}),
+            make_data(1, {'reads': [{'file': 'reads.fq', 'size': 10},
+                                    {'file': 'arch.gz', 'size': 20}]}),
+            make_data(2, {'exp': {'file': 'outfile.exp', 'size': 30},
+                          'stats': {'report': {'file': 'report.html', 'size': 40}}}),
+        ]
 
-class TestBaseCollection(unittest.TestCase):
+    def make_collection(self, data):
+        collection = Collection(resolwe=MagicMock(), id=1)
+        collection._data = MagicMock(**{'filter.return_value.iterate.return_value': data})
+        return collection
 
     def test_data_types(self):
         resolwe = MagicMock()
@@ -34,33 +68,305 @@ class TestBaseCollection(unittest.TestCase):
         self.assertEqual(types, ['data:reads:fastq:single:'])
 
     def test_files(self):
-        collection = Collection(resolwe=MagicMock(), id=1)
-        collection._data = [DATA1, DATA2]
+        collection = self.make_collection(self.data[1:])
 
         files = collection.files()
-        self.assertCountEqual(files, ['arch.gz', 'reads.fq', 'outfile.exp'])
+        self.assertCountEqual(files, ['arch.gz', 'reads.fq', 'outfile.exp', 'report.html'])
+
+    def test_file_manifest(self):
+        collection = self.make_collection(self.data)
+
+        manifest = collection.file_manifest(chunk_size=50)
+        collection._data.filter.assert_called_once_with(
+            fields='id,checksum,modified,output,process')
+        collection._data.filter.return_value.iterate.assert_called_once_with(chunk_size=50)
+        self.assertEqual(manifest, [
+            {'data_id': 1, 'file_name': 'reads.fq', 'field_name': 'output.reads',
+             'process_type': 'data:test:', 'size': 10},
+            {'data_id': 1, 'file_name': 'arch.gz', 'field_name': 'output.reads',
+             'process_type': 'data:test:', 'size': 20},
+            {'data_id': 2, 'file_name': 'outfile.exp', 'field_name': 'output.exp',
+             'process_type': 'data:test:', 'size': 30},
+            {'data_id': 2, 'file_name': 'report.html', 'field_name': 'output.stats.report',
+             'process_type': 'data:test:', 'size': 40},
+        ])
+
+        manifest = collection.file_manifest(file_name='arch.gz')
+        self.assertEqual([entry['file_name'] for entry in manifest], ['arch.gz'])
+
+        manifest = collection.file_manifest(field_name='stats.report')
+        self.assertEqual([entry['file_name'] for entry in manifest], ['report.html'])
+
+        collection = self.make_collection([make_data(3, {'exp': {'no_file': 'x'}})])
+        with self.assertRaisesRegex(KeyError, "does not contain 'file' key."):
+            collection.file_manifest()
+
+    def test_file_manifest_directories(self):
+        data = make_data(3, {'index': {'dir': 'index', 'size': 60}})
+        listings = {
+            'index': [{'type': 'file', 'name': 'genome.fa', 'size': 50},
+                      {'type': 'directory', 'name': 'sub'}],
+            'index/sub': [{'type': 'file', 'name': 'genome.idx', 'size': 10}],
+        }
+        data._list_dir = MagicMock(side_effect=listings.get)
+        collection = self.make_collection([data])
+
+        manifest = collection.file_manifest(workers=2)
+        self.assertEqual(manifest, [
+            {'data_id': 3, 'file_name': 'index/genome.fa', 'field_name': 'output.index',
+             'process_type': 'data:test:', 'size': 50},
+            {'data_id': 3, 'file_name': 'index/sub/genome.idx', 'field_name': 'output.index',
+             'process_type': 'data:test:', 'size': 10},
+        ])
+        self.assertEqual(data._list_dir.call_count, 2)
+
+    def test_files_order(self):
+        # Files of each Data object precede contents of its directories,
+        # which are listed as the (non recursive) listing would.
+        data = make_data(3, {'index': {'dir': 'index'}, 'exp': {'file': 'outfile.exp'}})
+        listings = {
+            'index': [{'type': 'directory', 'name': 'sub'},
+                      {'type': 'file', 'name': 'genome.idx'},
+                      {'type': 'file', 'name': 'genome.fa'}],
+            'index/sub': [{'type': 'file', 'name': 'alt.fa'}],
+        }
+        data._list_dir = MagicMock(side_effect=listings.get)
+        collection = self.make_collection([data] + self.data)
+
+        self.assertEqual(collection.files(), [
+            'outfile.exp', 'index/genome.idx', 'index/genome.fa', 'index/sub/alt.fa',
+            'reads.fq', 'arch.gz', 'outfile.exp', 'report.html',
+        ])
+
+    def test_file_manifest_filters(self):
+        collection = self.make_collection(self.data)
+
+        manifest = collection.file_manifest(pattern='*.gz', process_type='data:test:')
+        collection._data.filter.assert_called_once_with(
+            fields='id,checksum,modified,output,process', type='data:test:')
+        self.assertEqual([entry['file_name'] for entry in manifest], ['arch.gz'])
+
+        files = collection.files(pattern=['*.fq', '*.exp'])
+        self.assertEqual(files, ['reads.fq', 'outfile.exp'])
+
+        files = collection.files(pattern=re.compile(r'^(arch|report)'))
+        self.assertEqual(files, ['arch.gz', 'report.html'])
+
+        # Patterns apply to files in directories.
+        data = make_data(3, {'index': {'dir': 'index'}})
+        data._list_dir = MagicMock(return_value=[
+            {'type': 'file', 'name': 'genome.fa', 'size': 50},
+            {'type': 'file', 'name': 'genome.idx', 'size': 10},
+        ])
+        collection = self.make_collection([data])
+        self.assertEqual(collection.files(pattern='*.idx'), ['index/genome.idx'])
+
+    @patch('resdk.resources.utils._file_fields_cache', collections.OrderedDict())
+    @patch('resdk.resources.utils.get_file_fields')
+    def test_file_fields_cached(self, get_file_fields_mock):
+        get_file_fields_mock.return_value = []
+        collection = self.make_collection(self.data)
+
+        collection.file_manifest()
+        self.assertEqual(get_file_fields_mock.call_count, 1)
 
 
 class TestBaseCollectionDownload(unittest.TestCase):
 
-    @patch('resdk.resources.collection.BaseCollection', spec=True)
-    def test_field_name(self, collection_mock):
-        collection_mock.configure_mock(data=[DATA0, DATA2], resolwe=MagicMock())
-        BaseCollection.download(collection_mock, field_name='output.exp')
+    def test_field_name(self):
+        collection = Collection(resolwe=MagicMock(), id=1)
+        collection._data = MagicMock(**{'filter.return_value.iterate.return_value': [
+            make_data(0, {}),
+            make_data(2, {'exp': {'file': 'outfile.exp'}}),
+        ]})
+        collection.download(field_name='output.exp')
         flist = ['2/outfile.exp']
-        collection_mock.resolwe._download_files.assert_called_once_with(flist, None)
+        collection.resolwe._download_files.assert_called_once_with(flist, None, data_versions={
+            0: 'checksum0:2020-01-00T00:00:00.000000+00:00',
+            2: 'checksum2:2020-01-02T00:00:00.000000+00:00',
+        }, file_sizes={'2/outfile.exp': None}, progress=None)
 
         # Check if ``output_field`` does not start with 'output'
-        collection_mock.reset_mock()
-        collection_mock.configure_mock(data=[DATA1, DATA0], resolwe=MagicMock())
-        BaseCollection.download(collection_mock, field_name='fastq')
+        collection = Collection(resolwe=MagicMock(), id=1)
+        collection._data = MagicMock(**{'filter.return_value.iterate.return_value': [
+            make_data(1, {'reads': [{'file': 'reads.fq'}, {'file': 'arch.gz'}]}),
+            make_data(0, {}),
+        ]})
+        collection.download(field_name='reads')
         flist = ['1/reads.fq', '1/arch.gz']
-        collection_mock.resolwe._download_files.assert_called_once_with(flist, None)
+        self.assertEqual(collection.resolwe._download_files.call_args[0][0], flist)
+
+    def test_pattern(self):
+        collection = Collection(resolwe=MagicMock(), id=1)
+        collection._data = MagicMock(**{'filter.return_value.iterate.return_value': [
+            make_data(1, {'reads': [{'file': 'reads.bam'}, {'file': 'reads.bam.bai'}]}),
+            make_data(2, {'exp': {'file': 'outfile.exp'}}),
+        ]})
+        collection.download(pattern=['*.bam', '*.bai'], process_type='data:alignment:bam:')
+        collection._data.filter.assert_called_once_with(
+            fields='id,checksum,modified,output,process', type='data:alignment:bam:')
+        self.assertEqual(collection.resolwe._download_files.call_args[0][0],
+                         ['1/reads.bam', '1/reads.bam.bai'])
 
     def test_bad_field_name(self):
         collection = Collection(resolwe=MagicMock(), id=1)
         with self.assertRaisesRegex(ValueError, "Invalid argument value `field_name`."):
             collection.download(field_name=123)
+        with self.assertRaisesRegex(ValueError, "Invalid argument value `field_name`."):
+            collection.files(field_name=1)
+
+
+def make_background_relation(resolwe, relation_id, background, cases):
+    relation = Relation(
+        resolwe=resolwe,
+        id=relation_id,
+        collection={'id': 1},
+        type='background',
+        partitions=[{'entity': background, 'position': None, 'label': 'background'}] + [
+            {'entity': case, 'position': None, 'label': 'case'} for case in cases],
+    )
+    relation.save = MagicMock()
+    relation.delete = MagicMock()
+    return relation
+
+
+class TestCollectionBackgrounds(unittest.TestCase):
+
+    def setUp(self):
+        self.resolwe = MagicMock()
+        self.samples = {sample_id: MagicMock(id=sample_id) for sample_id in range(1, 30)}
+        self.resolwe.sample.filter = MagicMock(
+            side_effect=lambda id__in: [self.samples[sample_id] for sample_id in id__in])
+        self.collection = Collection(resolwe=self.resolwe, id=1)
+
+    def set_relations(self, relations):
+        self.resolwe.relation.filter.return_value.iterate.return_value = relations
+
+    def test_background_map(self):
+        self.set_relations([
+            make_background_relation(self.resolwe, 1, 10, [1, 2]),
+            make_background_relation(self.resolwe, 2, 11, [3]),
+        ])
+
+        backgrounds = self.collection.background_map()
+        self.assertEqual(backgrounds, {
+            1: self.samples[10], 2: self.samples[10], 3: self.samples[11]})
+        self.resolwe.relation.filter.assert_called_once_with(collection=1, type='background')
+        self.resolwe.sample.filter.assert_called_once_with(id__in=[10, 1, 2, 11, 3])
+        self.assertEqual(self.samples[1]._background, self.samples[10])
+        self.assertTrue(self.samples[11]._is_background)
+
+        self.set_relations([
+            make_background_relation(self.resolwe, 1, 10, [1]),
+            make_background_relation(self.resolwe, 2, 11, [1]),
+        ])
+        with self.assertRaisesRegex(LookupError, 'Multiple backgrounds'):
+            self.collection.background_map()
+
+    def test_assign_backgrounds(self):
+        relations = [
+            make_background_relation(self.resolwe, 1, 10, [1, 2]),
+            make_background_relation(self.resolwe, 2, 11, [3]),
+            make_background_relation(self.resolwe, 3, 12, [4]),
+        ]
+        self.set_relations(relations)
+
+        self.collection.assign_backgrounds(
+            {1: 10, 2: Sample(resolwe=self.resolwe, id=11), 3: 13, 4: 14, 5: 15}, workers=2)
+
+        # Case is moved to the existing relation of its new background.
+        self.assertEqual(relations[0].partitions, [
+            {'entity': 10, 'position': None, 'label': 'background'},
+            {'entity': 1, 'position': None, 'label': 'case'},
+        ])
+        self.assertEqual(relations[1].partitions, [
+            {'entity': 11, 'position': None, 'label': 'background'},
+            {'entity': 2, 'position': None, 'label': 'case'},
+        ])
+        # Relation left without cases is reused.
+        self.assertEqual(relations[2].partitions, [
+            {'entity': 13, 'position': None, 'label': 'background'},
+            {'entity': 3, 'position': None, 'label': 'case'},
+        ])
+        # Relations that lose and gain cases are saved before and after cases are added.
+        self.assertEqual([relation.save.call_count for relation in relations], [1, 2, 2])
+        for relation in relations:
+            self.assertEqual(relation.delete.call_count, 0)
+
+        self.assertEqual(self.resolwe.relation.create.call_count, 2)
+        self.resolwe.relation.create.assert_any_call(
+            type='background', collection=1, category='Background', partitions=[
+                {'entity': 14, 'label': 'background'}, {'entity': 4, 'label': 'case'}])
+        self.resolwe.relation.create.assert_any_call(
+            type='background', collection=1, category='Background', partitions=[
+                {'entity': 15, 'label': 'background'}, {'entity': 5, 'label': 'case'}])
+
+    def test_assign_delete(self):
+        relations = [
+            make_background_relation(self.resolwe, 1, 10, [1]),
+            make_background_relation(self.resolwe, 2, 11, [2]),
+        ]
+        self.set_relations(relations)
+
+        self.collection.assign_backgrounds({1: 10, 2: 10})
+
+        self.assertEqual(relations[0].partitions[2], {
+            'entity': 2, 'position': None, 'label': 'case'})
+        relations[0].save.assert_called_once_with()
+        relations[1].delete.assert_called_once_with(force=True)
+        self.assertEqual(relations[1].save.call_count, 0)
+        self.assertEqual(self.resolwe.relation.create.call_count, 0)
+
+    def test_assign_order(self):
+        relations = [
+            make_background_relation(self.resolwe, 1, 10, [1, 2]),
+            make_background_relation(self.resolwe, 2, 11, [3]),
+            make_background_relation(self.resolwe, 3, 12, [4]),
+        ]
+        self.set_relations(relations)
+        server = {1: {1, 2}, 2: {3}, 3: {4}}
+        lock = threading.Lock()
+
+        def change(relation_id, cases):
+            with lock:
+                if cases is None:
+                    server.pop(relation_id)
+                else:
+                    server[relation_id] = cases
+                all_cases = [case for cases in server.values() for case in cases]
+                # Server rejects cases in multiple background relations.
+                self.assertEqual(len(all_cases), len(set(all_cases)))
+
+        def save(relation):
+            change(relation.id, {partition['entity'] for partition in relation.partitions
+                                 if partition['label'] == 'case'})
+
+        for relation in relations:
+            relation.save.side_effect = partial(save, relation)
+            relation.delete.side_effect = partial(change, relation.id, None)
+        self.resolwe.relation.create.side_effect = lambda partitions, **kwargs: change(
+            object(), {partition['entity'] for partition in partitions
+                       if partition['label'] == 'case'})
+
+        # Cases are swapped between relations and moved to the reused
+        # relation and to a new relation.
+        self.collection.assign_backgrounds({1: 11, 3: 10, 2: 13, 4: 11, 5: 14}, workers=4)
+
+        self.assertEqual(sorted(sorted(cases) for cases in server.values()),
+                         [[1, 4], [2], [3], [5]])
+        self.assertEqual(self.resolwe.relation.create.call_count, 1)
+
+    def test_assign_unchanged(self):
+        relations = [make_background_relation(self.resolwe, 1, 10, [1])]
+        self.set_relations(relations)
+
+        self.collection.assign_backgrounds({1: 10})
+
+        self.assertEqual(relations[0].save.call_count, 0)
+        self.assertEqual(self.resolwe.relation.create.call_count, 0)
+
+        with self.assertRaisesRegex(ValueError, 'cannot be its own background'):
+            self.collection.assign_backgrounds({1: 1})
 
 
 class TestCollection(unittest.TestCase):
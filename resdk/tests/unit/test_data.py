@@ -2,6 +2,7 @@
 Unit tests for resdk/resources/data.py file.
 """
 # pylint: disable=missing-docstring, protected-access
+import io
 import unittest
 
 from mock import MagicMock, patch
@@ -160,16 +161,47 @@ class TestData(unittest.TestCase):
         data_mock.configure_mock(id=123, **{'resolwe': MagicMock()})
         data_mock.configure_mock(**{
             'files.return_value': ['file1.txt', 'file2.fq.gz'],
+            '_download_version.return_value': 'version',
         })
 
         Data.download(data_mock)
         data_mock.resolwe._download_files.assert_called_once_with(
-            ['123/file1.txt', '123/file2.fq.gz'], None)
+            ['123/file1.txt', '123/file2.fq.gz'], None, data_versions={123: 'version'},
+            progress=None)
 
         data_mock.reset_mock()
         Data.download(data_mock, download_dir="/some/path/")
         data_mock.resolwe._download_files.assert_called_once_with(
-            ['123/file1.txt', '123/file2.fq.gz'], '/some/path/')
+            ['123/file1.txt', '123/file2.fq.gz'], '/some/path/', data_versions={123: 'version'},
+            progress=None)
+
+    def test_download_version(self):
+        data = Data(id=123, resolwe=MagicMock(), checksum='abc',
+                    modified='2020-01-01T12:00:00.000000+00:00')
+        self.assertEqual(data._download_version(), 'abc:2020-01-01T12:00:00.000000+00:00')
+
+        data = Data(id=123, resolwe=MagicMock())
+        self.assertIsNone(data._download_version())
+
+    @patch('resdk.resources.data.RemoteFile')
+    def test_open(self, remote_file_mock):
+        remote_file_mock.return_value = io.BytesIO(b'gene\texpression\nBRCA2\t1.5\n')
+        data = Data(id=123, resolwe=MagicMock(url='http://resolwe.url/', auth='auth'))
+
+        with data.open('dir/expression.tab', mode='r') as handle:
+            self.assertEqual(handle.readline(), 'gene\texpression\n')
+
+        self.assertEqual(remote_file_mock.call_args[0][0],
+                         'http://resolwe.url/data/123/dir/expression.tab')
+        self.assertEqual(remote_file_mock.call_args[1]['auth'], 'auth')
+        self.assertEqual(remote_file_mock.call_args[1]['timeout'], 60)
+
+        with self.assertRaisesRegex(ValueError, "Invalid mode 'w'"):
+            data.open('expression.tab', mode='w')
+
+        data = Data(id=None, resolwe=MagicMock())
+        with self.assertRaisesRegex(ValueError, "must be saved before"):
+            data.open('expression.tab')
 
     @patch('resdk.resources.data.requests')
     @patch('resdk.resources.data.urljoin')
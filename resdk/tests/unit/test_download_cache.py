@@ -0,0 +1,144 @@
+"""
+Unit tests for resdk/download_cache.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from resdk.download_cache import DownloadCache, file_checksum
+
+
+class TestDownloadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.download_dir = os.path.join(self.tmp_dir, 'download')
+        os.makedirs(self.download_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_file(self, name, content):
+        path = os.path.join(self.download_dir, name)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        return path
+
+    def test_key(self):
+        key = DownloadCache.get_key(1, 'dir/file.txt', 'abc:2020')
+        self.assertEqual(key, DownloadCache.get_key('1', 'dir/file.txt', 'abc:2020'))
+        self.assertNotEqual(key, DownloadCache.get_key(1, 'dir/file.txt', 'abc:2021'))
+        self.assertNotEqual(key, DownloadCache.get_key(1, 'dir/other.txt', 'abc:2020'))
+
+    def test_add_restore(self):
+        cache = DownloadCache(self.cache_dir)
+        source = self.make_file('reads.fq', b'ACGT')
+        cache.add('key1', source, file_checksum(source), file='1/reads.fq')
+
+        self.assertEqual(cache.size(), 4)
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.restore('missing', os.path.join(self.download_dir, 'x')))
+
+        destination = os.path.join(self.download_dir, 'copy.fq')
+        self.assertTrue(cache.restore('key1', destination))
+        with open(destination, 'rb') as handle:
+            self.assertEqual(handle.read(), b'ACGT')
+        # Files are copied by default.
+        self.assertFalse(os.path.samefile(destination, cache.get('key1')))
+
+        cache = DownloadCache(self.cache_dir, link=True)
+        destination = os.path.join(self.download_dir, 'copy2.fq')
+        cache.restore('key1', destination)
+        self.assertTrue(os.path.samefile(destination, cache.get('key1')))
+
+    def test_pickle(self):
+        cache = DownloadCache(self.cache_dir, max_size=10, link=True, verify=True)
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((copy.path, copy.max_size, copy.link, copy.verify),
+                         (cache.path, 10, True, True))
+
+    def test_evicted_entry(self):
+        cache = DownloadCache(self.cache_dir)
+        source = self.make_file('reads.fq', b'ACGT')
+        cache.add('key1', source, file_checksum(source))
+        destination = os.path.join(self.download_dir, 'copy.fq')
+
+        # Entry is removed by another process after it was found.
+        get = cache.get
+
+        def get_and_remove(key):
+            path = get(key)
+            cache.remove(key)
+            return path
+
+        with patch.object(cache, 'get', side_effect=get_and_remove):
+            self.assertFalse(cache.restore('key1', destination))
+        self.assertFalse(os.path.exists(destination))
+        self.assertEqual(os.listdir(self.download_dir), ['reads.fq'])
+
+    def test_failed_place(self):
+        cache = DownloadCache(self.cache_dir)
+        source = self.make_file('reads.fq', b'ACGT')
+        cache.add('key1', source, file_checksum(source))
+
+        # Temporary file is removed if it cannot be renamed.
+        with patch('resdk.download_cache.os.replace', side_effect=OSError('No space')):
+            with self.assertRaisesRegex(OSError, 'No space'):
+                cache.restore('key1', os.path.join(self.download_dir, 'copy.fq'))
+        self.assertEqual(os.listdir(self.download_dir), ['reads.fq'])
+
+    def test_corrupted_entry(self):
+        cache = DownloadCache(self.cache_dir, verify=True)
+        source = self.make_file('reads.fq', b'ACGT')
+        cache.add('key1', source, hashlib.sha256(b'ACGT').hexdigest())
+        cache.add('key2', source, hashlib.sha256(b'ACGT').hexdigest())
+
+        # Size mismatch.
+        with open(cache._entry_path('key1'), 'wb') as handle:
+            handle.write(b'AC')
+        self.assertIsNone(cache.get('key1'))
+        self.assertFalse(os.path.exists(cache._entry_path('key1')))
+
+        # Checksum mismatch.
+        with open(cache._entry_path('key2'), 'wb') as handle:
+            handle.write(b'TTTT')
+        self.assertIsNone(cache.get('key2'))
+
+    def test_evict(self):
+        cache = DownloadCache(self.cache_dir, max_size=10)
+        for index in range(3):
+            source = self.make_file('file{}'.format(index), b'x' * 4)
+            cache.add('key{}'.format(index), source, file_checksum(source))
+            # Make modification times of entries distinct.
+            os.utime(cache._entry_path('key{}'.format(index)) + '.json', (index, index))
+
+        # Oldest entry was evicted when the third one was added.
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.size(), 8)
+
+        # Using an entry makes it the most recently used one.
+        cache.get('key1')
+        source = self.make_file('file3', b'x' * 4)
+        cache.add('key3', source, file_checksum(source))
+        self.assertIsNone(cache.get('key2'))
+        self.assertIsNotNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key3'))
+
+        # Entries added without eviction are evicted explicitly.
+        for index in range(4, 6):
+            source = self.make_file('file{}'.format(index), b'x' * 4)
+            cache.add('key{}'.format(index), source, file_checksum(source), evict=False)
+        self.assertEqual(cache.size(), 16)
+        cache.evict()
+        self.assertEqual(cache.size(), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
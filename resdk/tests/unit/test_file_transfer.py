@@ -0,0 +1,404 @@
+"""
+Unit tests for resdk/file_transfer.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+
+import gzip
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from functools import partial
+
+from mock import ANY, MagicMock, mock_open, patch
+
+from resdk.resolwe import Resolwe
+from resdk.tests.benchmarks.server import FakeResolweServer, SyntheticDataset
+from resdk.transfer import AdaptiveChunkSize, ChunkSize, TransferScheduler
+from resdk.upload_cache import UploadCache
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestUploadFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.file_path = os.path.join(BASE_DIR, 'files', 'example.fastq')
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_upload_files(self, resolwe_mock):
+        resolwe_mock.configure_mock(url='http://some/url',
+                                    transfer_scheduler=TransferScheduler(connections=2),
+                                    auth=MagicMock(username='user'),
+                                    upload_cache=UploadCache(), compress_uploads=False)
+        active = []
+        max_active = []
+
+        def upload_file(path, compress=False, progress=None):
+            active.append(path)
+            max_active.append(len(active))
+            threading.Event().wait(0.01)
+            active.remove(path)
+            return 'temp_{}'.format(len(max_active))
+
+        resolwe_mock._upload_file = MagicMock(side_effect=upload_file)
+        paths = [self.file_path, __file__, self.file_path, 'http://www.example.com/reads.fq',
+                 {'file': 'reads.fq', 'file_temp': 'temp'}]
+
+        uploaded = Resolwe._upload_files(resolwe_mock, paths)
+        self.assertEqual(sorted(uploaded), sorted([self.file_path, __file__]))
+        self.assertEqual(uploaded[self.file_path]['file'], 'example.fastq')
+        self.assertEqual(resolwe_mock._upload_file.call_count, 2)
+        self.assertLessEqual(max(max_active), 2)
+
+        self.assertEqual(Resolwe._upload_files(resolwe_mock, []), {})
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_deduplicate(self, resolwe_mock):
+        resolwe_mock.configure_mock(url='http://some/url', transfer_scheduler=TransferScheduler(),
+                                    auth=MagicMock(username='user'),
+                                    upload_cache=UploadCache(), compress_uploads=False)
+        resolwe_mock._upload_file = MagicMock(return_value='temp')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            copy_path = os.path.join(tmp_dir, 'copy.fastq')
+            shutil.copy(self.file_path, copy_path)
+
+            # Files with the same content are uploaded once.
+            uploaded = Resolwe._upload_files(resolwe_mock, [self.file_path, copy_path])
+            self.assertEqual(uploaded[copy_path], {'file': 'copy.fastq', 'file_temp': 'temp'})
+            self.assertEqual(uploaded[self.file_path]['file_temp'], 'temp')
+            self.assertEqual(resolwe_mock._upload_file.call_count, 1)
+
+            # Uploaded files are not uploaded again.
+            uploaded = Resolwe._upload_files(resolwe_mock, [copy_path])
+            self.assertEqual(uploaded[copy_path]['file_temp'], 'temp')
+            self.assertEqual(resolwe_mock._upload_file.call_count, 1)
+
+            # Uploads of other users are not reused.
+            resolwe_mock.auth.username = 'other'
+            Resolwe._upload_files(resolwe_mock, [copy_path])
+            self.assertEqual(resolwe_mock._upload_file.call_count, 2)
+            resolwe_mock.auth.username = 'user'
+
+            # Changed files are.
+            with open(copy_path, 'a') as handle:
+                handle.write('changed')
+            os.utime(copy_path, ns=(0, 0))
+            Resolwe._upload_files(resolwe_mock, [copy_path])
+            self.assertEqual(resolwe_mock._upload_file.call_count, 3)
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_compress(self, resolwe_mock):
+        resolwe_mock.configure_mock(url='http://some/url', transfer_scheduler=TransferScheduler(),
+                                    auth=MagicMock(username='user'),
+                                    upload_cache=UploadCache(), compress_uploads=True)
+        resolwe_mock._upload_file = MagicMock(return_value='temp')
+        binary_path = os.path.join(BASE_DIR, 'files', 'reads.fastq.gz')
+
+        uploaded = Resolwe._upload_files(resolwe_mock, [self.file_path, binary_path])
+        self.assertEqual(uploaded[self.file_path],
+                         {'file': 'example.fastq.gz', 'file_temp': 'temp'})
+        self.assertEqual(uploaded[binary_path]['file'], 'reads.fastq.gz')
+        resolwe_mock._upload_file.assert_any_call(self.file_path, compress=True, progress=ANY)
+        resolwe_mock._upload_file.assert_any_call(binary_path, compress=False, progress=ANY)
+
+        # Uncompressed upload of the same file is not reused.
+        resolwe_mock.compress_uploads = False
+        Resolwe._upload_files(resolwe_mock, [self.file_path])
+        resolwe_mock._upload_file.assert_called_with(self.file_path, compress=False, progress=ANY)
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_compress_rejected(self, resolwe_mock):
+        resolwe_mock.configure_mock(url='http://some/url', transfer_scheduler=TransferScheduler(),
+                                    auth=MagicMock(username='user'),
+                                    upload_cache=UploadCache(), compress_uploads=True)
+        resolwe_mock._upload_file = MagicMock(return_value='temp')
+
+        # Field does not accept the name of the compressed file.
+        uploaded = Resolwe._upload_files(
+            resolwe_mock, [self.file_path],
+            file_name_regexes={self.file_path: [re.compile(r'\.fastq$')]})
+        self.assertEqual(uploaded[self.file_path], {'file': 'example.fastq', 'file_temp': 'temp'})
+        resolwe_mock._upload_file.assert_called_once_with(
+            self.file_path, compress=False, progress=ANY)
+
+        uploaded = Resolwe._upload_files(
+            resolwe_mock, [self.file_path],
+            file_name_regexes={self.file_path: [re.compile(r'\.fastq(\.gz)?$')]})
+        self.assertEqual(uploaded[self.file_path]['file'], 'example.fastq.gz')
+        resolwe_mock._upload_file.assert_called_with(self.file_path, compress=True, progress=ANY)
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_missing_file(self, resolwe_mock):
+        with self.assertRaisesRegex(ValueError, r"File /bad/path/to/file not found."):
+            Resolwe._upload_files(resolwe_mock, [self.file_path, '/bad/path/to/file'])
+        self.assertEqual(resolwe_mock._upload_file.call_count, 0)
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_upload_fails(self, resolwe_mock):
+        resolwe_mock.configure_mock(url='http://some/url', transfer_scheduler=TransferScheduler(),
+                                    auth=MagicMock(username='user'),
+                                    upload_cache=UploadCache(), compress_uploads=False)
+        resolwe_mock._upload_file = MagicMock(return_value=None)
+        with self.assertRaisesRegex(Exception, r'Upload failed for .*example.fastq'):
+            Resolwe._upload_files(resolwe_mock, [self.file_path])
+
+
+class TestUploadFile(unittest.TestCase):
+
+    def setUp(self):
+        self.file_path = os.path.join(BASE_DIR, 'files', 'example.fastq')
+        self.config = {'url': 'http://some/url', 'auth': MagicMock(), 'logger': MagicMock(),
+                       'chunk_size': ChunkSize()}
+
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_always_ok(self, resolwe_mock, requests_mock):
+        resolwe_mock.configure_mock(**self.config)
+        # Immitate response form server - always status 200:
+        requests_response = {'files': [{'temp': 'fake_name'}]}
+        requests_mock.post.return_value = MagicMock(status_code=200,
+                                                    **{'json.return_value': requests_response})
+
+        progress = MagicMock()
+        response = Resolwe._upload_file(resolwe_mock, self.file_path, progress=progress)
+
+        self.assertEqual(response, 'fake_name')
+        last = progress.call_args[0][0]
+        file_size = os.path.getsize(self.file_path)
+        self.assertEqual((last.bytes_done, last.bytes_total), (file_size, file_size))
+        self.assertEqual((last.items_done, last.items_total), (1, 1))
+
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_always_bad(self, resolwe_mock, requests_mock):
+        resolwe_mock.configure_mock(**self.config)
+        # Immitate response form server - always status 400
+        requests_mock.post.return_value = MagicMock(status_code=400)
+
+        response = Resolwe._upload_file(resolwe_mock, self.file_path)
+
+        self.assertIsNone(response)
+        self.assertEqual(resolwe_mock.logger.warning.call_count, 4)
+
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_one_bad_other_ok(self, resolwe_mock, requests_mock):
+        resolwe_mock.configure_mock(**self.config)
+        requests_response = {'files': [{'temp': 'fake_name'}]}
+        response_ok = MagicMock(status_code=200, **{'json.return_value': requests_response})
+        response_fails = MagicMock(status_code=400)
+        # Immitate response form server - one status 400, but other 200:
+        requests_mock.post.side_effect = [response_fails, response_ok, response_ok]
+
+        response = Resolwe._upload_file(resolwe_mock, self.file_path)
+
+        self.assertEqual(response, 'fake_name')
+        self.assertEqual(resolwe_mock.logger.warning.call_count, 1)
+
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_chunk_size(self, resolwe_mock, requests_mock):
+        self.config['chunk_size'] = AdaptiveChunkSize(size=2000, min_size=1000, max_size=4000)
+        resolwe_mock.configure_mock(**self.config)
+        requests_response = {'files': [{'temp': 'fake_name'}]}
+        response = MagicMock(status_code=200, **{'json.return_value': requests_response})
+        chunks = []
+
+        def post(url, data, **kwargs):
+            body = data.read()
+            start = body.index(b'application/octet-stream\r\n\r\n') + 28
+            chunks.append(body[start:body.rindex(b'\r\n--')])
+            self.assertEqual(len(body), len(data))
+            self.assertEqual(data.fields['_chunkSize'], 2000)
+            self.assertEqual(data.fields['_currentChunkSize'], len(chunks[-1]))
+            self.assertEqual(kwargs['headers']['Content-Type'], data.content_type)
+            return response
+
+        requests_mock.post.side_effect = post
+        Resolwe._upload_file(resolwe_mock, self.file_path)
+
+        # Chunk size is fixed for the file, but adapted for the next one.
+        file_size = os.path.getsize(self.file_path)
+        self.assertEqual(len(chunks), -(-file_size // 2000))
+        with open(self.file_path, 'rb') as handle:
+            self.assertEqual(b''.join(chunks), handle.read())
+        self.assertEqual(resolwe_mock.chunk_size.get(), 4000)
+
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_compress(self, resolwe_mock):
+        uploaded = []
+
+        def upload_file(path, progress):
+            with gzip.open(path, 'rb') as handle:
+                uploaded.append((os.path.basename(path), handle.read()))
+            return 'fake_name'
+
+        resolwe_mock._upload_file.side_effect = upload_file
+        response = Resolwe._upload_file(resolwe_mock, self.file_path, compress=True)
+
+        self.assertEqual(response, 'fake_name')
+        with open(self.file_path, 'rb') as handle:
+            self.assertEqual(uploaded, [('example.fastq.gz', handle.read())])
+
+    def test_renew_session(self):
+        with FakeResolweServer(SyntheticDataset(collections=0)) as server:
+            res = Resolwe('user', 'pass', server.url)
+            self.assertIsNotNone(res._upload_file(self.file_path))
+
+            # Chunk rejected after the session expired is sent again.
+            server.expire_sessions()
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(res._upload_file(self.file_path)), daemon=True)
+            thread.start()
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+            self.assertIsNotNone(results[0])
+
+            metrics = res.instrumentation.metrics.as_dict()
+            self.assertEqual(metrics[('POST', '/upload')]['statuses'], {200: 2, 403: 1})
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.file_list = ['/the/first/file.txt', '/the/second/file.py']
+        self.config = {'url': 'http://some/url', 'auth': MagicMock(), 'logger': MagicMock()}
+
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_fail_if_bad_dir(self, resolwe_mock, os_mock):
+        resolwe_mock.configure_mock(**self.config)
+        os_mock.path.isdir.return_value = False
+
+        message = "Download directory does not exist: .*"
+        with self.assertRaisesRegex(ValueError, message):
+            Resolwe._download_files(resolwe_mock, self.file_list)
+
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_empty_file_list(self, resolwe_mock, os_mock):
+        resolwe_mock.configure_mock(**self.config)
+
+        Resolwe._download_files(resolwe_mock, [])
+
+        resolwe_mock.logger.info.assert_called_once_with("No files to download.")
+
+    @patch('resdk.file_transfer.open')
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_bad_response(self, resolwe_mock, requests_mock, os_mock, open_mock):
+        resolwe_mock.configure_mock(**self.config)
+        os_mock.path.isfile.return_value = True
+        mock_open.return_value = MagicMock(spec=io.IOBase)
+
+        resolwe_mock._download_file.side_effect = partial(Resolwe._download_file, resolwe_mock)
+
+        response = {'raise_for_status.side_effect': Exception("abc")}
+        requests_mock.get.return_value = MagicMock(ok=False, **response)
+
+        with self.assertRaisesRegex(Exception, "abc"):
+            Resolwe._download_files(resolwe_mock, self.file_list[:1])
+        self.assertEqual(resolwe_mock.logger.info.call_count, 2)
+
+    @patch('resdk.file_transfer.open')
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_good_response(self, resolwe_mock, requests_mock, os_mock, open_mock):
+        resolwe_mock.configure_mock(**self.config)
+        os_mock.path.isfile.return_value = True
+
+        # When mocking open one wants it to return a "file-like" mock: (spec=io.IOBase)
+        mock_open.return_value = MagicMock(spec=io.IOBase)
+
+        resolwe_mock._download_file.side_effect = partial(Resolwe._download_file, resolwe_mock)
+
+        requests_mock.get.return_value = MagicMock(
+            ok=True, headers={'Content-Length': '3'},
+            **{'iter_content.return_value': [b'a', b'b', b'c']})
+
+        progress = MagicMock()
+        Resolwe._download_files(resolwe_mock, self.file_list, progress=progress,
+                                file_sizes={'/the/first/file.txt': 3})
+        self.assertEqual(resolwe_mock.logger.info.call_count, 3)
+        last = progress.call_args[0][0]
+        self.assertEqual((last.bytes_done, last.bytes_total), (6, None))
+        self.assertEqual((last.items_done, last.items_total), (2, 2))
+
+        # This asserts may seem wierd. To check what is happening behind the scenes:
+        # print(open_mock.mock_calls)
+        self.assertEqual(open_mock.return_value.__enter__.return_value.write.call_count, 6)
+        # Why 6? 2 files in self.file_list, each downloads 3 chunks (defined in response mock)
+        self.assertEqual(os_mock.replace.call_count, 2)
+
+    @patch('resdk.file_transfer.open')
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_incomplete_response(self, resolwe_mock, requests_mock, os_mock, open_mock):
+        resolwe_mock.configure_mock(**self.config)
+        requests_mock.get.return_value = MagicMock(
+            ok=True, headers={'Content-Length': '5'},
+            **{'iter_content.return_value': [b'a', b'b', b'c']})
+
+        with self.assertRaisesRegex(ValueError, "received 3 of 5 bytes"):
+            Resolwe._download_file(resolwe_mock, 'http://some/url/data/1/file.txt', '/file.txt')
+        os_mock.remove.assert_called_once_with('/file.txt.part')
+        self.assertEqual(os_mock.replace.call_count, 0)
+
+        # Size of compressed transfer is not comparable to the content.
+        os_mock.reset_mock()
+        requests_mock.get.return_value.headers['Content-Encoding'] = 'gzip'
+        Resolwe._download_file(resolwe_mock, 'http://some/url/data/1/file.txt', '/file.txt')
+        os_mock.replace.assert_called_once_with('/file.txt.part', '/file.txt')
+
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_download_cache(self, resolwe_mock, os_mock):
+        resolwe_mock.configure_mock(**self.config)
+        os_mock.path = os.path
+        cache = MagicMock(**{'get_key.return_value': 'key', 'restore.return_value': True})
+        resolwe_mock.download_cache = cache
+
+        # Cached files are restored without transfer.
+        Resolwe._download_files(resolwe_mock, ['1/file.txt'], '/', data_versions={1: 'v1'})
+        cache.get_key.assert_called_once_with('1', 'file.txt', 'v1')
+        cache.restore.assert_called_once_with('key', '/file.txt')
+        self.assertEqual(resolwe_mock._download_file.call_count, 0)
+        self.assertEqual(cache.evict.call_count, 0)
+
+        # Missing files are downloaded and added to the cache.
+        cache.restore.return_value = False
+        resolwe_mock._download_file.return_value = 'checksum'
+        Resolwe._download_files(resolwe_mock, ['1/file.txt'], '/', data_versions={1: 'v1'})
+        resolwe_mock._download_file.assert_called_once_with(
+            'http://some/data/1/file.txt', '/file.txt', checksum=True, progress=ANY)
+        cache.add.assert_called_once_with(
+            'key', '/file.txt', 'checksum', evict=False, file='1/file.txt')
+        cache.evict.assert_called_once_with()
+
+        # Cache is evicted once per batch.
+        cache.reset_mock()
+        Resolwe._download_files(resolwe_mock, ['1/file.txt', '1/other.txt'], '/',
+                                data_versions={1: 'v1'})
+        self.assertEqual(cache.add.call_count, 2)
+        cache.evict.assert_called_once_with()
+
+        # Files of Data objects with unknown version are not cached.
+        cache.reset_mock()
+        resolwe_mock._download_file.reset_mock()
+        Resolwe._download_files(resolwe_mock, ['2/file.txt'], '/', data_versions={2: None})
+        self.assertEqual(cache.get_key.call_count, 0)
+        resolwe_mock._download_file.assert_called_once_with(
+            'http://some/data/2/file.txt', '/file.txt', checksum=False, progress=ANY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Unit tests for resdk/__init__.py file.
+"""
+# pylint: disable=missing-docstring
+import subprocess
+import sys
+import unittest
+
+import resdk
+from resdk.query import ResolweQuery
+from resdk.resolwe import Resolwe
+
+# Print modules that should not be imported by ``import resdk``.
+CHECK_IMPORTS = """
+import sys
+import resdk
+heavy = ['requests', 'slumber', 'pytz', 'tzlocal', 'wrapt', 'yaml', 'resdk.resolwe']
+print(','.join(name for name in heavy if name in sys.modules))
+print(sys.excepthook is sys.__excepthook__)
+"""
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_attributes(self):
+        self.assertIs(resdk.Resolwe, Resolwe)
+        self.assertIs(resdk.ResolweQuery, ResolweQuery)
+        self.assertIn('Resolwe', dir(resdk))
+
+        with self.assertRaisesRegex(AttributeError, "has no attribute 'Foo'"):
+            resdk.Foo  # pylint: disable=no-member,pointless-statement
+
+    @unittest.skipIf(sys.version_info < (3, 7), "Lazy import requires Python 3.7")
+    def test_import_is_light(self):
+        output = subprocess.check_output([sys.executable, '-c', CHECK_IMPORTS])
+        imported, excepthook_unchanged = output.decode('utf-8').splitlines()
+        self.assertEqual(imported, '')
+        self.assertEqual(excepthook_unchanged, 'True')
+
+
+if __name__ == '__main__':
+    unittest.main()
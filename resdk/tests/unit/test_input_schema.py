@@ -0,0 +1,162 @@
+"""
+Unit tests for resdk/resources/input_schema.py file.
+"""
+# pylint: disable=missing-docstring
+import pathlib
+import unittest
+
+from mock import MagicMock
+
+from resdk.resources import Data, Process
+from resdk.resources.input_schema import InputSchema, get_input_schema
+
+INPUT_SCHEMA = [
+    {'name': 'reads', 'type': 'data:reads:fastq:'},
+    {'name': 'genomes', 'type': 'list:data:genome:fasta:', 'required': False},
+    {'name': 'src', 'type': 'basic:file:', 'required': False},
+    {'name': 'src_list', 'type': 'list:basic:file:', 'required': False},
+    {'name': 'threads', 'type': 'basic:integer:', 'default': 1},
+    {'name': 'ratio', 'type': 'basic:decimal:', 'required': False},
+    {'name': 'paired', 'type': 'basic:boolean:', 'default': False},
+    {'name': 'mode', 'type': 'basic:string:', 'default': 'fast',
+     'choices': [{'label': 'Fast', 'value': 'fast'}, {'label': 'Slow', 'value': 'slow'}]},
+    {'name': 'label', 'type': 'basic:string:', 'required': False,
+     'choices': [{'label': 'A', 'value': 'a'}], 'allow_custom_choice': True},
+    {'name': 'metadata', 'type': 'basic:json:', 'required': False},
+    {'name': 'link', 'type': 'basic:url:download:', 'required': False},
+    {'name': 'options', 'group': [
+        {'name': 'min_length', 'type': 'basic:integer:'},
+        {'name': 'adapters', 'type': 'data:seq:nucleotide:', 'required': False},
+    ]},
+]
+
+
+class TestInputSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = InputSchema(INPUT_SCHEMA, 'align')
+        self.data = Data(resolwe=MagicMock(), id=42)
+
+    def test_validate(self):
+        self.assertEqual(self.schema.validate({'reads': 1}), [])
+        self.assertEqual(self.schema.validate({
+            'reads': self.data,
+            'genomes': [1, self.data],
+            'src': 'reads.fastq',
+            'src_list': 'reads.fastq',
+            'threads': 4,
+            'ratio': 1,
+            'paired': True,
+            'mode': 'slow',
+            'label': 'custom',
+            'metadata': {'any': ['value']},
+            'link': {'url': 'http://some/url/reads.fastq'},
+            'options': {'min_length': 10, 'adapters': None},
+        }), [])
+        self.assertEqual(self.schema.validate({
+            'reads': 1,
+            'src': pathlib.Path('reads.fastq'),
+            'link': 'http://some/url/reads.fastq',
+        }), [])
+
+        self.assertEqual(self.schema.validate({
+            'genomes': ['genome'],
+            'src': 5,
+            'threads': True,
+            'ratio': 'high',
+            'mode': 'medium',
+            'unknown': 1,
+            'options': {'min_length': 1.5, 'other': 1},
+        }), [
+            "Field 'genomes' must be a Data object or its id, not 'genome'.",
+            "Field 'src' of type 'basic:file:' has invalid value 5.",
+            "Field 'threads' of type 'basic:integer:' has invalid value True.",
+            "Field 'ratio' of type 'basic:decimal:' has invalid value 'high'.",
+            "Field 'mode' has invalid choice 'medium', choices are: fast, slow.",
+            "Field 'unknown' not in process 'align' input schema.",
+            "Field 'options.min_length' of type 'basic:integer:' has invalid value 1.5.",
+            "Field 'options.other' not in process 'align' input schema.",
+            "Required field 'reads' is not given.",
+        ])
+
+        self.assertEqual(self.schema.validate({'reads': 1, 'options': 5}),
+                         ["Group 'options' must be a dict, not 5."])
+
+    def test_dehydrate(self):
+        process_file = MagicMock(side_effect=lambda path: {'file': path, 'file_temp': 'tmp'})
+        inputs = {
+            'reads': self.data,
+            'genomes': self.data,
+            'src': pathlib.Path('a.fastq'),
+            'src_list': 'b.fastq',
+            'metadata': {'data': [self.data]},
+            'options': {'adapters': self.data, 'min_length': 5},
+            'ratio': None,
+        }
+
+        self.assertEqual(self.schema.dehydrate(inputs, process_file), {
+            'reads': 42,
+            'genomes': [42],
+            'src': {'file': 'a.fastq', 'file_temp': 'tmp'},
+            'src_list': [{'file': 'b.fastq', 'file_temp': 'tmp'}],
+            'metadata': {'data': [42]},
+            'options': {'adapters': 42, 'min_length': 5},
+            'ratio': None,
+        })
+        # Inputs are left intact.
+        self.assertIs(inputs['metadata']['data'][0], self.data)
+        self.assertEqual(inputs['src_list'], 'b.fastq')
+
+    def test_files(self):
+        self.assertEqual(self.schema.files({
+            'reads': self.data,
+            'src': 'a.fastq',
+            'src_list': [pathlib.Path('b.fastq'), {'file': 'c.fastq', 'file_temp': 'tmp'}],
+            'metadata': {'src': 'd.fastq'},
+            'options': {'min_length': 5},
+        }), ['a.fastq', 'b.fastq', {'file': 'c.fastq', 'file_temp': 'tmp'}])
+        self.assertEqual(self.schema.files({'src_list': 'b.fastq', 'src': None}), ['b.fastq'])
+
+        schema = InputSchema([
+            {'name': 'group', 'group': [{'name': 'src', 'type': 'basic:file:'}]}])
+        self.assertEqual(schema.files({'group': {'src': 'a.fastq'}}), ['a.fastq'])
+
+    def test_file_name_regexes(self):
+        schema = InputSchema([
+            {'name': 'src', 'type': 'basic:file:', 'validate_regex': r'\.fastq$'},
+            {'name': 'src_list', 'type': 'list:basic:file:', 'validate_regex': r'\.fq$'},
+            {'name': 'other', 'type': 'basic:file:'},
+            {'name': 'group', 'group': [
+                {'name': 'src', 'type': 'basic:file:', 'validate_regex': r'\.(fq|fastq)$'}]},
+        ])
+
+        regexes = schema.file_name_regexes({
+            'src': 'a.fastq',
+            'src_list': ['a.fastq', pathlib.Path('b.fq'), {'file': 'c.fq', 'file_temp': 'tmp'}],
+            'other': 'c.fastq',
+            'group': {'src': 'b.fq'},
+        })
+        self.assertEqual({path: [regex.pattern for regex in path_regexes]
+                          for path, path_regexes in regexes.items()}, {
+            'a.fastq': [r'\.fastq$', r'\.fq$'],
+            'b.fq': [r'\.fq$', r'\.(fq|fastq)$'],
+        })
+
+    def test_get_input_schema(self):
+        process = Process(resolwe=MagicMock(), id=1, slug='align', version='1.0.0',
+                          input_schema=INPUT_SCHEMA)
+        schema = get_input_schema(process)
+        self.assertEqual(list(schema.fields), [field['name'] for field in INPUT_SCHEMA])
+        self.assertIs(get_input_schema(process), schema)
+
+        process = Process(resolwe=MagicMock(), id=1, slug='align', version='2.0.0',
+                          input_schema=INPUT_SCHEMA)
+        self.assertIsNot(get_input_schema(process), schema)
+
+        # Schemas of unsaved processes are not cached.
+        process = Process(resolwe=MagicMock(), slug='align', input_schema=INPUT_SCHEMA)
+        self.assertIsNot(get_input_schema(process), get_input_schema(process))
+
+
+if __name__ == '__main__':
+    unittest.main()
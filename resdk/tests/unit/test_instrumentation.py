@@ -0,0 +1,162 @@
+"""
+Unit tests for resdk/instrumentation.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import datetime
+import pickle
+import unittest
+
+import requests
+from mock import MagicMock
+
+from resdk.auth import ResAuth
+from resdk.instrumentation import Instrumentation, RequestMetrics, get_endpoint
+
+
+def make_request(method='GET', url='http://some/url/api/data/42', data=None):
+    return requests.Request(method, url, data=data).prepare()
+
+
+def make_response(request, status=200, length='10', latency=0.2):
+    headers = {'Content-Length': length} if length is not None else {}
+    return MagicMock(
+        request=request,
+        status_code=status,
+        headers=headers,
+        elapsed=datetime.timedelta(seconds=latency),
+    )
+
+
+def log_event(event):
+    return event
+
+
+def send(request, response):
+    for hook in request.hooks['response']:
+        response = hook(response)
+    return response
+
+
+class TestGetEndpoint(unittest.TestCase):
+
+    def test_get_endpoint(self):
+        self.assertEqual(get_endpoint('http://some/url/api/data'), '/url/api/data')
+        self.assertEqual(get_endpoint('http://host/api/data/42/parents?a=1'),
+                         '/api/data/{id}/parents')
+        self.assertEqual(get_endpoint('http://host/data/42/dir/reads.fq'), '/data/{id}/{path}')
+        self.assertEqual(get_endpoint('http://host/data/42'), '/data/{id}')
+        self.assertEqual(get_endpoint('http://host'), '/')
+
+
+class TestRequestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RequestMetrics(buckets=(0.1, 1))
+        event = {'method': 'GET', 'endpoint': '/api/data', 'request_bytes': 0}
+        self.metrics.observe(dict(event, status=200, response_bytes=100, latency=0.05))
+        self.metrics.observe(dict(event, status=200, response_bytes=None, latency=0.5))
+        self.metrics.observe(dict(event, status=404, response_bytes=10, latency=5))
+
+    def test_as_dict(self):
+        self.assertEqual(self.metrics.as_dict(), {
+            ('GET', '/api/data'): {
+                'count': 3,
+                'statuses': {200: 2, 404: 1},
+                'request_bytes': 0,
+                'response_bytes': 110,
+                'latency_sum': 5.55,
+                'latency_buckets': {0.1: 1, 1: 2, '+Inf': 3},
+            },
+        })
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.as_dict(), {})
+
+    def test_to_prometheus(self):
+        text = self.metrics.to_prometheus()
+        labels = '{method="GET",endpoint="/api/data"'
+        self.assertIn('# TYPE resdk_requests_total counter\n', text)
+        self.assertIn('resdk_requests_total' + labels + ',status="404"} 1\n', text)
+        self.assertIn('resdk_response_bytes_total' + labels + '} 110\n', text)
+        self.assertIn('# TYPE resdk_request_duration_seconds histogram\n', text)
+        self.assertIn('resdk_request_duration_seconds_bucket' + labels + ',le="1"} 2\n', text)
+        self.assertIn('resdk_request_duration_seconds_bucket' + labels + ',le="+Inf"} 3\n', text)
+        self.assertIn('resdk_request_duration_seconds_count' + labels + '} 3\n', text)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_hooks(self):
+        instrumentation = Instrumentation()
+        pre_events, post_events = [], []
+        instrumentation.add_pre_request_hook(lambda event: pre_events.append(dict(event)))
+        instrumentation.add_post_request_hook(post_events.append)
+
+        request = make_request('POST', data={'name': 'test'})
+        instrumentation.instrument(request)
+        self.assertEqual(pre_events, [{
+            'method': 'POST',
+            'url': 'http://some/url/api/data/42',
+            'endpoint': '/url/api/data/{id}',
+            'request_bytes': 9,
+        }])
+        self.assertEqual(post_events, [])
+
+        response = make_response(request, status=201, length=None)
+        self.assertIs(send(request, response), response)
+        self.assertEqual(post_events, [dict(pre_events[0], status=201, response_bytes=None,
+                                            latency=0.2)])
+        metrics = instrumentation.metrics.as_dict()
+        self.assertEqual(metrics[('POST', '/url/api/data/{id}')]['count'], 1)
+
+        instrumentation.remove_hook(post_events.append)
+        request = make_request()
+        instrumentation.instrument(request)
+        send(request, make_response(request))
+        self.assertEqual(len(pre_events), 2)
+        self.assertEqual(len(post_events), 1)
+
+    def test_failing_hook(self):
+        instrumentation = Instrumentation()
+        instrumentation.logger = MagicMock()
+        instrumentation.add_pre_request_hook(MagicMock(side_effect=ValueError))
+        post_hook = MagicMock()
+        instrumentation.add_post_request_hook(post_hook)
+
+        request = make_request()
+        instrumentation.instrument(request)
+        send(request, make_response(request))
+
+        self.assertEqual(instrumentation.logger.exception.call_count, 1)
+        self.assertEqual(post_hook.call_count, 1)
+
+    def test_pickle(self):
+        instrumentation = Instrumentation()
+        instrumentation.logger = MagicMock()
+        instrumentation.add_pre_request_hook(log_event)
+        instrumentation.add_post_request_hook(log_event)
+        instrumentation.add_post_request_hook(lambda event: event)
+        request = make_request()
+        instrumentation.instrument(request)
+        send(request, make_response(request))
+
+        # Hooks that cannot be pickled are dropped with a warning.
+        copy = pickle.loads(pickle.dumps(instrumentation))
+        self.assertEqual(copy._pre_request_hooks, [log_event])
+        self.assertEqual(copy._post_request_hooks, [log_event])
+        self.assertEqual(instrumentation.logger.warning.call_count, 1)
+        # Metrics are not copied.
+        self.assertEqual(copy.metrics.as_dict(), {})
+        self.assertEqual(len(instrumentation._post_request_hooks), 2)
+
+    def test_res_auth(self):
+        instrumentation = Instrumentation()
+        auth = ResAuth(url='http://some/url', instrumentation=instrumentation)
+
+        request = requests.Request('GET', 'http://some/url/api/data', auth=auth).prepare()
+        send(request, make_response(request))
+        self.assertEqual(list(instrumentation.metrics.as_dict()), [('GET', '/url/api/data')])
+
+
+if __name__ == '__main__':
+    unittest.main()
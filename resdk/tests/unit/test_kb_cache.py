@@ -0,0 +1,60 @@
+"""
+Unit tests for resdk/kb_cache.py file.
+"""
+# pylint: disable=missing-docstring
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from resdk.kb_cache import KBCache
+
+
+class TestKBCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'resdk', 'kb.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_set(self):
+        cache = KBCache(self.path)
+        namespace = cache.get_namespace('http://some/url', 'kb.mapping.search', {'a': 1})
+        self.assertEqual(namespace, KBCache.get_namespace('http://some/url',
+                                                          'kb.mapping.search', {'a': 1}))
+        self.assertEqual(cache.get(namespace, ['1', '2']), {})
+
+        keys = [str(index) for index in range(1200)]
+        cache.set(namespace, {key: [{'id': key}] for key in keys})
+        cache.set(namespace, {'missing': []})
+
+        # Cache is persistent.
+        cache = KBCache(self.path)
+        cached = cache.get(namespace, keys + ['missing', 'unknown'])
+        self.assertEqual(len(cached), 1201)
+        self.assertEqual(cached['42'], [{'id': '42'}])
+        self.assertEqual(cached['missing'], [])
+        self.assertEqual(cache.get(cache.get_namespace('other'), ['42']), {})
+
+        cache.clear()
+        self.assertEqual(cache.get(namespace, keys), {})
+
+    @patch('resdk.kb_cache.time')
+    def test_max_age(self, time_mock):
+        cache = KBCache(self.path, max_age=60)
+        time_mock.time.return_value = 1000
+        cache.set('namespace', {'key': [1]})
+
+        time_mock.time.return_value = 1060
+        self.assertEqual(cache.get('namespace', ['key']), {'key': [1]})
+
+        time_mock.time.return_value = 1061
+        self.assertEqual(cache.get('namespace', ['key']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Unit tests for resdk/kb_snapshot.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import os
+import shutil
+import tempfile
+import unittest
+
+from resdk.kb_snapshot import KBSnapshot
+from resdk.resolwe import Resolwe
+from resdk.resources.kb import Feature, Mapping
+from resdk.tests.benchmarks.server import FakeResolweServer, SyntheticDataset
+
+
+class TestKBSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dataset = SyntheticDataset(collections=0, features=5)
+        self.server = FakeResolweServer(self.dataset)
+        self.server.start()
+        self.res = Resolwe('user', 'pass', self.server.url)
+
+        self.path = os.path.join(self.tmp_dir, 'kb.sqlite3')
+        self.snapshot = KBSnapshot(self.res, self.path)
+        features = self.dataset.objects['kb/feature']
+        features[0]['aliases'] = ['P53', 'LFS1']
+        features[2]['aliases'] = ['P53']
+
+    def tearDown(self):
+        self.snapshot.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def add_feature(self, feature_id, name):
+        features = self.dataset.objects['kb/feature']
+        features.append(dict(features[0], id=len(features) + 1, feature_id=feature_id,
+                             name=name, aliases=[]))
+
+    def test_sync(self):
+        self.assertEqual(self.snapshot.sync('Homo sapiens', source='ENSEMBL', chunk_size=2),
+                         {'feature': 5, 'mapping': 5})
+        self.assertEqual(self.snapshot.feature.count(), 5)
+        self.assertEqual(self.server._server.searches[-1], '/api/kb/mapping/search')
+
+        # Only new records are transferred.
+        self.add_feature('ENSG00000000100', 'NEW')
+        self.assertEqual(self.snapshot.sync('Homo sapiens', source='ENSEMBL', chunk_size=2),
+                         {'feature': 1, 'mapping': 0})
+        self.assertEqual(self.snapshot.feature.count(), 6)
+
+        # Full sync updates changed and removes deleted records.
+        features = self.dataset.objects['kb/feature']
+        features[0]['name'] = 'TP53'
+        features[0]['aliases'] = ['P53']
+        del features[2]
+        self.assertEqual(self.snapshot.sync('Homo sapiens', source='ENSEMBL', full=True),
+                         {'feature': 5, 'mapping': 5})
+        self.assertEqual(self.snapshot.feature.count(), 5)
+        self.assertEqual(self.snapshot.feature.get(feature_id='ENSG00000000000').name, 'TP53')
+        self.assertEqual(self.snapshot.feature.filter(aliases='P53').values('name'),
+                         [{'name': 'TP53'}])
+        self.assertEqual(self.snapshot.feature.filter(aliases='LFS1').count(), 0)
+
+        # Other subsets are not affected.
+        self.assertEqual(self.snapshot.sync('Homo sapiens', source='NCBI')['feature'], 5)
+        self.snapshot.sync('Homo sapiens', source='ENSEMBL', full=True)
+        self.assertEqual(self.snapshot.feature.filter(source='NCBI').count(), 5)
+
+    def test_query(self):
+        self.snapshot.sync('Homo sapiens')
+        # Snapshot is persistent and queries do not make requests.
+        self.server.stop()
+        snapshot = KBSnapshot(Resolwe(url=self.server.url, lazy=True), self.path)
+
+        features = snapshot.feature.filter(source='ENSEMBL', species='Homo sapiens')
+        self.assertEqual(len(features), 5)
+        self.assertIsInstance(features[0], Feature)
+        self.assertEqual([feature.name for feature in features],
+                         ['GENE0', 'GENE1', 'GENE2', 'GENE3', 'GENE4'])
+
+        feature = snapshot.feature.get(name='GENE1', source='NCBI')
+        self.assertEqual(feature.feature_id, '2')
+        with self.assertRaisesRegex(LookupError, 'more than one object'):
+            snapshot.feature.get(name='GENE1')
+        with self.assertRaisesRegex(LookupError, 'does not exist'):
+            snapshot.feature.get(name='GENE9')
+
+        self.assertEqual(
+            snapshot.feature.filter(feature_id__in=['1', '3', 'x']).values('feature_id'),
+            [{'feature_id': '1'}, {'feature_id': '3'}])
+        self.assertEqual(snapshot.feature.filter(feature_id__in='1,3').count(), 2)
+        self.assertEqual(snapshot.feature.filter(name__iexact='gene1').count(), 2)
+        self.assertEqual(snapshot.feature.filter(feature_id__startswith='ENSG').count(), 5)
+        self.assertEqual(snapshot.feature.filter(feature_id__startswith='ensg').count(), 0)
+        self.assertEqual(snapshot.feature.filter(id__gt=8).count(), 2)
+        self.assertEqual(
+            snapshot.feature.filter(aliases__in=['P53', 'LFS1']).values('name', 'aliases'),
+            [{'name': 'GENE0', 'aliases': ['P53', 'LFS1']}, {'name': 'GENE1', 'aliases': ['P53']}])
+
+        mapping = snapshot.mapping.get(source_id='ENSG00000000003', target_db='NCBI')
+        self.assertIsInstance(mapping, Mapping)
+        self.assertEqual(mapping.target_id, '4')
+
+        with self.assertRaisesRegex(ValueError, "Unknown field 'foo' of feature"):
+            snapshot.feature.filter(foo=1)
+        with self.assertRaisesRegex(ValueError, "Unsupported lookup 'contains'"):
+            snapshot.feature.filter(name__contains='GENE')
+        with self.assertRaisesRegex(ValueError, "Unknown fields of mapping: foo"):
+            snapshot.mapping.values('foo')
+
+        snapshot.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
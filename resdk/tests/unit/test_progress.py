@@ -0,0 +1,92 @@
+"""
+Unit tests for resdk/progress.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import sys
+import unittest
+
+from mock import MagicMock, patch
+
+from resdk.progress import Progress, ProgressTracker, TqdmProgress, get_tracker
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_progress(self):
+        progress = Progress(bytes_done=250, bytes_total=1000, items_done=1, items_total=2,
+                            elapsed=5)
+        self.assertEqual(progress.throughput, 50)
+        self.assertEqual(progress.fraction, 0.25)
+        self.assertEqual(progress.eta, 15)
+        self.assertEqual(repr(progress), 'Progress <bytes: 250/1000, items: 1/2>')
+
+        # Progress of items is used if total bytes are not known.
+        progress = Progress(bytes_done=250, items_done=1, items_total=2, elapsed=5)
+        self.assertEqual(progress.fraction, 0.5)
+        self.assertEqual(progress.eta, 5)
+
+        progress = Progress(items_done=1)
+        self.assertEqual(progress.throughput, 0)
+        self.assertIsNone(progress.fraction)
+        self.assertIsNone(progress.eta)
+
+    @patch('resdk.progress.time')
+    def test_tracker(self, time_mock):
+        time_mock.monotonic.return_value = 10
+        callback = MagicMock()
+        tracker = ProgressTracker(callback, items_total=2)
+
+        time_mock.monotonic.return_value = 12
+        tracker.add_total(bytes_total=100)
+        tracker.update(bytes_done=40, items_done=1)
+
+        progress = callback.call_args[0][0]
+        self.assertEqual((progress.bytes_done, progress.bytes_total), (40, 100))
+        self.assertEqual((progress.items_done, progress.items_total), (1, 2))
+        self.assertEqual(progress.elapsed, 2)
+        self.assertEqual(callback.call_count, 2)
+
+        # Nothing is reported without callback.
+        ProgressTracker().update(bytes_done=10)
+
+    def test_get_tracker(self):
+        callback = MagicMock()
+        tracker = get_tracker(callback, bytes_total=100)
+        self.assertIs(tracker.callback, callback)
+        self.assertEqual(tracker.bytes_total, 100)
+
+        # Trackers are reused with their totals.
+        self.assertIs(get_tracker(tracker, bytes_total=5), tracker)
+        self.assertEqual(tracker.bytes_total, 100)
+
+        self.assertIsNone(get_tracker(None).callback)
+
+
+class TestTqdmProgress(unittest.TestCase):
+
+    def test_tqdm(self):
+        tqdm_mock = MagicMock()
+        with patch.dict(sys.modules, {'tqdm': tqdm_mock}):
+            callback = TqdmProgress(desc='Downloading')
+
+        progress_bar = tqdm_mock.tqdm.return_value
+        callback(Progress(bytes_done=10, bytes_total=100))
+        tqdm_mock.tqdm.assert_called_once_with(
+            unit='B', unit_scale=True, unit_divisor=1024, desc='Downloading')
+        self.assertEqual((progress_bar.total, progress_bar.n), (100, 10))
+
+        callback(Progress(bytes_done=100, bytes_total=100))
+        self.assertEqual(progress_bar.close.call_count, 1)
+
+        callback(Progress(items_done=1, items_total=4))
+        tqdm_mock.tqdm.assert_called_with(unit='it', desc='Downloading')
+        self.assertEqual((progress_bar.total, progress_bar.n), (4, 1))
+
+    def test_missing_tqdm(self):
+        with patch.dict(sys.modules, {'tqdm': None}):
+            with self.assertRaisesRegex(ImportError, 'pip install tqdm'):
+                TqdmProgress()
+
+
+if __name__ == '__main__':
+    unittest.main()
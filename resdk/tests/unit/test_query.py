@@ -3,12 +3,25 @@ Unit tests for resdk/query.py file.
 """
 # pylint: disable=missing-docstring, protected-access
 
+import shutil
+import tempfile
 import unittest
 from collections import defaultdict
+from functools import partial
 
 from mock import MagicMock
 
-from resdk.query import ResolweQuery
+from resdk.kb_cache import KBCache
+from resdk.query import FeatureQuery, MappingQuery, RelationQuery, ResolweQuery
+from resdk.resolwe import Resolwe
+from resdk.resources import Relation
+from resdk.resources.kb import Feature
+from resdk.tests.benchmarks.server import FakeResolweServer, SyntheticDataset
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
 
 
 class TestResolweQuery(unittest.TestCase):
@@ -151,6 +164,7 @@ class TestResolweQuery(unittest.TestCase):
         query.api.get = MagicMock(return_value=['object 1', 'object 2'])
         query._populate_resource = MagicMock(side_effect=['object 1', 'object 2'])
         query.resource.query_method = 'GET'
+        query._fetch_payloads.side_effect = partial(ResolweQuery._fetch_payloads, query)
 
         ResolweQuery._fetch(query)
         self.assertEqual(query._cache, ['object 1', 'object 2'])
@@ -229,6 +243,39 @@ class TestResolweQuery(unittest.TestCase):
         result = ResolweQuery.all(query)
         self.assertEqual(result, new_query)
 
+    def test_iterate(self):
+        resolwe = MagicMock()
+        resource = MagicMock(endpoint='data', query_endpoint=None, query_method='GET',
+                             side_effect=lambda resolwe, **data: data['id'])
+        query = ResolweQuery(resolwe, resource)
+        query._filters['collection'].append(1)
+
+        pages = [
+            {'count': 5, 'results': [{'id': 1}, {'id': 2}]},
+            {'count': 5, 'results': [{'id': 3}, {'id': 4}]},
+            {'count': 5, 'results': [{'id': 5}]},
+        ]
+        query.api.get = MagicMock(side_effect=pages)
+
+        progress = MagicMock()
+        self.assertEqual(list(query.iterate(chunk_size=2, progress=progress)), [1, 2, 3, 4, 5])
+        self.assertEqual(query.api.get.call_count, 3)
+        self.assertEqual([(call[0][0].items_done, call[0][0].items_total)
+                          for call in progress.call_args_list], [(0, 5), (2, 5), (4, 5), (5, 5)])
+        query.api.get.assert_called_with(collection=[1], limit=2, offset=4)
+        # Results are not cached on the original query.
+        self.assertIsNone(query._cache)
+
+        # Iteration stops when the last page is full.
+        query.api.get = MagicMock(side_effect=[
+            {'count': 2, 'results': [{'id': 1}, {'id': 2}]},
+        ])
+        self.assertEqual(list(query.iterate(chunk_size=2)), [1, 2])
+        self.assertEqual(query.api.get.call_count, 1)
+
+        with self.assertRaisesRegex(ValueError, 'sliced query is not supported'):
+            list(query[:10].iterate())
+
     def test_search_undefined(self):
         resolwe = MagicMock()
         resource = MagicMock(full_search_paramater=None, query_endpoint='endpoint')
@@ -251,5 +298,116 @@ class TestResolweQuery(unittest.TestCase):
         )
 
 
+class TestRelationQuery(unittest.TestCase):
+
+    def test_shared_sample_cache(self):
+        resolwe = MagicMock()
+        query = RelationQuery(resolwe, Relation)
+        query.api.get = MagicMock(return_value=[
+            {'id': 1, 'collection': {'id': 1}, 'partitions': [{'entity': 1}]},
+            {'id': 2, 'collection': {'id': 1}, 'partitions': [{'entity': 2}]},
+            {'id': 3, 'collection': {'id': 2}, 'partitions': [{'entity': 3}]},
+        ])
+
+        relations = list(query)
+        self.assertIs(relations[0]._sample_cache, relations[1]._sample_cache)
+        self.assertIsNot(relations[0]._sample_cache, relations[2]._sample_cache)
+        self.assertEqual(relations[0]._sample_cache.relations, relations[:2])
+
+        # Cache is shared only once.
+        query._fetch()
+        self.assertEqual(len(relations[0]._sample_cache.relations), 2)
+
+
+class TestKBQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = FakeResolweServer(SyntheticDataset(collections=0, features=10))
+        self.server.start()
+        self.res = Resolwe('user', 'pass', self.server.url)
+        self.searches = self.server._server.searches
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_query_class(self):
+        self.assertIsInstance(self.res.feature, FeatureQuery)
+        self.assertIsInstance(self.res.mapping, MappingQuery)
+        self.assertIsInstance(self.res.feature.filter(type='gene'), FeatureQuery)
+
+    def test_batches(self):
+        query = self.res.feature.all()
+        query.batch_size = 3
+        query.batch_bytes = 10
+        self.assertEqual(list(query._batches(['a', 'b', 'c', 'd'])), [['a', 'b', 'c'], ['d']])
+        self.assertEqual(list(query._batches(['aaaa', 'bbbb', 'c'])), [['aaaa', 'bbbb'], ['c']])
+
+    def test_lookup(self):
+        self.res.feature.batch_size = 3
+        ids = ['ENSG00000000001', 'ENSG00000000000', 'ENSG00000000001', 'ENSG00000000002',
+               'ENSG00000000003', 'unknown']
+
+        features = self.res.feature.lookup(ids, source='ENSEMBL', species='Homo sapiens')
+        self.assertEqual(list(features), ids[:2] + ids[3:5])
+        self.assertIsInstance(features['ENSG00000000003'], Feature)
+        self.assertEqual(features['ENSG00000000003'].name, 'GENE3')
+        # Duplicates are removed before 5 ids are split into batches.
+        self.assertEqual(len(self.searches), 2)
+
+        features = self.res.feature.lookup(['1', '2'], source='NCBI', species='Mus musculus')
+        self.assertEqual(features, {})
+
+        with self.assertRaisesRegex(ValueError, "Output must be 'dict' or 'dataframe'"):
+            self.res.feature.lookup(ids, source='ENSEMBL', species='Homo sapiens', output='list')
+
+    def test_map(self):
+        self.res.mapping.batch_size = 2
+        progress = MagicMock()
+        mapping = self.res.mapping.map(
+            ['ENSG00000000004', 'ENSG00000000005', 'ENSG00000000006', 'unknown'],
+            source_db='ENSEMBL', target_db='NCBI', source_species='Homo sapiens',
+            progress=progress)
+        self.assertEqual(mapping, {
+            'ENSG00000000004': ['5'],
+            'ENSG00000000005': ['6'],
+            'ENSG00000000006': ['7'],
+            'unknown': [],
+        })
+        self.assertEqual(len(self.searches), 2)
+        self.assertEqual([(call[0][0].items_done, call[0][0].items_total)
+                          for call in progress.call_args_list], [(0, 4), (2, 4), (4, 4)])
+
+    def test_map_cache(self):
+        self.res.kb_cache = KBCache(self.tmp_dir + '/kb.sqlite3')
+        mapping = self.res.mapping.map(['ENSG00000000001', 'unknown'], 'ENSEMBL', 'NCBI')
+        self.assertEqual(mapping, {'ENSG00000000001': ['2'], 'unknown': []})
+        self.assertEqual(len(self.searches), 1)
+
+        # Cached results (including missing mappings) are not requested again.
+        mapping = self.res.mapping.map(['unknown', 'ENSG00000000001'], 'ENSEMBL', 'NCBI')
+        self.assertEqual(mapping, {'unknown': [], 'ENSG00000000001': ['2']})
+        self.assertEqual(len(self.searches), 1)
+
+        mapping = self.res.mapping.map(['ENSG00000000001', 'ENSG00000000002'], 'ENSEMBL', 'NCBI')
+        self.assertEqual(mapping, {'ENSG00000000001': ['2'], 'ENSG00000000002': ['3']})
+        self.assertEqual(len(self.searches), 2)
+
+        # Different filters do not share cached results.
+        mapping = self.res.mapping.map(['ENSG00000000001'], 'ENSEMBL', 'UCSC')
+        self.assertEqual(mapping, {'ENSG00000000001': []})
+        self.assertEqual(len(self.searches), 3)
+
+    @unittest.skipIf(pandas is None, "pandas is not installed")
+    def test_dataframe(self):
+        frame = self.res.mapping.map(['ENSG00000000001'], 'ENSEMBL', 'NCBI', output='dataframe')
+        self.assertEqual(list(frame['target_id']), ['2'])
+
+        frame = self.res.feature.lookup(['1', '2'], source='NCBI', species='Homo sapiens',
+                                        output='dataframe')
+        self.assertEqual(list(frame['name']), ['GENE0', 'GENE1'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -7,7 +7,7 @@ import unittest
 from mock import MagicMock, patch
 
 from resdk.resources.collection import Collection
-from resdk.resources.relation import Relation
+from resdk.resources.relation import Relation, share_sample_cache
 
 
 class TestRelation(unittest.TestCase):
@@ -35,6 +35,47 @@ class TestRelation(unittest.TestCase):
         relation.update()
         self.assertEqual(relation._samples, None)
 
+    def test_samples_order(self):
+        relation = Relation(id=1, resolwe=MagicMock())
+        samples = [MagicMock(id=sample_id) for sample_id in range(5)]
+        relation.resolwe.sample.filter = MagicMock(return_value=samples)
+        relation.partitions = [{'entity': sample_id} for sample_id in [3, 1, 4, 0, 2]]
+
+        self.assertEqual(relation.samples, [samples[3], samples[1], samples[4], samples[0],
+                                            samples[2]])
+
+    def test_shared_sample_cache(self):
+        resolwe = MagicMock()
+        samples = {sample_id: MagicMock(id=sample_id) for sample_id in range(1, 5)}
+        resolwe.sample.filter = MagicMock(
+            side_effect=lambda id__in: [samples[sample_id] for sample_id in reversed(id__in)])
+
+        relation_1 = Relation(id=1, resolwe=resolwe, collection={'id': 1},
+                              partitions=[{'entity': 2}, {'entity': 1}])
+        relation_2 = Relation(id=2, resolwe=resolwe, collection={'id': 1},
+                              partitions=[{'entity': 2}, {'entity': 3}])
+        relation_3 = Relation(id=3, resolwe=resolwe, collection={'id': 2},
+                              partitions=[{'entity': 4}])
+        share_sample_cache([relation_1, relation_2, relation_3])
+
+        # Samples of all relations in the collection are resolved at once.
+        self.assertEqual(relation_1.samples, [samples[2], samples[1]])
+        resolwe.sample.filter.assert_called_once_with(id__in=[2, 1, 3])
+        self.assertEqual(relation_2.samples, [samples[2], samples[3]])
+        self.assertIs(relation_2.samples[0], relation_1.samples[0])
+        self.assertEqual(resolwe.sample.filter.call_count, 1)
+
+        # Relations in other collections have their own cache.
+        self.assertEqual(relation_3.samples, [samples[4]])
+        resolwe.sample.filter.assert_called_with(id__in=[4])
+
+        # Only new samples are resolved after relation is changed.
+        relation_2.partitions.append({'entity': 4})
+        relation_2._samples = None
+        self.assertEqual(relation_2.samples, [samples[2], samples[3], samples[4]])
+        resolwe.sample.filter.assert_called_with(id__in=[4])
+        self.assertEqual(resolwe.sample.filter.call_count, 3)
+
     # I appears it is not possible to deepcopy MagicMocks so we just patch
     # the deepcopy functionality:
     @patch('resdk.resources.base.copy')
@@ -0,0 +1,135 @@
+"""
+Unit tests for resdk/remote_file.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import io
+import re
+import unittest
+
+from mock import MagicMock, patch
+
+from resdk.remote_file import RemoteFile
+
+CONTENT = bytes(range(256)) * 4
+
+
+def range_response(*args, **kwargs):
+    start, end = map(int, re.match(r'bytes=(\d+)-(\d+)', kwargs['headers']['Range']).groups())
+    return MagicMock(
+        ok=True,
+        status_code=206,
+        content=CONTENT[start:end + 1],
+        headers={'Content-Range': 'bytes {}-{}/{}'.format(start, end, len(CONTENT))},
+    )
+
+
+@patch('resdk.remote_file.requests')
+class TestRemoteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.head = MagicMock(ok=True, headers={'Content-Length': str(len(CONTENT))})
+
+    def test_size(self, requests_mock):
+        requests_mock.head.return_value = self.head
+        remote = RemoteFile('http://some/url', block_size=100)
+        self.assertEqual(remote.size, 1024)
+        self.assertEqual(remote.size, 1024)
+        self.assertEqual(requests_mock.head.call_count, 1)
+
+        # Size is parsed from Content-Range if server does not report it.
+        requests_mock.head.return_value = MagicMock(ok=True, headers={})
+        requests_mock.get.side_effect = range_response
+        remote = RemoteFile('http://some/url', block_size=100)
+        self.assertEqual(remote.size, 1024)
+        self.assertEqual(requests_mock.get.call_args[1]['headers'], {'Range': 'bytes=0-0'})
+
+    def test_read(self, requests_mock):
+        requests_mock.head.return_value = self.head
+        requests_mock.get.side_effect = range_response
+        remote = RemoteFile('http://some/url', block_size=100)
+
+        self.assertEqual(remote.read(10), CONTENT[:10])
+        self.assertEqual(remote.tell(), 10)
+        # Second read is served from the cached block.
+        self.assertEqual(remote.read(10), CONTENT[10:20])
+        self.assertEqual(requests_mock.get.call_count, 1)
+
+        # Missing consecutive blocks are fetched in a single request.
+        remote.seek(150)
+        self.assertEqual(remote.read(300), CONTENT[150:450])
+        self.assertEqual(requests_mock.get.call_count, 2)
+        self.assertEqual(requests_mock.get.call_args[1]['headers'], {'Range': 'bytes=100-499'})
+
+        remote.seek(-24, io.SEEK_END)
+        self.assertEqual(remote.read(), CONTENT[-24:])
+        self.assertEqual(remote.read(), b'')
+
+    def test_cache_size(self, requests_mock):
+        requests_mock.head.return_value = self.head
+        requests_mock.get.side_effect = range_response
+        remote = RemoteFile('http://some/url', block_size=100, cache_size=2)
+
+        for position in (0, 100, 200):
+            remote.seek(position)
+            remote.read(100)
+        self.assertEqual(list(remote._blocks), [1, 2])
+
+        remote.seek(0)
+        self.assertEqual(remote.read(100), CONTENT[:100])
+        self.assertEqual(requests_mock.get.call_count, 4)
+
+    def test_no_range_support(self, requests_mock):
+        requests_mock.head.return_value = self.head
+        requests_mock.get.return_value = MagicMock(ok=True, status_code=200, content=CONTENT)
+        remote = RemoteFile('http://some/url', block_size=100)
+
+        remote.seek(120)
+        self.assertEqual(remote.read(10), CONTENT[120:130])
+        # Whole file is downloaded only once.
+        remote.seek(900)
+        self.assertEqual(remote.read(10), CONTENT[900:910])
+        self.assertEqual(requests_mock.get.call_count, 1)
+
+        # Size is not reported and range request returns the whole file.
+        requests_mock.head.return_value = MagicMock(ok=True, headers={})
+        remote = RemoteFile('http://some/url', block_size=100)
+        self.assertEqual(remote.size, 1024)
+        self.assertEqual(remote.read(), CONTENT)
+        self.assertEqual(requests_mock.get.call_count, 2)
+
+    def test_timeout(self, requests_mock):
+        requests_mock.head.return_value = MagicMock(ok=True, headers={})
+        requests_mock.get.side_effect = range_response
+        remote = RemoteFile('http://some/url', timeout=5)
+
+        remote.read(10)
+        self.assertEqual(requests_mock.head.call_args[1]['timeout'], 5)
+        for call in requests_mock.get.call_args_list:
+            self.assertEqual(call[1]['timeout'], 5)
+
+    def test_seek(self, requests_mock):
+        requests_mock.head.return_value = self.head
+        remote = RemoteFile('http://some/url')
+
+        self.assertEqual(remote.seek(10), 10)
+        self.assertEqual(remote.seek(5, io.SEEK_CUR), 15)
+        self.assertEqual(remote.seek(-4, io.SEEK_END), 1020)
+
+        with self.assertRaisesRegex(ValueError, 'Negative seek position'):
+            remote.seek(-1)
+
+        remote.close()
+        with self.assertRaises(ValueError):
+            remote.seek(0)
+
+    def test_bad_response(self, requests_mock):
+        requests_mock.head.return_value = MagicMock(
+            ok=False, **{'raise_for_status.side_effect': Exception('404')})
+        remote = RemoteFile('http://some/url')
+
+        with self.assertRaisesRegex(Exception, '404'):
+            remote.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,17 +3,21 @@ Unit tests for resdk/resolwe.py file.
 """
 # pylint: disable=missing-docstring, protected-access
 
-import io
 import os
+import pickle
+import threading
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 
 import requests
-from mock import MagicMock, mock_open, patch
+from mock import MagicMock, patch
 from slumber.exceptions import SlumberHttpBaseException
 
 from resdk.exceptions import ResolweServerError, ValidationError
-from resdk.resolwe import ResAuth, Resolwe, ResolweResource
+from resdk.query import ResolweQuery
+from resdk.resolwe import Resolwe, ResolweResource, _reset_after_fork
 from resdk.resources import Collection, Data, Process
+from resdk.tests.benchmarks.server import FakeResolweServer, SyntheticDataset
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
@@ -141,6 +145,86 @@ class TestResolwe(unittest.TestCase):
         self.assertEqual(resauth_mock.call_args[0][0], 'foo')
         self.assertEqual(resauth_mock.call_args[0][1], 'bar')
 
+    @patch('resdk.auth.requests')
+    def test_lazy(self, requests_mock):
+        requests_mock.post.return_value = MagicMock(
+            status_code=200, cookies={'sessionid': 'id', 'csrftoken': 'token'})
+
+        res = Resolwe('user', 'pass', 'http://some/url', lazy=True)
+        self.assertEqual(requests_mock.get.call_count, 0)
+        self.assertEqual(requests_mock.post.call_count, 0)
+        self.assertIsNone(res.auth.sessionid)
+
+        # Login happens before the first request.
+        request = requests.Request('GET', 'http://some/url/api/data').prepare()
+        res.auth(request)
+        res.auth(request)
+        self.assertEqual(requests_mock.post.call_count, 1)
+        self.assertEqual(res.auth.sessionid, 'id')
+
+        with self.assertRaisesRegex(ValueError, 'Server url must start with .*'):
+            Resolwe('user', 'pass', 'some/url', lazy=True)
+
+    @patch('resdk.auth.requests')
+    def test_pickle(self, requests_mock):
+        requests_mock.post.return_value = MagicMock(
+            status_code=200, cookies={'sessionid': 'id', 'csrftoken': 'token'})
+        res = Resolwe('user', 'secret-password', 'http://some/url', lazy=True)
+        # Picklable hooks are kept.
+        res.instrumentation.add_post_request_hook(log_event)
+
+        # Lazy instance logs in when pickled, so that copies share the session.
+        dump = pickle.dumps(res)
+        self.assertEqual(requests_mock.post.call_count, 1)
+        self.assertNotIn(b'secret-password', dump)
+
+        copy = pickle.loads(dump)
+        self.assertEqual(requests_mock.post.call_count, 1)
+        self.assertEqual(copy.url, 'http://some/url')
+        self.assertEqual(copy.auth.username, 'user')
+        self.assertEqual(copy.auth.sessionid, 'id')
+        self.assertEqual(copy.auth.csrftoken, 'token')
+        self.assertIs(copy.auth.instrumentation, copy.instrumentation)
+        self.assertIsNot(copy.instrumentation, res.instrumentation)
+        self.assertEqual(copy.instrumentation._post_request_hooks, [log_event])
+        self.assertIsInstance(copy.data, ResolweQuery)
+        self.assertIs(copy.data.resolwe, copy)
+
+
+def log_event(event):
+    return event
+
+
+def count_files(data):
+    return data.id, len(data.files())
+
+
+class TestProcessPool(unittest.TestCase):
+
+    def test_reset_after_fork(self):
+        res = Resolwe(url='http://some/url', lazy=True)
+        adapter = res.session.get_adapter('http://some/url')
+        lock = res.auth._lock
+
+        _reset_after_fork()
+        self.assertIsNot(res.session.get_adapter('http://some/url'), adapter)
+        self.assertIsNot(res.auth._lock, lock)
+        self.assertIsInstance(res.auth._lock, type(threading.Lock()))
+        self.assertIs(res.api._store['session'], res.session)
+
+    def test_process_pool(self):
+        with FakeResolweServer(SyntheticDataset(collections=1, samples=2)) as server:
+            res = Resolwe('user', 'pass', server.url)
+            data = list(res.data.filter(collection=1))
+            # Use the connection pool before worker processes are forked.
+            expected = [count_files(obj) for obj in data]
+
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                self.assertEqual(list(executor.map(count_files, data)), expected)
+
+            # Workers reused the session of the parent process.
+            self.assertEqual(len(server._server.sessions), 1)
+
 
 class TestProcessFileField(unittest.TestCase):
 
@@ -191,7 +275,9 @@ class TestRun(unittest.TestCase):
 
     def setUp(self):
         self.process_mock = MagicMock(spec=Process)
+        self.process_mock.id = 1
         self.process_mock.slug = 'some:prc:slug:'
+        self.process_mock.version = '1.0.0'
         self.process_mock.input_schema = [
             {
                 "label": "NGS reads (FASTQ)",
@@ -246,6 +332,22 @@ class TestRun(unittest.TestCase):
         Resolwe._process_inputs(resolwe_mock, {"src_list": "/path/to/file"}, process)
         resolwe_mock._process_file_field.assert_called_once_with('/path/to/file')
 
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_pre_upload(self, resolwe_mock):
+        uploaded = {'file': 'file', 'file_temp': 'temp'}
+        resolwe_mock._upload_files.return_value = {'/path/to/file': uploaded}
+
+        inputs = Resolwe._process_inputs(resolwe_mock, {
+            "src": "/path/to/file",
+            "src_list": ["/path/to/file", "http://x.com/a"],
+        }, self.process_mock)
+        resolwe_mock._upload_files.assert_called_once_with(
+            ["/path/to/file", "/path/to/file", "http://x.com/a"], progress=None,
+            file_name_regexes={})
+        self.assertEqual(inputs['src'], uploaded)
+        self.assertEqual(inputs['src_list'][0], uploaded)
+        resolwe_mock._process_file_field.assert_called_once_with("http://x.com/a")
+
     @patch('resdk.resolwe.Resolwe', spec=True)
     def test_keep_input(self, resolwe_mock):
         process = self.process_mock
@@ -275,6 +377,14 @@ class TestRun(unittest.TestCase):
         with self.assertRaisesRegex(ValidationError, message):
             Resolwe._process_inputs(resolwe_mock, {"bad_key": "/good/path/to/file"}, process)
 
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_validate_before_upload(self, resolwe_mock):
+        message = "Field 'genome' must be a Data object or its id"
+        with self.assertRaisesRegex(ValidationError, message):
+            Resolwe._process_inputs(
+                resolwe_mock, {"src": "/path/to/file", "genome": "genome"}, self.process_mock)
+        self.assertEqual(resolwe_mock._process_file_field.call_count, 0)
+
     @patch('resdk.resolwe.Data')
     @patch('resdk.resolwe.Resolwe', spec=True)
     def test_file_processing(self, resolwe_mock, data_mock):
@@ -340,180 +450,5 @@ class TestRun(unittest.TestCase):
         self.assertEqual(data, "Data object")
 
 
-class TestUploadFile(unittest.TestCase):
-
-    def setUp(self):
-        self.file_path = os.path.join(BASE_DIR, 'files', 'example.fastq')
-        self.config = {'url': 'http://some/url', 'auth': MagicMock(), 'logger': MagicMock()}
-
-    @patch('resdk.resolwe.requests')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_always_ok(self, resolwe_mock, requests_mock):
-        resolwe_mock.configure_mock(**self.config)
-        # Immitate response form server - always status 200:
-        requests_response = {'files': [{'temp': 'fake_name'}]}
-        requests_mock.post.return_value = MagicMock(status_code=200,
-                                                    **{'json.return_value': requests_response})
-
-        response = Resolwe._upload_file(resolwe_mock, self.file_path)
-
-        self.assertEqual(response, 'fake_name')
-
-    @patch('resdk.resolwe.requests')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_always_bad(self, resolwe_mock, requests_mock):
-        resolwe_mock.configure_mock(**self.config)
-        # Immitate response form server - always status 400
-        requests_mock.post.return_value = MagicMock(status_code=400)
-
-        response = Resolwe._upload_file(resolwe_mock, self.file_path)
-
-        self.assertIsNone(response)
-        self.assertEqual(resolwe_mock.logger.warning.call_count, 4)
-
-    @patch('resdk.resolwe.requests')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_one_bad_other_ok(self, resolwe_mock, requests_mock):
-        resolwe_mock.configure_mock(**self.config)
-        requests_response = {'files': [{'temp': 'fake_name'}]}
-        response_ok = MagicMock(status_code=200, **{'json.return_value': requests_response})
-        response_fails = MagicMock(status_code=400)
-        # Immitate response form server - one status 400, but other 200:
-        requests_mock.post.side_effect = [response_fails, response_ok, response_ok]
-
-        response = Resolwe._upload_file(resolwe_mock, self.file_path)
-
-        self.assertEqual(response, 'fake_name')
-        self.assertEqual(resolwe_mock.logger.warning.call_count, 1)
-
-
-class TestDownload(unittest.TestCase):
-
-    def setUp(self):
-        self.file_list = ['/the/first/file.txt', '/the/second/file.py']
-        self.config = {'url': 'http://some/url', 'auth': MagicMock(), 'logger': MagicMock()}
-
-    @patch('resdk.resolwe.os')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_fail_if_bad_dir(self, resolwe_mock, os_mock):
-        resolwe_mock.configure_mock(**self.config)
-        os_mock.path.isdir.return_value = False
-
-        message = "Download directory does not exist: .*"
-        with self.assertRaisesRegex(ValueError, message):
-            Resolwe._download_files(resolwe_mock, self.file_list)
-
-    @patch('resdk.resolwe.os')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_empty_file_list(self, resolwe_mock, os_mock):
-        resolwe_mock.configure_mock(**self.config)
-
-        Resolwe._download_files(resolwe_mock, [])
-
-        resolwe_mock.logger.info.assert_called_once_with("No files to download.")
-
-    @patch('resdk.resolwe.open')
-    @patch('resdk.resolwe.os')
-    @patch('resdk.resolwe.requests')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_bad_response(self, resolwe_mock, requests_mock, os_mock, open_mock):
-        resolwe_mock.configure_mock(**self.config)
-        os_mock.path.isfile.return_value = True
-        mock_open.return_value = MagicMock(spec=io.IOBase)
-
-        response = {'raise_for_status.side_effect': Exception("abc")}
-        requests_mock.get.return_value = MagicMock(ok=False, **response)
-
-        with self.assertRaisesRegex(Exception, "abc"):
-            Resolwe._download_files(resolwe_mock, self.file_list[:1])
-        self.assertEqual(resolwe_mock.logger.info.call_count, 2)
-
-    @patch('resdk.resolwe.open')
-    @patch('resdk.resolwe.os')
-    @patch('resdk.resolwe.requests')
-    @patch('resdk.resolwe.Resolwe', spec=True)
-    def test_good_response(self, resolwe_mock, requests_mock, os_mock, open_mock):
-        resolwe_mock.configure_mock(**self.config)
-        os_mock.path.isfile.return_value = True
-
-        # When mocking open one wants it to return a "file-like" mock: (spec=io.IOBase)
-        mock_open.return_value = MagicMock(spec=io.IOBase)
-
-        requests_mock.get.return_value = MagicMock(ok=True,
-                                                   **{'iter_content.return_value': range(3)})
-
-        Resolwe._download_files(resolwe_mock, self.file_list)
-        self.assertEqual(resolwe_mock.logger.info.call_count, 3)
-
-        # This asserts may seem wierd. To check what is happening behind the scenes:
-        # print(open_mock.mock_calls)
-        self.assertEqual(open_mock.return_value.__enter__.return_value.write.call_count, 6)
-        # Why 6? 2 files in self.file_list, each downloads 3 chunks (defined in response mock)
-
-
-class TestResAuth(unittest.TestCase):
-
-    @patch('resdk.resolwe.ResAuth', spec=True)
-    def setUp(self, auth_mock):  # pylint: disable=arguments-differ
-        auth_mock.configure_mock(sessionid=None, csrftoken=None)
-        self.auth_mock = auth_mock
-
-    @patch('resdk.resolwe.requests')
-    def test_bad_url(self, requests_mock):
-        requests_mock.post = MagicMock(side_effect=[requests.exceptions.ConnectionError()])
-
-        with self.assertRaisesRegex(ValueError,
-                                    'Server not accessible on www.abc.com. Wrong url?'):
-            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
-
-    @patch('resdk.resolwe.requests')
-    def test_bad_credentials(self, requests_mock):
-        requests_mock.post = MagicMock(return_value=MagicMock(status_code=400))
-
-        message = r'Response HTTP status code .* Invalid credentials?'
-        with self.assertRaisesRegex(ValueError, message):
-            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
-
-    @patch('resdk.resolwe.requests')
-    def test_no_csrf_token(self, requests_mock):
-        post_mock = MagicMock(status_code=200, cookies={'sessionid': 42})
-        requests_mock.post = MagicMock(return_value=post_mock)
-
-        message = 'Missing sessionid or csrftoken. Invalid credentials?'
-        with self.assertRaisesRegex(Exception, message):
-            ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
-
-    @patch('resdk.resolwe.requests')
-    def test_all_ok(self, requests_mock):
-        post_mock = MagicMock(status_code=200, cookies={'sessionid': 42, 'csrftoken': 43})
-        requests_mock.post = MagicMock(return_value=post_mock)
-
-        ResAuth.__init__(self.auth_mock, username='usr', password='pwd', url='www.abc.com')
-        self.assertEqual(self.auth_mock.sessionid, 42)
-        self.assertEqual(self.auth_mock.csrftoken, 43)
-
-    @patch('resdk.resolwe.requests')
-    def test_public_user(self, requests_mock):
-        post_mock = MagicMock(status_code=200)
-        requests_mock.post = MagicMock(return_value=post_mock)
-
-        ResAuth.__init__(self.auth_mock, url='www.abc.com')
-        self.assertEqual(self.auth_mock.sessionid, None)
-        self.assertEqual(self.auth_mock.csrftoken, None)
-
-    def test_call(self):
-        res_auth = MagicMock(spec=ResAuth, sessionid=None, csrftoken=None, url="www.abc.com")
-        resp = ResAuth.__call__(res_auth, MagicMock(headers={}))
-        self.assertDictEqual(resp.headers, {'referer': 'www.abc.com'})
-
-        res_auth = MagicMock(spec=ResAuth, sessionid='my-id', csrftoken='my-token', url="abc.com")
-        resp = ResAuth.__call__(res_auth, MagicMock(headers={}))
-        self.assertDictEqual(resp.headers, {
-            'X-CSRFToken': 'my-token',
-            'referer': 'abc.com',
-            'Cookie': 'csrftoken=my-token; sessionid=my-id'
-        })
-
-
 if __name__ == '__main__':
     unittest.main()
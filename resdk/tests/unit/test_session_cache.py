@@ -0,0 +1,119 @@
+"""
+Unit tests for resdk/session_cache.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import unittest
+
+from mock import MagicMock, patch
+
+from resdk.auth import ResAuth
+from resdk.resolwe import Resolwe
+from resdk.session_cache import SessionCache
+from resdk.tests.benchmarks.server import FakeResolweServer, SyntheticDataset
+
+
+class TestSessionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'resdk', 'sessions.json')
+        self.cache = SessionCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_set_remove(self):
+        self.assertIsNone(self.cache.get('http://some/url', 'user'))
+
+        self.cache.set('http://some/url/', 'user', 'id', 'token')
+        self.assertEqual(self.cache.get('http://some/url', 'user'), ('id', 'token'))
+        self.assertIsNone(self.cache.get('http://some/url', 'other'))
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['sessions.json'])
+
+        self.cache.remove('http://some/url', 'user')
+        self.assertIsNone(self.cache.get('http://some/url', 'user'))
+
+    def test_pickle(self):
+        self.cache.set('http://some/url', 'user', 'id', 'token')
+        copy = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(copy.path, self.path)
+        self.assertEqual(copy.get('http://some/url', 'user'), ('id', 'token'))
+
+    def test_insecure_file(self):
+        self.cache.set('http://some/url', 'user', 'id', 'token')
+        os.chmod(self.path, 0o644)
+        self.cache.logger = MagicMock()
+
+        self.assertIsNone(self.cache.get('http://some/url', 'user'))
+        self.assertEqual(self.cache.logger.warning.call_count, 1)
+
+    @patch('resdk.auth.requests')
+    def test_res_auth(self, requests_mock):
+        requests_mock.post.return_value = MagicMock(
+            status_code=200, cookies={'sessionid': 'id', 'csrftoken': 'token'})
+
+        auth = ResAuth('user', 'pass', 'http://some/url', session_cache=self.cache)
+        self.assertEqual(requests_mock.post.call_count, 1)
+        self.assertEqual(self.cache.get('http://some/url', 'user'), ('id', 'token'))
+
+        # Cached session is reused if the server returns its user.
+        requests_mock.get.return_value = MagicMock(
+            status_code=200, **{'json.return_value': [{'username': 'user'}]})
+        auth = ResAuth('user', 'pass', 'http://some/url', session_cache=self.cache)
+        self.assertEqual(requests_mock.post.call_count, 1)
+        self.assertEqual(auth.sessionid, 'id')
+        requests_mock.get.assert_called_once_with(
+            'http://some/api/user', params={'current_only': 1},
+            cookies={'sessionid': 'id', 'csrftoken': 'token'}, auth=auth._instrument)
+
+        # Invalid session is treated as anonymous user.
+        requests_mock.get.return_value = MagicMock(
+            status_code=200, **{'json.return_value': []})
+        requests_mock.post.return_value = MagicMock(
+            status_code=200, cookies={'sessionid': 'new', 'csrftoken': 'token'})
+        auth = ResAuth('user', 'pass', 'http://some/url', session_cache=self.cache)
+        self.assertEqual(requests_mock.post.call_count, 2)
+        self.assertEqual(auth.sessionid, 'new')
+        self.assertEqual(self.cache.get('http://some/url', 'user'), ('new', 'token'))
+
+    def test_invalid_cached_session(self):
+        with FakeResolweServer(SyntheticDataset(collections=1, samples=2)) as server:
+            res = Resolwe('user', 'pass', server.url, session_cache=self.cache)
+            sessionid = res.auth.sessionid
+            server.expire_sessions()
+
+            res = Resolwe('user', 'pass', server.url, session_cache=self.cache)
+            self.assertNotEqual(res.auth.sessionid, sessionid)
+            self.assertEqual(self.cache.get(server.url, 'user')[0], res.auth.sessionid)
+            self.assertEqual(res.data.filter(collection=1).count(), 4)
+
+    def test_renew_session(self):
+        with FakeResolweServer(SyntheticDataset(collections=1, samples=2)) as server:
+            res = Resolwe('user', 'pass', server.url, session_cache=self.cache)
+            self.assertEqual(res.data.filter(collection=1).count(), 4)
+            sessionid = res.auth.sessionid
+
+            server.expire_sessions()
+            self.assertEqual(res.data.filter(collection=1).count(), 4)
+            self.assertNotEqual(res.auth.sessionid, sessionid)
+            self.assertEqual(self.cache.get(server.url, 'user')[0], res.auth.sessionid)
+
+            # Rejected request, login and resent request are recorded.
+            metrics = res.instrumentation.metrics.as_dict()
+            self.assertEqual(metrics[('GET', '/api/data')]['statuses'], {200: 2, 403: 1})
+            self.assertEqual(metrics[('POST', '/rest-auth/login')]['count'], 2)
+
+            # New instance reuses the renewed session.
+            res = Resolwe('user', 'pass', server.url, session_cache=self.cache)
+            self.assertEqual(res.data.filter(collection=1).count(), 4)
+            self.assertNotIn(('POST', '/rest-auth/login'), res.instrumentation.metrics.as_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for resdk/tracing.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import os
+import unittest
+from functools import partial
+
+from mock import MagicMock, patch
+
+from resdk import tracing
+from resdk.query import ResolweQuery
+from resdk.resolwe import Resolwe
+from resdk.resources.data import Data
+from resdk.transfer import ChunkSize
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestTracingDisabled(unittest.TestCase):
+
+    def test_no_op(self):
+        self.assertFalse(tracing.is_tracing_enabled())
+        with tracing.start_span('test', attribute=1) as span:
+            span.set_attribute('other', 2)
+        self.assertIs(span, tracing._NO_OP_SPAN)
+        self.assertIs(tracing.get_current_span(), tracing._NO_OP_SPAN)
+
+
+@unittest.skipIf(TracerProvider is None, "OpenTelemetry SDK is not installed")
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(self.exporter))
+        tracing.enable_tracing(provider)
+
+    def tearDown(self):
+        tracing.disable_tracing()
+
+    def get_spans(self):
+        return {span.name: span for span in self.exporter.get_finished_spans()}
+
+    def test_start_span(self):
+        self.assertTrue(tracing.is_tracing_enabled())
+        with tracing.start_span('parent', attribute=1, empty=None):
+            with tracing.start_span('child'):
+                tracing.get_current_span().set_attribute('bytes', 10)
+
+        spans = self.get_spans()
+        self.assertEqual(dict(spans['parent'].attributes), {'attribute': 1})
+        self.assertEqual(dict(spans['child'].attributes), {'bytes': 10})
+        self.assertEqual(spans['child'].parent.span_id, spans['parent'].context.span_id)
+
+    def test_query(self):
+        resource = MagicMock(endpoint='data', query_endpoint=None, query_method='GET')
+        query = ResolweQuery(MagicMock(), resource)
+        query.api.get.return_value = {'count': 2, 'results': [{'id': 1}, {'id': 2}]}
+
+        list(query.filter(name='test')[:2])
+
+        attributes = self.get_spans()['resdk.query.fetch'].attributes
+        self.assertEqual(attributes['endpoint'], 'data')
+        self.assertEqual(tuple(attributes['filter_keys']), ('limit', 'name', 'offset'))
+        self.assertEqual(attributes['page_size'], 2)
+        self.assertEqual(attributes['results'], 2)
+
+    def test_resource(self):
+        data = Data(resolwe=MagicMock(), id=42, name='Old name')
+        data._original_values = {'id': 42, 'name': 'Old name'}
+        data.api.return_value.patch.return_value = {'id': 42, 'name': 'New name'}
+        data.name = 'New name'
+        data.save()
+        data.delete(force=True)
+
+        spans = self.get_spans()
+        self.assertEqual(tuple(spans['resdk.resource.save'].attributes['fields']), ('name',))
+        self.assertEqual(spans['resdk.resource.delete'].attributes['id'], 42)
+
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_upload(self, resolwe_mock, requests_mock):
+        resolwe_mock.configure_mock(url='http://some/url', auth=MagicMock(), logger=MagicMock(),
+                                    chunk_size=ChunkSize())
+        requests_mock.post.side_effect = [
+            MagicMock(status_code=400),
+            MagicMock(status_code=200, **{'json.return_value': {'files': [{'temp': 'tmp'}]}}),
+        ]
+
+        file_path = os.path.join(BASE_DIR, 'files', 'example.fastq')
+        Resolwe._upload_file(resolwe_mock, file_path)
+
+        spans = self.get_spans()
+        self.assertEqual(spans['resdk.upload'].attributes['bytes'], os.path.getsize(file_path))
+        self.assertEqual(spans['resdk.upload.chunk'].attributes['retries'], 1)
+        self.assertEqual(spans['resdk.upload.chunk'].parent.span_id,
+                         spans['resdk.upload'].context.span_id)
+
+    @patch('resdk.file_transfer.open')
+    @patch('resdk.file_transfer.os')
+    @patch('resdk.file_transfer.requests')
+    @patch('resdk.resolwe.Resolwe', spec=True)
+    def test_download(self, resolwe_mock, requests_mock, os_mock, open_mock):
+        resolwe_mock.configure_mock(url='http://some/url', auth=MagicMock(), logger=MagicMock(),
+                                    download_cache=None)
+        resolwe_mock._download_file.side_effect = partial(Resolwe._download_file, resolwe_mock)
+        requests_mock.get.return_value = MagicMock(
+            ok=True, headers={}, **{'iter_content.return_value': [b'ab', b'c']})
+
+        Resolwe._download_files(resolwe_mock, ['1/file.txt'])
+
+        attributes = self.get_spans()['resdk.download.file'].attributes
+        self.assertEqual(attributes['file'], '1/file.txt')
+        self.assertEqual(attributes['bytes'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+"""
+Unit tests for resdk/transfer.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import gzip
+import mmap
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+from urllib3.filepost import encode_multipart_formdata
+
+from resdk.transfer import (
+    AdaptiveChunkSize, ChunkSize, MultipartChunk, TokenBucket, TransferScheduler, compress_file,
+    configure_shared_scheduler, get_shared_scheduler, is_compressible, map_file,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    @patch('resdk.transfer.time')
+    def test_consume(self, time_mock):
+        time_mock.monotonic.return_value = 0
+        bucket = TokenBucket(rate=100)
+
+        # Burst is transferred without waiting.
+        bucket.consume(100)
+        self.assertEqual(time_mock.sleep.call_count, 0)
+
+        bucket.consume(50)
+        time_mock.sleep.assert_called_once_with(0.5)
+
+        # Debt is repaid before next transfer.
+        time_mock.monotonic.return_value = 1
+        time_mock.sleep.reset_mock()
+        bucket.consume(100)
+        time_mock.sleep.assert_called_once_with(0.5)
+
+
+class TestTransferScheduler(unittest.TestCase):
+
+    def test_slot(self):
+        scheduler = TransferScheduler(connections=2)
+        started = []
+        finished = threading.Event()
+
+        def transfer(size):
+            with scheduler.slot(size):
+                started.append(size)
+                finished.wait()
+
+        with scheduler.slot(), scheduler.slot():
+            self.assertEqual(scheduler.active, 2)
+            threads = [threading.Thread(target=transfer, args=(size,)) for size in [300, 100]]
+            for thread in threads:
+                thread.start()
+            while scheduler.waiting < 2:
+                threading.Event().wait(0.001)
+
+            # Waiting transfers start when connections are released.
+            self.assertEqual(started, [])
+
+        finished.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(started), [100, 300])
+        self.assertEqual(scheduler.active, 0)
+
+        with self.assertRaisesRegex(ValueError, 'at least 1'):
+            TransferScheduler(connections=0)
+
+    def test_priority(self):
+        scheduler = TransferScheduler(connections=1)
+        started = []
+
+        def transfer(size):
+            with scheduler.slot(size):
+                started.append(size)
+
+        with scheduler.slot():
+            threads = [threading.Thread(target=transfer, args=(size,)) for size in [300, 100, 200]]
+            for number, thread in enumerate(threads, start=1):
+                thread.start()
+                while scheduler.waiting < number:
+                    threading.Event().wait(0.001)
+
+        for thread in threads:
+            thread.join()
+        # Smaller files are transferred first.
+        self.assertEqual(started, [100, 200, 300])
+
+    @patch('resdk.transfer.time')
+    def test_throughput(self, time_mock):
+        time_mock.monotonic.return_value = 100
+        scheduler = TransferScheduler()
+        scheduler.throttle(1000)
+        time_mock.monotonic.return_value = 103
+        scheduler.throttle(4000)
+
+        self.assertEqual(scheduler.transferred, 5000)
+        self.assertEqual(scheduler.throughput, 1000)
+        time_mock.monotonic.return_value = 106
+        self.assertEqual(scheduler.throughput, 800)
+        time_mock.monotonic.return_value = 109
+        self.assertEqual(scheduler.throughput, 0)
+
+    @patch('resdk.transfer.TokenBucket')
+    def test_throttle(self, bucket_mock):
+        TransferScheduler().throttle(100)
+        self.assertEqual(bucket_mock.call_count, 0)
+
+        TransferScheduler(rate=1000).throttle(100)
+        bucket_mock.assert_called_once_with(1000)
+        bucket_mock.return_value.consume.assert_called_once_with(100)
+
+    def test_pickle(self):
+        scheduler = pickle.loads(pickle.dumps(TransferScheduler(connections=2, rate=1000)))
+        self.assertEqual(scheduler.connections, 2)
+        self.assertEqual(scheduler.rate, 1000)
+
+    @patch('resdk.transfer._shared_scheduler', None)
+    def test_shared(self):
+        scheduler = get_shared_scheduler()
+        self.assertIs(get_shared_scheduler(), scheduler)
+        self.assertIs(pickle.loads(pickle.dumps(scheduler)), scheduler)
+
+        configured = configure_shared_scheduler(connections=8, rate=1000)
+        self.assertIs(get_shared_scheduler(), configured)
+        self.assertEqual(configured.connections, 8)
+
+        # Other processes create the shared scheduler with the same limits.
+        pickled = pickle.dumps(configured)
+        with patch('resdk.transfer._shared_scheduler', None):
+            scheduler = pickle.loads(pickled)
+            self.assertIs(get_shared_scheduler(), scheduler)
+            self.assertEqual(scheduler.connections, 8)
+            self.assertEqual(scheduler.rate, 1000)
+
+
+class TestChunkSize(unittest.TestCase):
+
+    def test_fixed(self):
+        chunk_size = ChunkSize(1000)
+        chunk_size.record(1000, 100, failed=True)
+        self.assertEqual(chunk_size.get(), 1000)
+
+        with self.assertRaisesRegex(ValueError, 'must be positive'):
+            ChunkSize(0)
+
+    def test_adaptive(self):
+        chunk_size = AdaptiveChunkSize(size=2000, min_size=1000, max_size=8000,
+                                       target_duration=2)
+        chunk_size.record(2000, 0.5)
+        self.assertEqual(chunk_size.get(), 4000)
+        # Partial chunks do not grow the size.
+        chunk_size.record(100, 0.1)
+        self.assertEqual(chunk_size.get(), 4000)
+        chunk_size.record(4000, 2)
+        self.assertEqual(chunk_size.get(), 4000)
+
+        chunk_size.record(4000, 0.5)
+        chunk_size.record(8000, 0.5)
+        self.assertEqual(chunk_size.get(), 8000)
+
+        chunk_size.record(8000, 1, failed=True)
+        self.assertEqual(chunk_size.get(), 4000)
+        chunk_size.record(4000, 5)
+        chunk_size.record(2000, 5)
+        chunk_size.record(1000, 5)
+        self.assertEqual(chunk_size.get(), 1000)
+
+        chunk_size = pickle.loads(pickle.dumps(chunk_size))
+        self.assertEqual((chunk_size.get(), chunk_size.max_size), (1000, 8000))
+
+        with self.assertRaisesRegex(ValueError, 'between minimal and maximal'):
+            AdaptiveChunkSize(size=100, min_size=1000)
+
+
+class TestMultipartChunk(unittest.TestCase):
+
+    def setUp(self):
+        self.handle = tempfile.TemporaryFile()
+        self.content = os.urandom(300000)
+        self.handle.write(self.content)
+        self.handle.flush()
+
+    def tearDown(self):
+        self.handle.close()
+
+    def test_body(self):
+        fields = {'_chunkSize': 200000, '_chunkNumber': 1}
+        with map_file(self.handle) as mapped:
+            body = MultipartChunk(mapped, 200000, 100000, 'reads.fastq', fields)
+            expected, content_type = encode_multipart_formdata([
+                ('_chunkSize', '200000'),
+                ('_chunkNumber', '1'),
+                ('file', ('reads.fastq', self.content[200000:], 'application/octet-stream')),
+            ], boundary=body.boundary)
+
+            self.assertEqual(body.content_type, content_type)
+            self.assertEqual(len(body), len(expected))
+            # Body is read in blocks of any size.
+            self.assertEqual(body.read(100) + body.read(150000) + body.read(), expected)
+            self.assertEqual(body.read(), b'')
+
+            # Body is rewound, so it can be sent again.
+            self.assertEqual(body.tell(), len(expected))
+            self.assertEqual(body.seek(0), 0)
+            self.assertEqual(body.read(), expected)
+            self.assertEqual(body.seek(-10, os.SEEK_END), len(expected) - 10)
+            self.assertEqual(body.read(), expected[-10:])
+            with self.assertRaises(ValueError):
+                body.seek(-1)
+
+            boundary = body.boundary.encode()
+            body = MultipartChunk(mapped, 200000, 100000, 'reads.fastq', fields)
+            self.assertEqual(b''.join(body), expected.replace(boundary, body.boundary.encode()))
+
+    def test_map_empty_file(self):
+        with tempfile.TemporaryFile() as handle, map_file(handle) as mapped:
+            self.assertIsNone(mapped)
+
+        with map_file(self.handle) as mapped:
+            self.assertIsInstance(mapped, mmap.mmap)
+        self.assertTrue(mapped.closed)
+
+
+class TestCompress(unittest.TestCase):
+
+    def test_is_compressible(self):
+        self.assertTrue(is_compressible('/path/to/reads.FASTQ'))
+        self.assertTrue(is_compressible('annotation.gtf'))
+        self.assertFalse(is_compressible('reads.fastq.gz'))
+        self.assertFalse(is_compressible('alignment.bam'))
+
+    @patch('resdk.transfer.shutil.which', return_value=None)
+    def test_compress_file(self, which_mock):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'reads.fastq')
+            with open(path, 'wb') as handle:
+                handle.write(b'@read\nACGT\n+\nIIII\n' * 10000)
+
+            compress_file(path, path + '.gz')
+            with gzip.open(path + '.gz', 'rb') as handle:
+                self.assertEqual(handle.read(), b'@read\nACGT\n+\nIIII\n' * 10000)
+            self.assertLess(os.path.getsize(path + '.gz'), os.path.getsize(path) / 10)
+
+    @patch('resdk.transfer.subprocess')
+    @patch('resdk.transfer.shutil.which', return_value='/usr/bin/pigz')
+    def test_compress_file_pigz(self, which_mock, subprocess_mock):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'reads.fastq')
+            compress_file(path, path + '.gz')
+
+        args = subprocess_mock.run.call_args[0][0]
+        self.assertEqual(args[0], '/usr/bin/pigz')
+        self.assertEqual(args[-1], path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Unit tests for resdk/upload_cache.py file.
+"""
+# pylint: disable=missing-docstring, protected-access
+import hashlib
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from mock import patch
+
+from resdk.upload_cache import UploadCache
+
+
+class TestUploadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'cache', 'uploads.sqlite3')
+        self.file_path = os.path.join(self.tmp_dir, 'reads.fastq')
+        with open(self.file_path, 'wb') as handle:
+            handle.write(b'ACGT' * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_digest(self):
+        cache = UploadCache()
+        digest = hashlib.sha256(b'ACGT' * 1000).hexdigest()
+        self.assertEqual(cache.digest(self.file_path), digest)
+
+        # Unchanged files are not read again.
+        with patch('resdk.upload_cache.open') as open_mock:
+            self.assertEqual(cache.digest(self.file_path), digest)
+        self.assertEqual(open_mock.call_count, 0)
+
+    def test_memory(self):
+        cache = UploadCache()
+        self.assertIsNone(cache.get('http://server', 'user', 'abc'))
+        cache.set('http://server', 'user', 'abc', 'temp')
+        self.assertEqual(cache.get('http://server', 'user', 'abc'), 'temp')
+        self.assertIsNone(cache.get('http://other', 'user', 'abc'))
+        # Uploads of other users are not reused.
+        self.assertIsNone(cache.get('http://server', 'other', 'abc'))
+
+        # Entries in memory are not pickled.
+        self.assertIsNone(pickle.loads(pickle.dumps(cache)).get('http://server', 'user', 'abc'))
+
+        cache.clear()
+        self.assertIsNone(cache.get('http://server', 'user', 'abc'))
+
+    def test_persistent(self):
+        UploadCache(self.path).set('http://server', 'user', 'abc', 'temp')
+        self.assertEqual(UploadCache(self.path).get('http://server', 'user', 'abc'), 'temp')
+        restored = pickle.loads(pickle.dumps(UploadCache(self.path)))
+        self.assertEqual(restored.get('http://server', 'user', 'abc'), 'temp')
+
+        self.assertIsNone(UploadCache(self.path).get('http://server', 'other', 'abc'))
+
+        UploadCache(self.path).clear()
+        self.assertIsNone(UploadCache(self.path).get('http://server', 'user', 'abc'))
+
+    def test_old_database(self):
+        os.makedirs(os.path.dirname(self.path))
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                'CREATE TABLE upload (url TEXT NOT NULL, digest TEXT NOT NULL, '
+                'file_temp TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (url, digest))')
+            connection.execute("INSERT INTO upload VALUES ('http://server', 'abc', 'temp', 0)")
+        connection.close()
+
+        # Entries that are not keyed by user are dropped.
+        cache = UploadCache(self.path)
+        self.assertIsNone(cache.get('http://server', 'user', 'abc'))
+        cache.set('http://server', 'user', 'abc', 'temp')
+        self.assertEqual(UploadCache(self.path).get('http://server', 'user', 'abc'), 'temp')
+
+    @patch('resdk.upload_cache.time')
+    def test_expired(self, time_mock):
+        time_mock.time.return_value = 1000
+        cache = UploadCache(self.path, max_age=100)
+        cache.set('http://server', 'user', 'abc', 'temp')
+
+        time_mock.time.return_value = 1100
+        self.assertEqual(cache.get('http://server', 'user', 'abc'), 'temp')
+        time_mock.time.return_value = 1101
+        self.assertIsNone(cache.get('http://server', 'user', 'abc'))
+        self.assertIsNone(UploadCache(self.path, max_age=100).get('http://server', 'user', 'abc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
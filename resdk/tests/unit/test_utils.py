@@ -3,15 +3,20 @@ Unit tests for resdk/resources/utils.py file.
 """
 # pylint: disable=missing-docstring, protected-access
 
+import collections
+import re
 import unittest
+from datetime import datetime
 
 import pytz
 from mock import MagicMock, call, patch
 
 from resdk.resources import Collection, Data, Process, Relation, Sample
 from resdk.resources.utils import (
-    _print_input_line, fill_spaces, flatten_field, get_collection_id, get_data_id, get_process_id,
-    get_relation_id, get_sample_id, iterate_fields, iterate_schema, parse_resolwe_datetime,
+    _get_local_timezone, _print_input_line, fill_spaces, flatten_field, get_collection_id,
+    get_data_id, get_field_value, get_file_fields, get_process_file_fields, get_process_id,
+    get_relation_id, get_sample_id, iterate_fields, iterate_schema, match_pattern,
+    parse_resolwe_datetime,
 )
 
 PROCESS_OUTPUT_SCHEMA = [
@@ -174,6 +179,54 @@ class TestUtils(unittest.TestCase):
             },
         })
 
+    def test_get_file_fields(self):
+        schema = PROCESS_OUTPUT_SCHEMA + [
+            {'name': "index", 'type': "list:basic:dir:", 'label': "Index"},
+            {'name': "report", 'label': "Report", 'group': [
+                {'name': "html", 'type': "basic:file:html:", 'label': "HTML"},
+            ]},
+        ]
+        self.assertEqual(get_file_fields(schema), [
+            ('output.fastq', 'basic:file:'),
+            ('output.index', 'list:basic:dir:'),
+            ('output.report.html', 'basic:file:html:'),
+        ])
+
+    @patch('resdk.resources.utils._file_fields_cache', collections.OrderedDict())
+    def test_get_process_file_fields(self):
+        process = Process(resolwe=MagicMock(), id=1, slug='test', version='1.0.0',
+                          output_schema=PROCESS_OUTPUT_SCHEMA)
+        self.assertEqual(get_process_file_fields(process), (('output.fastq', 'basic:file:'),))
+
+        # Fields of saved processes are cached.
+        process.output_schema = []
+        self.assertEqual(get_process_file_fields(process), (('output.fastq', 'basic:file:'),))
+
+        process = Process(resolwe=MagicMock(), id=1, slug='test', version='2.0.0',
+                          output_schema=[])
+        self.assertEqual(get_process_file_fields(process), ())
+
+        # Fields of unsaved processes are not cached.
+        process = Process(resolwe=MagicMock(), output_schema=PROCESS_OUTPUT_SCHEMA)
+        self.assertEqual(get_process_file_fields(process), (('output.fastq', 'basic:file:'),))
+        process.output_schema = []
+        self.assertEqual(get_process_file_fields(process), ())
+
+    def test_get_field_value(self):
+        self.assertEqual(get_field_value(OUTPUT, 'output.fastq'), {'file': "example.fastq.gz"})
+        self.assertEqual(get_field_value(OUTPUT, 'output.options.k'), 123)
+        self.assertIsNone(get_field_value(OUTPUT, 'output.missing'))
+        self.assertIsNone(get_field_value(OUTPUT, 'output.bases.missing'))
+
+    def test_match_pattern(self):
+        self.assertTrue(match_pattern('dir/reads.bam', None))
+        self.assertTrue(match_pattern('dir/reads.bam', '*.bam'))
+        self.assertFalse(match_pattern('reads.bam.bai', '*.bam'))
+        self.assertTrue(match_pattern('reads.bam.bai', ['*.bam', '*.bai']))
+        self.assertFalse(match_pattern('reads.BAM', '*.bam'))
+        self.assertTrue(match_pattern('dir/reads.bam', re.compile(r'^dir/')))
+        self.assertFalse(match_pattern('reads.bam', re.compile(r'^dir/')))
+
     def test_fill_spaces(self):
         result = fill_spaces("one_word", 12)
         self.assertEqual(result, "one_word    ")
@@ -225,9 +278,17 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(get_relation_id(2), 2)
 
-    @patch('resdk.resources.utils.tzlocal')
-    def test_parse_resolwe_datetime(self, tzlocal_mock):
-        tzlocal_mock.get_localzone.return_value = pytz.timezone('US/Hawaii')
+
+class TestParseResolweDatetime(unittest.TestCase):
+
+    def setUp(self):
+        # Local timezone is cached, so that mocked timezones are used.
+        _get_local_timezone.cache_clear()
+        self.addCleanup(_get_local_timezone.cache_clear)
+
+    @patch('tzlocal.get_localzone')
+    def test_parse_resolwe_datetime(self, localzone_mock):
+        localzone_mock.return_value = pytz.timezone('US/Hawaii')
         dtime = parse_resolwe_datetime('2018-06-01T16:12:34.123456+02:00')
         self.assertEqual(dtime.year, 2018)
         self.assertEqual(dtime.month, 6)
@@ -238,6 +299,22 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(dtime.microsecond, 123456)
         self.assertEqual(dtime.tzinfo.zone, 'US/Hawaii')
 
+    @patch('tzlocal.get_localzone')
+    def test_parse_datetime_tz_cached(self, localzone_mock):
+        localzone_mock.return_value = pytz.timezone('US/Hawaii')
+        parse_resolwe_datetime('2018-06-01T16:12:34.123456+02:00')
+        parse_resolwe_datetime('2018-06-02T16:12:34.123456+02:00')
+        self.assertEqual(localzone_mock.call_count, 1)
+
+    @patch('tzlocal.get_localzone')
+    def test_parse_datetime_strptime(self, localzone_mock):
+        localzone_mock.return_value = pytz.utc
+        with patch('resdk.resources.utils.datetime') as datetime_mock:
+            datetime_mock.fromisoformat.side_effect = ValueError
+            datetime_mock.strptime.side_effect = datetime.strptime
+            dtime = parse_resolwe_datetime('2018-06-01T16:12:34.123456+02:00')
+        self.assertEqual(dtime, datetime(2018, 6, 1, 16, 12, 34, 123456, tzinfo=pytz.utc))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+""".. Ignore pydocstyle D400.
+
+=======
+Tracing
+=======
+
+Optional `OpenTelemetry`_ tracing of ReSDK operations.
+
+Tracing is disabled by default and costs only a function call per
+traced operation. Once enabled, queries, saves, updates, deletes, runs,
+uploads (with a span per chunk) and downloads (with a span per file)
+are reported as spans of the current trace:
+
+.. code-block:: python
+
+    import resdk.tracing
+
+    # Requires ``pip install resdk[tracing]``
+    resdk.tracing.enable_tracing()
+
+.. _OpenTelemetry: https://opentelemetry.io/
+
+.. autofunction:: resdk.tracing.enable_tracing
+
+.. autofunction:: resdk.tracing.disable_tracing
+
+.. autofunction:: resdk.tracing.start_span
+
+.. autofunction:: resdk.tracing.get_current_span
+
+"""
+_tracer = None  # pylint: disable=invalid-name
+
+
+class _NoOpSpan:
+    """Span used when tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        """Ignore the attribute."""
+
+    def set_attributes(self, attributes):
+        """Ignore the attributes."""
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+def enable_tracing(tracer_provider=None):
+    """Start reporting spans to OpenTelemetry.
+
+    :param tracer_provider: tracer provider used to create spans,
+        globally configured provider is used if not given
+    :type tracer_provider: opentelemetry.trace.TracerProvider
+
+    """
+    global _tracer  # pylint: disable=global-statement,invalid-name
+    try:
+        from opentelemetry import trace  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise ImportError(
+            "Tracing requires OpenTelemetry, install it with: pip install resdk[tracing]")
+
+    _tracer = trace.get_tracer('resdk', tracer_provider=tracer_provider)
+
+
+def disable_tracing():
+    """Stop reporting spans."""
+    global _tracer  # pylint: disable=global-statement,invalid-name
+    _tracer = None
+
+
+def is_tracing_enabled():
+    """Return ``True`` if tracing is enabled."""
+    return _tracer is not None
+
+
+def get_current_span():
+    """Return the current span (a no-op span if tracing is disabled)."""
+    if _tracer is None:
+        return _NO_OP_SPAN
+
+    from opentelemetry import trace  # pylint: disable=import-outside-toplevel
+    return trace.get_current_span()
+
+
+def start_span(name, **attributes):
+    """Return context manager of a span that is a child of the current span.
+
+    Attributes with ``None`` value are skipped. When tracing is
+    disabled a shared no-op span is returned.
+
+    :param str name: name of the span
+    :param attributes: attributes of the span
+
+    """
+    if _tracer is None:
+        return _NO_OP_SPAN
+
+    return _tracer.start_as_current_span(
+        name,
+        attributes={key: value for key, value in attributes.items() if value is not None},
+    )
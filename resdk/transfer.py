@@ -0,0 +1,489 @@
+""".. Ignore pydocstyle D400.
+
+========
+Transfer
+========
+
+Scheduling, compression and encoding of file transfers.
+
+All uploads and downloads of a ``Resolwe`` instance share one transfer
+scheduler, which limits the number of concurrent transfers (connections)
+and the total transfer rate. Smaller files are transferred first:
+
+.. code-block:: python
+
+    from resdk.transfer import TransferScheduler
+
+    # At most 8 concurrent transfers with 50 MB/s in total.
+    scheduler = TransferScheduler(connections=8, rate=50 * 1024 ** 2)
+    res = resdk.Resolwe(url='https://app.genialis.com', transfer_scheduler=scheduler)
+    ...
+    print(scheduler.throughput, scheduler.active, scheduler.waiting)
+
+To limit transfers of all instances in the process (e.g. all threads of
+a worker), use the shared scheduler. Each process has its own shared
+scheduler, unpickled instances use the one of the receiving process:
+
+.. code-block:: python
+
+    from resdk.transfer import configure_shared_scheduler
+
+    scheduler = configure_shared_scheduler(connections=8, rate=50 * 1024 ** 2)
+    res = resdk.Resolwe(url='https://app.genialis.com', transfer_scheduler=scheduler)
+
+Text files (FASTQ, GTF, CSV, ...) can be compressed before upload,
+which usually reduces the transferred volume several times. Compressed
+files are uploaded with ``.gz`` appended to their names (files of input
+fields whose ``validate_regex`` does not accept such names are uploaded
+uncompressed):
+
+.. code-block:: python
+
+    res = resdk.Resolwe(url='https://app.genialis.com', compress_uploads=True)
+
+Files are transferred in chunks of fixed size (8 MB by default).
+Larger chunks reduce overhead of requests on fast links, smaller chunks
+waste less on failures on unreliable links. Adaptive chunk size grows
+while chunks are uploaded quickly and shrinks when they are slow or
+fail:
+
+.. code-block:: python
+
+    from resdk.transfer import AdaptiveChunkSize
+
+    res = resdk.Resolwe(url='https://app.genialis.com', chunk_size=32 * 1024 ** 2)
+    res = resdk.Resolwe(url='https://app.genialis.com', chunk_size=AdaptiveChunkSize())
+
+.. autoclass:: resdk.transfer.TransferScheduler
+   :members:
+
+.. autoclass:: resdk.transfer.ChunkSize
+   :members:
+
+.. autoclass:: resdk.transfer.MultipartChunk
+   :members:
+
+.. autoclass:: resdk.transfer.AdaptiveChunkSize
+   :members:
+
+.. autofunction:: resdk.transfer.get_shared_scheduler
+
+.. autofunction:: resdk.transfer.configure_shared_scheduler
+
+.. autofunction:: resdk.transfer.compress_file
+
+"""
+import collections
+import contextlib
+import gzip
+import heapq
+import itertools
+import mmap
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+from .constants import CHUNK_SIZE
+
+#: Extensions of text files that are compressed before upload
+COMPRESSIBLE_EXTENSIONS = (
+    '.bed', '.csv', '.fa', '.fasta', '.fastq', '.fq', '.gff', '.gff3', '.gtf', '.json', '.sam',
+    '.tab', '.tsv', '.txt', '.vcf',
+)
+
+# Compression level of uploaded files (level of gzip and pigz defaults)
+COMPRESS_LEVEL = 6
+
+# Size of blocks read when compressing files
+COMPRESS_BLOCK_SIZE = 1024 * 1024
+
+# Size of blocks in which multipart bodies are read
+BODY_BLOCK_SIZE = 64 * 1024
+
+# Time in seconds over which throughput is measured
+THROUGHPUT_WINDOW = 5
+
+#: Default bounds of adaptive chunk size in bytes
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def is_compressible(path):
+    """Return ``True`` if file on ``path`` is an uncompressed text file."""
+    return path.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def compress_file(path, destination):
+    """Compress file on ``path`` with gzip into ``destination``.
+
+    File is compressed in blocks, so memory usage does not depend on
+    its size. Multi-threaded ``pigz`` is used if it is installed.
+    """
+    pigz = shutil.which('pigz')
+    with open(destination, 'wb') as output:
+        if pigz is not None:
+            subprocess.run(
+                [pigz, '-c', '-{}'.format(COMPRESS_LEVEL), '-p', str(os.cpu_count() or 1), path],
+                stdout=output, check=True)
+            return
+
+        with open(path, 'rb') as source, \
+                gzip.GzipFile(fileobj=output, mode='wb', compresslevel=COMPRESS_LEVEL) as target:
+            shutil.copyfileobj(source, target, COMPRESS_BLOCK_SIZE)
+
+
+class TokenBucket:
+    """Token bucket that limits the rate of transferred bytes.
+
+    :param float rate: number of bytes per second
+    :param float burst: maximal number of bytes transferred at once
+        without waiting, defaults to one second of transfer
+
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initialize attributes."""
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """Wait until ``amount`` bytes can be transferred."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens can go negative, so large amounts wait proportionally
+            # long and later transfers wait for the debt to be repaid.
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+
+
+@contextlib.contextmanager
+def map_file(handle):
+    """Return read-only memory map of the open file (``None`` if it is empty)."""
+    if os.fstat(handle.fileno()).st_size == 0:
+        yield None
+        return
+
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+class MultipartChunk:
+    """Multipart form body with a region of a memory-mapped file.
+
+    Body is read in small blocks, directly from the memory map of the
+    file, so the chunk is never copied into memory as a whole and memory
+    usage does not depend on the chunk size. Body can be rewound with
+    ``seek``, so requests can send it again (e.g. after a new login).
+
+    :param mapped: memory map of the file
+    :type mapped: mmap.mmap
+    :param int offset: start of the chunk in the file
+    :param int size: size of the chunk
+    :param str file_name: name of the file in the form
+    :param dict fields: other form fields
+
+    """
+
+    def __init__(self, mapped, offset, size, file_name, fields):
+        """Initialize attributes."""
+        self.fields = fields
+        self.boundary = uuid.uuid4().hex
+        head = ''.join(
+            '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(
+                self.boundary, name, value)
+            for name, value in fields.items()
+        )
+        head += (
+            '--{}\r\nContent-Disposition: form-data; name="file"; filename="{}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).format(self.boundary, file_name.replace('"', '\\"'))
+        self._head = head.encode('utf-8')
+        self._tail = '\r\n--{}--\r\n'.format(self.boundary).encode('utf-8')
+        self._mapped = mapped
+        self._start = offset
+        self._size = size
+        self._position = 0
+
+    @property
+    def content_type(self):
+        """Value of the Content-Type header of the body."""
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def __len__(self):
+        """Return size of the body."""
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        """Iterate over blocks of the body."""
+        while True:
+            block = self.read(BODY_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+    def tell(self):
+        """Return current position in the body."""
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Move to ``offset`` relative to ``whence`` and return new position."""
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = len(self) + offset
+        else:
+            raise ValueError("Invalid whence: {}.".format(whence))
+
+        if position < 0:
+            raise ValueError("Negative seek position: {}.".format(position))
+        self._position = position
+        return self._position
+
+    def read(self, size=-1):
+        """Return next ``size`` bytes of the body (all remaining if negative)."""
+        if size is None or size < 0:
+            size = len(self) - self._position
+
+        parts = []
+        head_size = len(self._head)
+        file_end = head_size + self._size
+        end = min(len(self), self._position + size)
+        while self._position < end:
+            if self._position < head_size:
+                part = self._head[self._position:min(end, head_size)]
+            elif self._position < file_end:
+                start = self._start + self._position - head_size
+                part = self._mapped[start:start + min(end, file_end) - self._position]
+            else:
+                part = self._tail[self._position - file_end:end - file_end]
+            parts.append(part)
+            self._position += len(part)
+
+        return b''.join(parts)
+
+
+class ChunkSize:
+    """Fixed size of transferred chunks.
+
+    :param int size: chunk size in bytes
+
+    """
+
+    def __init__(self, size=CHUNK_SIZE):
+        """Initialize attributes."""
+        if size < 1:
+            raise ValueError("Chunk size must be positive.")
+        self.size = size
+
+    def get(self):
+        """Return size of the next chunk."""
+        return self.size
+
+    def record(self, size, duration, failed=False):
+        """Record transfer of a chunk.
+
+        :param int size: size of the chunk in bytes
+        :param float duration: duration of the transfer in seconds
+        :param bool failed: ``True`` if the transfer failed
+
+        """
+
+
+class AdaptiveChunkSize(ChunkSize):
+    """Chunk size adapted to the measured transfer time and failures.
+
+    Chunk size is doubled when chunks are transferred faster than in
+    half of ``target_duration`` and halved when they take more than
+    twice as long or fail. It is kept between ``min_size`` and
+    ``max_size``, which must be accepted by the server.
+
+    :param int size: initial chunk size in bytes
+    :param int min_size: minimal chunk size in bytes
+    :param int max_size: maximal chunk size in bytes
+    :param float target_duration: desired transfer time of a chunk in
+        seconds
+
+    """
+
+    def __init__(self, size=CHUNK_SIZE, min_size=MIN_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE,
+                 target_duration=2.0):
+        """Initialize attributes."""
+        if not 0 < min_size <= size <= max_size:
+            raise ValueError("Chunk size must be between minimal and maximal size.")
+
+        super().__init__(size)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_duration = target_duration
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        """Pickle settings only, the lock is created anew."""
+        return self.__class__, (self.size, self.min_size, self.max_size, self.target_duration)
+
+    def record(self, size, duration, failed=False):
+        """Record transfer of a chunk and adapt the chunk size."""
+        with self._lock:
+            if failed or duration > 2 * self.target_duration:
+                self.size = max(self.min_size, self.size // 2)
+            # Only full chunks show if larger chunks would be faster.
+            elif size >= self.size and duration < self.target_duration / 2:
+                self.size = min(self.max_size, self.size * 2)
+
+
+class TransferScheduler:
+    """Limits of concurrent transfers and their total rate.
+
+    Uploads and downloads wait for a free connection, smaller files
+    first, and their chunks are sent or received within the rate limit.
+    Current throughput is measured over the last few seconds.
+
+    :param int connections: maximal number of concurrent transfers
+    :param float rate: maximal total transfer rate in bytes per
+        second, unlimited if not given
+
+    """
+
+    def __init__(self, connections=4, rate=None):
+        """Initialize attributes."""
+        if connections < 1:
+            raise ValueError("Number of connections must be at least 1.")
+
+        self.connections = connections
+        self.rate = rate
+        #: Total number of transferred bytes
+        self.transferred = 0
+        self._shared = False
+        self._reset()
+
+    def __reduce__(self):
+        """Pickle limits only, locks are created anew."""
+        if self._shared:
+            return _restore_shared_scheduler, (self.connections, self.rate)
+        return self.__class__, (self.connections, self.rate)
+
+    def _reset(self):
+        """Create locks and clear state of transfers in progress.
+
+        Called in forked child processes, since transfers of other
+        threads of the parent process do not exist in the child.
+        """
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._history = collections.deque()
+        self._bucket = TokenBucket(self.rate) if self.rate else None
+
+    @property
+    def active(self):
+        """Number of transfers in progress."""
+        return self._active
+
+    @property
+    def waiting(self):
+        """Number of transfers waiting for a free connection."""
+        return len(self._waiting)
+
+    @property
+    def throughput(self):
+        """Transfer rate in bytes per second over the last few seconds."""
+        with self._condition:
+            self._expire(time.monotonic())
+            return sum(size for _, size in self._history) / THROUGHPUT_WINDOW
+
+    def _expire(self, now):
+        """Remove transfers older than the throughput window."""
+        while self._history and self._history[0][0] < now - THROUGHPUT_WINDOW:
+            self._history.popleft()
+
+    @contextlib.contextmanager
+    def slot(self, size=0):
+        """Wait for a free connection and hold it during the transfer.
+
+        :param int size: size of the transferred file, waiting smaller
+            files get free connections first
+
+        """
+        with self._condition:
+            ticket = (size, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            while self._active >= self.connections or self._waiting[0] != ticket:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # Next waiting transfer may take another free connection.
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def throttle(self, size):
+        """Wait until ``size`` bytes can be transferred within the rate limit."""
+        if self._bucket is not None:
+            self._bucket.consume(size)
+
+        with self._condition:
+            now = time.monotonic()
+            self.transferred += size
+            self._history.append((now, size))
+            self._expire(now)
+
+
+_shared_scheduler = None  # pylint: disable=invalid-name
+_shared_scheduler_lock = threading.Lock()  # pylint: disable=invalid-name
+
+
+def get_shared_scheduler():
+    """Return transfer scheduler shared by all ``Resolwe`` instances of the process.
+
+    Limits of the shared scheduler can be changed with
+    :func:`configure_shared_scheduler`.
+    """
+    return _restore_shared_scheduler()
+
+
+def _restore_shared_scheduler(connections=4, rate=None):
+    """Return shared transfer scheduler, create it with given limits if it does not exist."""
+    global _shared_scheduler  # pylint: disable=global-statement,invalid-name
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = TransferScheduler(connections, rate)
+            _shared_scheduler._shared = True  # pylint: disable=protected-access
+        return _shared_scheduler
+
+
+def configure_shared_scheduler(connections=4, rate=None):
+    """Replace the shared transfer scheduler with one with given limits.
+
+    Transfers in progress keep the limits of the previous scheduler.
+    Instances created before the call keep using it as well.
+
+    :param int connections: maximal number of concurrent transfers
+    :param float rate: maximal total transfer rate in bytes per
+        second, unlimited if not given
+
+    """
+    global _shared_scheduler  # pylint: disable=global-statement,invalid-name
+    scheduler = TransferScheduler(connections, rate)
+    scheduler._shared = True  # pylint: disable=protected-access
+    with _shared_scheduler_lock:
+        _shared_scheduler = scheduler
+    return scheduler
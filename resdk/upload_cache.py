@@ -0,0 +1,160 @@
+""".. Ignore pydocstyle D400.
+
+============
+Upload cache
+============
+
+Cache of uploaded files keyed by their content.
+
+Files referenced in inputs of ``Resolwe.run`` are identified by the
+SHA-256 digest of their content. A file that was already uploaded to
+the same server is not uploaded again, its temporary location on the
+server is reused instead. Uploads are cached per server and user, so
+that temporary files of one user are never given to another one. Each
+``Resolwe`` instance keeps such cache
+in memory. To reuse uploads across sessions, store the cache on disk:
+
+.. code-block:: python
+
+    from resdk.upload_cache import UploadCache
+
+    res = resdk.Resolwe(url='https://app.genialis.com', upload_cache=UploadCache(path))
+
+Uploaded files are only kept on the server for a limited time, so
+entries expire after ``max_age`` seconds.
+
+.. autoclass:: resdk.upload_cache.UploadCache
+   :members:
+
+"""
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+#: Default maximal age of entries in seconds
+DEFAULT_MAX_AGE = 6 * 3600
+
+# Size of blocks read when computing digests
+READ_SIZE = 1024 * 1024
+
+
+class UploadCache:
+    """Temporary locations of uploaded files keyed by server, user and digest.
+
+    :param str path: path of the SQLite database that persists the
+        cache, entries are kept in memory only if not given
+    :param float max_age: maximal age of entries in seconds, must be
+        lower than the time uploaded files are kept on the server
+
+    """
+
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE):
+        """Initialize attributes and create the database."""
+        self.path = os.path.abspath(os.path.expanduser(path)) if path else None
+        self.max_age = max_age
+        self._uploads = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with self._connect() as connection:
+                columns = [row[1] for row in connection.execute('PRAGMA table_info(upload)')]
+                if columns and 'username' not in columns:
+                    # Entries of older versions are not keyed by user.
+                    connection.execute('DROP TABLE upload')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS upload ('
+                    'url TEXT NOT NULL, username TEXT NOT NULL, digest TEXT NOT NULL, '
+                    'file_temp TEXT NOT NULL, created REAL NOT NULL, '
+                    'PRIMARY KEY (url, username, digest))'
+                )
+
+    def __reduce__(self):
+        """Pickle settings only, entries in memory are not copied."""
+        return self.__class__, (self.path, self.max_age)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Return connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def digest(self, path):
+        """Return SHA-256 digest of the content of file on ``path``.
+
+        Digests are remembered by path, size and modification time of
+        the file, so unchanged files are read only once.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._digests:
+                return self._digests[key]
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(READ_SIZE), b''):
+                sha256.update(block)
+
+        digest = sha256.hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+        return digest
+
+    def get(self, url, username, digest):
+        """Return temporary location of uploaded file or ``None`` if not cached."""
+        username = username or ''
+        min_created = time.time() - self.max_age
+        with self._lock:
+            entry = self._uploads.get((url, username, digest), None)
+        if entry is not None and entry[1] >= min_created:
+            return entry[0]
+
+        if self.path is None:
+            return None
+
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT file_temp, created FROM upload WHERE url = ? AND username = ? '
+                'AND digest = ? AND created >= ?',
+                (url, username, digest, min_created),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        with self._lock:
+            self._uploads[(url, username, digest)] = row
+        return row[0]
+
+    def set(self, url, username, digest, file_temp):
+        """Store temporary location of uploaded file."""
+        username = username or ''
+        created = time.time()
+        with self._lock:
+            self._uploads[(url, username, digest)] = (file_temp, created)
+
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO upload (url, username, digest, file_temp, created) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (url, username, digest, file_temp, created),
+                )
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._uploads.clear()
+
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute('DELETE FROM upload')
@@ -47,6 +47,9 @@ setuptools.setup(
             'sphinx>=1.4.1',
             'sphinx_rtd_theme>=0.1.9',
         ],
+        'tracing': [
+            'opentelemetry-api',
+        ],
         'package': [
             'twine',
             'wheel',
@@ -55,6 +58,7 @@ setuptools.setup(
             'check-manifest',
             'isort',
             'mock==1.3.0',
+            'opentelemetry-sdk',
             'pycodestyle~=2.5.0',
             'pydocstyle~=3.0.0',
             'pylint~=2.3.1',